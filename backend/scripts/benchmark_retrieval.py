@@ -0,0 +1,178 @@
+"""
+Benchmark the retrieval backends against exact search.
+
+Compares the Chroma HNSW path with the flat index, exact and quantized
+(int8 / binary prefilter with full-precision rescoring), on the vectors of an
+existing collection. Queries are stored chunk vectors with Gaussian noise
+added, so no embedding API calls are needed. Reports recall@k against an
+exact brute-force search, p50/p99 latency and the in-memory size of the
+quantized codes.
+
+Usage (from the backend directory):
+    python scripts/benchmark_retrieval.py --persist-dir ./chroma_db
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.infrastructure.ml.collection_registry import CollectionRegistry  # noqa: E402
+from src.infrastructure.ml.flat_index import (  # noqa: E402
+    EXPORT_PAGE_SIZE,
+    QUANTIZATION_BINARY,
+    QUANTIZATION_INT8,
+    QUANTIZATION_NONE,
+    FlatVectorIndex,
+    normalize_rows,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--persist-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--collection",
+        default=None,
+        help="Physical collection name (default: the active one from the registry)",
+    )
+    parser.add_argument(
+        "--base-name",
+        default="zev_simple_rag_1_docs",
+        help="Logical collection name used to find the registry",
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=4, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.05, help="Query noise (std per dimension)")
+    parser.add_argument(
+        "--multipliers",
+        type=int,
+        nargs="+",
+        default=[4, 10, 25],
+        help="Rescore multipliers to try for the quantized indexes",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def load_vectors(collection) -> Dict[str, object]:
+    """Export the IDs and normalized embeddings of a collection."""
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    offset = 0
+    while True:
+        page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return {"ids": ids, "matrix": normalize_rows(np.vstack(vectors))}
+
+
+def measure(
+    search: Callable[[np.ndarray], List[str]],
+    queries: np.ndarray,
+    truth: List[set],
+) -> Dict[str, float]:
+    """Run every query through a search function and collect recall and latency."""
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected.intersection(found))
+    return {
+        "recall": hits / sum(len(t) for t in truth),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print a result table."""
+    args = parse_args()
+    persist_dir = Path(args.persist_dir)
+
+    name = args.collection
+    if not name:
+        registry = CollectionRegistry.load(
+            persist_dir / f"{args.base_name}_collections.json", args.base_name
+        )
+        name = registry.active.name if registry.active else args.base_name
+
+    client = chromadb.PersistentClient(path=str(persist_dir))
+    collection = client.get_collection(name)
+    data = load_vectors(collection)
+    ids, matrix = data["ids"], data["matrix"]
+    print(f"Collection {name}: {len(ids)} vectors of {matrix.shape[1]} dimensions")
+
+    # Perturbed stored vectors as queries, exact top-k as ground truth
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = normalize_rows(
+        matrix[rows] + rng.normal(0, args.noise, size=(len(rows), matrix.shape[1])).astype(np.float32)
+    )
+    truth = []
+    for query in queries:
+        top = np.argsort(-(matrix @ query))[:args.k]
+        truth.append({ids[i] for i in top})
+
+    results = []
+    results.append((
+        "chroma (hnsw)",
+        measure(
+            lambda q: collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=[])["ids"][0],
+            queries,
+            truth,
+        ),
+        None,
+    ))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configs = [(QUANTIZATION_NONE, 1)] + [
+            (quantization, multiplier)
+            for quantization in (QUANTIZATION_INT8, QUANTIZATION_BINARY)
+            for multiplier in args.multipliers
+        ]
+        built = set()
+        for quantization, multiplier in configs:
+            index = FlatVectorIndex(
+                Path(tmp) / quantization,
+                name,
+                quantization=quantization,
+                rescore_multiplier=multiplier,
+                vector_store=collection,
+            )
+            if quantization not in built:
+                index.build_from_store(collection)
+                built.add(quantization)
+            index.refresh()
+            label = "flat exact" if quantization == QUANTIZATION_NONE else f"flat {quantization} x{multiplier}"
+            stats = measure(
+                lambda q: [chunk_id for chunk_id, _ in index.search_ids(q, args.k)],
+                queries,
+                truth,
+            )
+            codes_bytes = index._codes.nbytes if index._codes is not None else matrix.nbytes
+            results.append((label, stats, codes_bytes))
+
+    print(f"\n{'backend':<22}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}{'RAM MB':>10}")
+    for label, stats, size in results:
+        ram = f"{size / 1024 / 1024:.2f}" if size is not None else "-"
+        print(
+            f"{label:<22}{stats['recall']:>10.3f}{stats['p50_ms']:>10.3f}"
+            f"{stats['p99_ms']:>10.3f}{ram:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
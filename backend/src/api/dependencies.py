@@ -7,14 +7,21 @@ from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from structlog import get_logger
 
-from src.application.services import ChatService, SessionService
+from src.application.services import (
+    ChatService,
+    RetrievalService,
+    SessionService,
+    UsageService,
+)
 from src.core.config import settings
 from src.infrastructure.database.session import get_db_session
+from src.infrastructure.ml.ingestion_jobs import get_ingestion_job_manager
 from src.infrastructure.ml.rag_service import RAGService, get_rag_service
 from src.infrastructure.repositories.session_repository import (
     MessageRepository,
     SessionRepository,
 )
+from src.infrastructure.repositories.token_usage_repository import TokenUsageRepository
 
 logger = get_logger()
 
@@ -29,9 +36,9 @@ async def get_rag_service_dep() -> AsyncGenerator[RAGService, None]:
     if not rag_service.is_initialized():
         rag_service.initialize()
 
-        # Try to ingest documents if knowledge base exists
+        # Ingest documents in the background if knowledge base exists
         try:
-            await rag_service.ingest_documents()
+            get_ingestion_job_manager().submit()
         except Exception as e:
             logger.warning("Failed to ingest initial documents", error=str(e))
 
@@ -52,8 +59,14 @@ def get_message_repository(db_session: DbSessionDep) -> MessageRepository:
     return MessageRepository(db_session)
 
 
+def get_token_usage_repository(db_session: DbSessionDep) -> TokenUsageRepository:
+    """Get token usage repository."""
+    return TokenUsageRepository(db_session)
+
+
 SessionRepositoryDep = Annotated[SessionRepository, Depends(get_session_repository)]
 MessageRepositoryDep = Annotated[MessageRepository, Depends(get_message_repository)]
+TokenUsageRepositoryDep = Annotated[TokenUsageRepository, Depends(get_token_usage_repository)]
 
 
 # Service dependencies
@@ -69,10 +82,23 @@ def get_chat_service(
     session_repo: SessionRepositoryDep,
     message_repo: MessageRepositoryDep,
     rag_service: RAGServiceDep,
+    usage_repo: TokenUsageRepositoryDep,
 ) -> ChatService:
     """Get chat service."""
-    return ChatService(session_repo, message_repo, rag_service)
+    return ChatService(session_repo, message_repo, rag_service, usage_repo)
+
+
+def get_retrieval_service(rag_service: RAGServiceDep) -> RetrievalService:
+    """Get retrieval service."""
+    return RetrievalService(rag_service)
+
+
+def get_usage_service(usage_repo: TokenUsageRepositoryDep) -> UsageService:
+    """Get usage service."""
+    return UsageService(usage_repo)
 
 
 SessionServiceDep = Annotated[SessionService, Depends(get_session_service)]
 ChatServiceDep = Annotated[ChatService, Depends(get_chat_service)]
+RetrievalServiceDep = Annotated[RetrievalService, Depends(get_retrieval_service)]
+UsageServiceDep = Annotated[UsageService, Depends(get_usage_service)]
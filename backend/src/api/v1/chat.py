@@ -1,26 +1,77 @@
 """
 Chat API endpoints with streaming support.
 """
+import asyncio
 import json
-from typing import Optional
+from typing import AsyncIterator, Optional, TypeVar
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 from structlog import get_logger
 
 from src.api.dependencies import ChatServiceDep, RAGServiceDep, SessionServiceDep
+from src.core.config import settings
 from src.application.dtos import (
     AssistantStreamEvent,
     ChatRequest,
     ChatResponse,
+    IngestionJobResponse,
     ReferenceDocument,
     TokenUsage,
 )
+from src.infrastructure.ml.ingestion_jobs import (
+    JOB_REBUILD,
+    IngestionJob,
+    get_ingestion_job_manager,
+)
+from src.infrastructure.ml.kb_watcher import get_kb_watcher
 
 logger = get_logger()
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+T = TypeVar("T")
+
+
+async def _until_disconnected(
+    stream: AsyncIterator[T],
+    http_request: Request,
+    poll_seconds: float,
+) -> AsyncIterator[T]:
+    """
+    Iterate a stream until the client disconnects, then cancel it.
+
+    Items are awaited in a separate task, so a disconnect is noticed while
+    the stream waits for the LLM, not only when the next chunk is sent.
+
+    Raises:
+        ClientDisconnect: If the client disconnected
+    """
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(stream.__anext__())
+            while not pending.done():
+                await asyncio.wait({pending}, timeout=poll_seconds)
+                if not pending.done() and await http_request.is_disconnected():
+                    raise ClientDisconnect()
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield item
+            if await http_request.is_disconnected():
+                raise ClientDisconnect()
+    finally:
+        if pending is not None and not pending.done():
+            # Cancelling the stream closes the LLM stream and saves the partial answer
+            pending.cancel()
+            await asyncio.wait({pending})
+        else:
+            await stream.aclose()
+
 
 @router.post("", response_model=ChatResponse)
 async def chat(
@@ -38,9 +89,13 @@ async def chat(
 async def chat_stream(
     request: ChatRequest,
     service: ChatServiceDep,
+    http_request: Request,
 ) -> StreamingResponse:
     """
     Send a chat message and get a streaming response.
+
+    If the client disconnects, generation is cancelled and the partial
+    answer is saved marked as truncated.
     """
     logger.info("Processing streaming chat request")
 
@@ -52,7 +107,9 @@ async def chat_stream(
         final_token_usage: Optional[dict] = None
 
         try:
-            async for chunk, docs, token_usage in service.stream_chat(request):
+            async for chunk, docs, token_usage in _until_disconnected(
+                service.stream_chat(request), http_request, settings.stream_disconnect_poll_seconds
+            ):
                 if chunk:
                     full_content += chunk
                     event = AssistantStreamEvent(
@@ -68,6 +125,7 @@ async def chat_stream(
                             source=doc.metadata.get("source"),
                             content=doc.page_content,
                             metadata=doc.metadata,
+                            similarity_score=doc.metadata.get("similarity_score"),
                         )
                         for doc in docs
                     ]
@@ -90,6 +148,9 @@ async def chat_stream(
             event = AssistantStreamEvent(event_type="done")
             yield f"data: {json.dumps(event.model_dump())}\n\n"
 
+        except ClientDisconnect:
+            logger.info("Client disconnected, cancelled streaming response")
+
         except Exception as e:
             logger.error("Stream error", error=str(e))
             event = AssistantStreamEvent(
@@ -109,22 +170,125 @@ async def chat_stream(
     )
 
 
-@router.post("/ingest", status_code=status.HTTP_202_ACCEPTED)
+@router.post(
+    "/ingest",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def ingest_documents(
     rag_service: RAGServiceDep,
+) -> IngestionJobResponse:
+    """
+    Trigger document ingestion from the knowledge base as a background job.
+
+    A trigger that arrives while a job is already queued or running joins
+    that job instead of starting a new one.
+    """
+    job, coalesced = get_ingestion_job_manager().submit()
+    return _job_to_response(job, coalesced=coalesced)
+
+
+@router.post(
+    "/rebuild",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def rebuild_collection(
+    rag_service: RAGServiceDep,
+) -> IngestionJobResponse:
+    """
+    Rebuild the knowledge base into a shadow collection as a background job.
+
+    Queries keep using the live collection until the rebuilt one is swapped in.
+    """
+    job, coalesced = get_ingestion_job_manager().submit(kind=JOB_REBUILD)
+    return _job_to_response(job, coalesced=coalesced)
+
+
+@router.post("/rebuild/rollback")
+async def rollback_collection(
+    rag_service: RAGServiceDep,
 ) -> dict:
     """
-    Manually trigger document ingestion from the knowledge base.
+    Switch back to the collection that was active before the last rebuild.
     """
     try:
-        count = await rag_service.ingest_documents()
-        return {
-            "message": "Ingestion completed",
-            "documents_ingested": count,
-        }
-    except Exception as e:
-        logger.error("Ingestion failed", error=str(e))
+        await rag_service.rollback_collection()
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ingestion failed: {e}",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
         )
+    return rag_service.collections_status()
+
+
+@router.get("/collections")
+async def collections_status(
+    rag_service: RAGServiceDep,
+) -> dict:
+    """
+    Get the active and previous collections and whether a rebuild is needed.
+    """
+    return rag_service.collections_status()
+
+
+@router.get("/metrics")
+async def rag_metrics(
+    rag_service: RAGServiceDep,
+) -> dict:
+    """
+    Get cache hit/miss counters of the RAG service.
+    """
+    return rag_service.metrics()
+
+
+@router.get("/ingest/watcher")
+async def ingest_watcher_status() -> dict:
+    """
+    Get the status of the knowledge base watcher, including how far behind it is.
+    """
+    if not settings.kb_watcher_enabled:
+        return {"enabled": False}
+    return get_kb_watcher().status()
+
+
+@router.get("/ingest/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: UUID) -> IngestionJobResponse:
+    """
+    Get the progress of an ingestion job.
+    """
+    job = get_ingestion_job_manager().get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingestion job not found",
+        )
+    return _job_to_response(job)
+
+
+def _job_to_response(job: IngestionJob, coalesced: bool = False) -> IngestionJobResponse:
+    """Convert an ingestion job to its response DTO."""
+    stats = job.stats
+    throughput = stats.throughput()
+    eta = stats.eta_seconds()
+    return IngestionJobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        coalesced=coalesced,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        files_found=stats.files_found,
+        files_scanned=stats.files_scanned,
+        files_changed=stats.files_changed,
+        files_removed=stats.files_removed,
+        chunks_total=stats.chunks_total,
+        chunks_embedded=stats.chunks_embedded,
+        chunks_removed=stats.chunks_removed,
+        chunks_deduplicated=stats.chunks_deduplicated,
+        bytes_deduplicated=stats.bytes_deduplicated,
+        throughput_chunks_per_second=round(throughput, 2) if throughput else None,
+        eta_seconds=round(eta, 1) if eta is not None else None,
+        errors=stats.errors + ([job.error] if job.error else []),
+    )
@@ -0,0 +1,39 @@
+"""
+Retrieval API endpoints for offline and evaluation workloads.
+"""
+import json
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from structlog import get_logger
+
+from src.api.dependencies import RetrievalServiceDep
+from src.application.dtos import BatchRetrieveRequest
+
+logger = get_logger()
+router = APIRouter(prefix="/retrieve", tags=["retrieve"])
+
+
+@router.post("/batch")
+async def retrieve_batch(
+    request: BatchRetrieveRequest,
+    service: RetrievalServiceDep,
+) -> StreamingResponse:
+    """
+    Retrieve the chunks for many questions without calling the LLM.
+
+    Questions are embedded and searched in batches; results are streamed as
+    newline-delimited JSON, one object per question in question order.
+    """
+    logger.info("Processing batch retrieval request", questions=len(request.questions))
+
+    async def generate():
+        """Stream generator function."""
+        try:
+            async for result in service.retrieve_batch(request):
+                yield result.model_dump_json() + "\n"
+        except Exception as e:
+            logger.error("Batch retrieval error", error=str(e))
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -0,0 +1,33 @@
+"""
+Token usage API endpoints.
+"""
+from typing import List
+
+from fastapi import APIRouter, Query
+
+from src.api.dependencies import UsageServiceDep
+from src.application.dtos import DailyTokenUsageResponse, SessionTokenUsageResponse
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+
+@router.get("/daily", response_model=List[DailyTokenUsageResponse])
+async def daily_usage(
+    service: UsageServiceDep,
+    days: int = Query(30, ge=1, le=366),
+) -> List[DailyTokenUsageResponse]:
+    """
+    Get the token usage per day (UTC) of the latest days.
+    """
+    return await service.daily(days)
+
+
+@router.get("/sessions", response_model=List[SessionTokenUsageResponse])
+async def session_usage(
+    service: UsageServiceDep,
+    limit: int = Query(20, ge=1, le=500),
+) -> List[SessionTokenUsageResponse]:
+    """
+    Get the sessions that used the most tokens.
+    """
+    return await service.top_sessions(limit)
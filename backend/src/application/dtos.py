@@ -1,7 +1,7 @@
 """
 Data Transfer Objects (DTOs) for API requests and responses.
 """
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional
 from uuid import UUID
 
@@ -68,7 +68,10 @@ class TokenUsage(BaseModel):
     input_tokens: Optional[int] = None
     output_tokens: Optional[int] = None
     rag_tokens: Optional[int] = None
+    rag_tokens_saved: Optional[int] = None  # Context tokens saved by retrieval policy and packing
+    packing_tokens_saved: Optional[int] = None  # Context tokens saved by merging overlapping chunks
     total_tokens: Optional[int] = None
+    retrieval_path: Optional[str] = None  # 'full', 'reused', 'extended', 'answer_cache'
 
 
 class ReferenceDocument(BaseModel):
@@ -89,6 +92,7 @@ class MessageResponse(MessageBase):
     created_at: datetime
     token_usage: Optional[TokenUsage] = None
     references: Optional[List[ReferenceDocument]] = None
+    truncated: bool = False  # Answer cut short because the client disconnected
 
     class Config:
         from_attributes = True
@@ -106,11 +110,19 @@ class AssistantStreamEvent(BaseModel):
 
 # ============== Chat DTOs ==============
 
+class RetrievalScope(BaseModel):
+    """Schema for restricting retrieval to a knowledge base subtree."""
+
+    path_prefixes: List[str] = Field(default_factory=list)  # e.g. 'gemini/guides'
+    tags: List[str] = Field(default_factory=list)  # Directory names, e.g. 'chroma_official'
+
+
 class ChatRequest(BaseModel):
     """Schema for chat requests."""
 
     message: str = Field(..., min_length=1)
     session_id: Optional[UUID] = None
+    scope: Optional[RetrievalScope] = None
     enable_web_search: bool = False
     enable_deep_thinking: bool = False
 
@@ -122,5 +134,79 @@ class ChatResponse(BaseModel):
     message: MessageResponse
 
 
+# ============== Retrieval DTOs ==============
+
+class BatchRetrieveRequest(BaseModel):
+    """Schema for batch retrieval requests."""
+
+    questions: List[str] = Field(..., min_length=1, max_length=10000)
+    scope: Optional[RetrievalScope] = None
+
+
+class BatchRetrieveResult(BaseModel):
+    """Schema for the retrieval result of one question of a batch."""
+
+    index: int  # Position of the question in the request
+    question: str
+    mode: str  # 'vector', 'hybrid'
+    k: int
+    candidates: int
+    context_tokens: int
+    tokens_saved: int
+    references: List[ReferenceDocument] = Field(default_factory=list)
+
+
+# ============== Ingestion DTOs ==============
+
+class IngestionJobResponse(BaseModel):
+    """Schema for ingestion job status responses."""
+
+    job_id: UUID
+    kind: str = "ingest"  # 'ingest', 'rebuild'
+    status: str  # 'queued', 'running', 'completed', 'failed'
+    coalesced: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    files_found: int = 0
+    files_scanned: int = 0
+    files_changed: int = 0
+    files_removed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_removed: int = 0
+    chunks_deduplicated: int = 0
+    bytes_deduplicated: int = 0
+    throughput_chunks_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    errors: List[str] = Field(default_factory=list)
+
+
+# ============== Usage DTOs ==============
+
+class TokenUsageTotals(BaseModel):
+    """Schema for summed token counters."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    rag_tokens: int = 0
+    total_tokens: int = 0
+
+
+class DailyTokenUsageResponse(TokenUsageTotals):
+    """Schema for the token usage of one day (UTC)."""
+
+    day: date
+    messages: int = 0
+
+
+class SessionTokenUsageResponse(TokenUsageTotals):
+    """Schema for the token usage of one session."""
+
+    session_id: UUID
+    title: str
+    updated_at: datetime
+
+
 # Update forward references
 SessionDetailResponse.model_rebuild()
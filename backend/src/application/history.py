@@ -0,0 +1,188 @@
+"""
+Token-budgeted chat history with a rolling summary.
+
+Only the latest turns of a session go into the prompt verbatim, within a
+token budget. Messages before that window are folded into a rolling
+summary stored on the session row; the summary is updated in the
+background after each turn, so prompt size stays bounded however long the
+session gets.
+"""
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from structlog import get_logger
+
+from src.core.config import settings
+from src.domain.entities import Message
+from src.infrastructure.database.session import async_session_maker
+from src.infrastructure.ml.rag_service import RAGService, get_rag_service
+from src.infrastructure.ml.token_counting import estimate_tokens, truncate_to_tokens
+from src.infrastructure.repositories.session_repository import (
+    MessageRepository,
+    SessionRepository,
+)
+
+logger = get_logger()
+
+
+def verbatim_message_count() -> int:
+    """Number of latest messages that are candidates for the prompt."""
+    return settings.history_max_turns * 2
+
+
+def window_messages(messages: List[Message], token_budget: int) -> List[Message]:
+    """
+    Select the latest messages that fit the history token budget.
+
+    The latest turn is always selected, even when it alone exceeds the
+    budget; history_window truncates it to fit.
+
+    Args:
+        messages: Latest messages of a session, oldest first
+        token_budget: Maximum estimated tokens of the selected messages
+
+    Returns:
+        Selected messages, oldest first, starting with a user message
+    """
+    selected: List[Message] = []
+    tokens = 0
+    for message in reversed(messages):
+        tokens += estimate_tokens(message.content)
+        if tokens > token_budget and any(m.role == "user" for m in selected):
+            break
+        selected.append(message)
+    selected.reverse()
+
+    # A window starting with an answer lacks its question
+    while selected and selected[0].role != "user":
+        selected.pop(0)
+    return selected
+
+
+def history_window(messages: List[Message], token_budget: int) -> List[Dict]:
+    """
+    Build the verbatim chat history of the prompt.
+
+    Args:
+        messages: Latest messages of a session, oldest first
+        token_budget: Maximum estimated tokens of the history
+
+    Returns:
+        Chat history as role/content dicts, oldest first, starting with a
+        user message; answers of a latest turn over budget are truncated
+    """
+    selected = window_messages(messages, token_budget)
+    history = [{"role": m.role, "content": m.content} for m in selected]
+
+    overflow = sum(estimate_tokens(m["content"]) for m in history) - token_budget
+    if overflow > 0:
+        # Only a latest turn over budget gets here; shorten its answers
+        for entry in history:
+            if entry["role"] == "user" or overflow <= 0:
+                continue
+            tokens = estimate_tokens(entry["content"])
+            entry["content"] = truncate_to_tokens(entry["content"], max(tokens - overflow, 0))
+            overflow -= tokens - estimate_tokens(entry["content"])
+    return history
+
+
+class HistorySummarizer:
+    """Background updates of the rolling history summaries of sessions."""
+
+    def __init__(self, rag_service: RAGService) -> None:
+        self.rag_service = rag_service
+        self._running: Set[UUID] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, session_id: UUID) -> None:
+        """
+        Update the summary of a session in the background.
+
+        A session whose summary is already being updated is skipped; the
+        messages it missed are picked up after the next turn.
+
+        Args:
+            session_id: Session UUID
+        """
+        if session_id in self._running:
+            return
+        self._running.add(session_id)
+        task = asyncio.create_task(self._update(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, session_id: UUID) -> None:
+        """Fold the messages before the budgeted history window into the summary."""
+        try:
+            async with async_session_maker() as db_session:
+                session_repo = SessionRepository(db_session)
+                message_repo = MessageRepository(db_session)
+
+                session = await session_repo.get_by_id(session_id)
+                if not session:
+                    return
+                total = await message_repo.count_by_session(session_id)
+                # Everything before the window load_history selects, so no
+                # message is in neither the window nor the summary
+                recent = await message_repo.get_recent(session_id, verbatim_message_count())
+                window = window_messages(recent, settings.history_token_budget)
+                end = total - len(window)
+                pending = end - session.summary_message_count
+                if pending < settings.history_summary_min_messages:
+                    return
+
+                messages = await message_repo.get_range(
+                    session_id, session.summary_message_count, pending
+                )
+                summary = await self.rag_service.summarize_history(
+                    session.summary,
+                    [{"role": m.role, "content": m.content} for m in messages],
+                    settings.history_summary_max_tokens,
+                )
+                await session_repo.update_summary(
+                    session_id, summary, session.summary_message_count + len(messages)
+                )
+                logger.info(
+                    "Updated history summary",
+                    session_id=str(session_id),
+                    messages=session.summary_message_count + len(messages),
+                    summary_tokens=estimate_tokens(summary),
+                )
+        except Exception as e:
+            logger.warning("History summary update failed", session_id=str(session_id), error=str(e))
+        finally:
+            self._running.discard(session_id)
+
+
+async def load_history(
+    session_id: UUID,
+    summary: Optional[str],
+    message_repo: MessageRepository,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Load the prompt history of a session.
+
+    Args:
+        session_id: Session UUID
+        summary: Rolling summary stored on the session
+        message_repo: Message repository of the request
+
+    Returns:
+        Tuple of (chat_history, history_summary)
+    """
+    recent = await message_repo.get_recent(session_id, verbatim_message_count())
+    chat_history = history_window(recent, settings.history_token_budget)
+    return chat_history, summary if settings.history_summary_enabled else None
+
+
+# Singleton instance
+_history_summarizer: Optional[HistorySummarizer] = None
+
+
+def get_history_summarizer() -> HistorySummarizer:
+    """Get or create the history summarizer singleton."""
+    global _history_summarizer
+    if _history_summarizer is None:
+        _history_summarizer = HistorySummarizer(get_rag_service())
+    return _history_summarizer
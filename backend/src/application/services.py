@@ -1,6 +1,7 @@
 """
 Application services for business logic orchestration.
 """
+import asyncio
 from datetime import datetime
 from typing import AsyncGenerator, Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
@@ -8,26 +9,43 @@ from uuid import UUID, uuid4
 from structlog import get_logger
 
 from src.application.dtos import (
+    BatchRetrieveRequest,
+    BatchRetrieveResult,
     ChatRequest,
     ChatResponse,
+    DailyTokenUsageResponse,
     MessageResponse,
     ReferenceDocument,
     SessionCreate,
     SessionDetailResponse,
     SessionResponse,
+    SessionTokenUsageResponse,
     SessionUpdate,
     TokenUsage,
 )
+from src.application.dtos import RetrievalScope as RetrievalScopeDTO
+from src.application.history import get_history_summarizer, load_history
+from src.core.config import settings
 from src.domain.entities import Message, Session
 from src.infrastructure.ml.rag_service import RAGService, get_rag_service
+from src.infrastructure.ml.scope_index import RetrievalScope
+from src.infrastructure.ml.token_counting import estimate_tokens
 from src.infrastructure.repositories.session_repository import (
     MessageRepository,
     SessionRepository,
 )
+from src.infrastructure.repositories.token_usage_repository import TokenUsageRepository
 
 logger = get_logger()
 
 
+def to_retrieval_scope(scope: Optional[RetrievalScopeDTO]) -> Optional[RetrievalScope]:
+    """Convert a request scope for the RAG service."""
+    if not scope:
+        return None
+    return RetrievalScope(path_prefixes=scope.path_prefixes, tags=scope.tags)
+
+
 class SessionService:
     """Service for session management operations."""
 
@@ -199,6 +217,7 @@ class SessionService:
             created_at=message.created_at,
             token_usage=token_usage,
             references=references,
+            truncated=message.truncated,
         )
 
 
@@ -210,10 +229,12 @@ class ChatService:
         session_repo: SessionRepository,
         message_repo: MessageRepository,
         rag_service: RAGService,
+        usage_repo: TokenUsageRepository,
     ) -> None:
         self.session_repo = session_repo
         self.message_repo = message_repo
         self.rag_service = rag_service
+        self.usage_repo = usage_repo
 
     async def chat(self, request: ChatRequest) -> ChatResponse:
         """
@@ -228,12 +249,17 @@ class ChatService:
         # Get or create session
         session = None
         if request.session_id:
-            session = await self.session_repo.get_by_id(request.session_id, include_messages=True)
+            session = await self.session_repo.get_by_id(request.session_id)
 
         if not session:
             session = Session(title=self._generate_title(request.message))
             session = await self.session_repo.create(session)
 
+        # Get chat history: the latest turns within budget and a summary of the rest
+        chat_history, history_summary = await load_history(
+            session.id, session.summary, self.message_repo
+        )
+
         # Save user message
         user_message = Message(
             session_id=session.id,
@@ -242,16 +268,13 @@ class ChatService:
         )
         await self.message_repo.create(user_message)
 
-        # Get chat history
-        chat_history = [
-            {"role": m.role, "content": m.content}
-            for m in session.messages
-        ]
-
         # Query RAG
         answer, docs, token_usage = await self.rag_service.query(
             question=request.message,
             chat_history=chat_history,
+            scope=to_retrieval_scope(request.scope),
+            session_id=str(session.id),
+            history_summary=history_summary,
         )
 
         # Prepare references
@@ -260,6 +283,7 @@ class ChatService:
                 "source": doc.metadata.get("source"),
                 "content": doc.page_content[:200] + "...",
                 "metadata": doc.metadata,
+                "similarity_score": doc.metadata.get("similarity_score"),
             }
             for doc in docs
         ]
@@ -277,11 +301,14 @@ class ChatService:
             total_tokens=token_usage.get("total_tokens"),
             rag_references=references,
         )
+        # The message commits the usage rollups with it, in one transaction
+        await self.usage_repo.record(assistant_message)
         await self.message_repo.create(assistant_message)
 
         # Update session
         session.title = self._generate_title(request.message)
         await self.session_repo.update(session)
+        self._schedule_summary(session.id)
 
         # Convert to response
         ref_docs = [
@@ -289,6 +316,7 @@ class ChatService:
                 source=doc.metadata.get("source"),
                 content=doc.page_content,
                 metadata=doc.metadata,
+                similarity_score=doc.metadata.get("similarity_score"),
             )
             for doc in docs
         ]
@@ -317,16 +345,25 @@ class ChatService:
 
         Yields:
             Tuples of (content_chunk, references, token_usage)
+
+        When the stream is cancelled or closed early (the client
+        disconnected), the answer generated so far is saved marked as
+        truncated.
         """
         # Get or create session
         session = None
         if request.session_id:
-            session = await self.session_repo.get_by_id(request.session_id, include_messages=True)
+            session = await self.session_repo.get_by_id(request.session_id)
 
         if not session:
             session = Session(title=self._generate_title(request.message))
             session = await self.session_repo.create(session)
 
+        # Get chat history: the latest turns within budget and a summary of the rest
+        chat_history, history_summary = await load_history(
+            session.id, session.summary, self.message_repo
+        )
+
         # Save user message
         user_message = Message(
             session_id=session.id,
@@ -335,30 +372,47 @@ class ChatService:
         )
         await self.message_repo.create(user_message)
 
-        # Get chat history
-        chat_history = [
-            {"role": m.role, "content": m.content}
-            for m in session.messages
-        ]
-
         # Stream RAG response
         full_content = ""
         ref_docs = None
         token_usage = None
 
-        async for chunk, docs, tu in self.rag_service.stream_query(
-            question=request.message,
-            chat_history=chat_history,
-        ):
-            full_content += chunk or ""
-            if docs is not None:
-                ref_docs = docs
-            if tu is not None:
-                token_usage = tu
-
-            yield chunk, docs, tu
+        try:
+            async for chunk, docs, tu in self.rag_service.stream_query(
+                question=request.message,
+                chat_history=chat_history,
+                scope=to_retrieval_scope(request.scope),
+                session_id=str(session.id),
+                history_summary=history_summary,
+            ):
+                full_content += chunk or ""
+                if docs is not None:
+                    ref_docs = docs
+                if tu is not None:
+                    token_usage = tu
+
+                yield chunk, docs, tu
+        except (asyncio.CancelledError, GeneratorExit):
+            # Keep the part of the answer the user already saw
+            if full_content:
+                await self._save_streamed_answer(
+                    session, request, full_content, ref_docs, token_usage, truncated=True
+                )
+            raise
 
         # Save assistant message after stream completes
+        await self._save_streamed_answer(session, request, full_content, ref_docs, token_usage)
+
+    async def _save_streamed_answer(
+        self,
+        session: Session,
+        request: ChatRequest,
+        full_content: str,
+        ref_docs: Optional[List],
+        token_usage: Optional[Dict],
+        truncated: bool = False,
+    ) -> None:
+        """Save the assistant message of a streamed answer and update the session."""
         references = []
         if ref_docs:
             references = [
@@ -366,24 +420,45 @@ class ChatService:
                     "source": doc.metadata.get("source"),
                     "content": doc.page_content[:200] + "...",
                     "metadata": doc.metadata,
+                    "similarity_score": doc.metadata.get("similarity_score"),
                 }
                 for doc in ref_docs
             ]
 
+        token_usage = dict(token_usage or {})
+        if truncated:
+            # The provider reports usage only at the end of a stream
+            token_usage["output_tokens"] = estimate_tokens(full_content)
+            token_usage["total_tokens"] = (
+                (token_usage.get("input_tokens") or 0) + token_usage["output_tokens"]
+            )
+
         assistant_message = Message(
             id=uuid4(),
             session_id=session.id,
             role="assistant",
             content=full_content,
             created_at=datetime.utcnow(),
-            rag_tokens=token_usage.get("rag_tokens") if token_usage else None,
+            input_tokens=token_usage.get("input_tokens"),
+            output_tokens=token_usage.get("output_tokens"),
+            rag_tokens=token_usage.get("rag_tokens"),
+            total_tokens=token_usage.get("total_tokens"),
+            truncated=truncated,
             rag_references=references,
         )
+        # The message commits the usage rollups with it, in one transaction
+        await self.usage_repo.record(assistant_message)
         await self.message_repo.create(assistant_message)
 
         # Update session title
         session.title = self._generate_title(request.message)
         await self.session_repo.update(session)
+        self._schedule_summary(session.id)
+
+    def _schedule_summary(self, session_id: UUID) -> None:
+        """Fold older messages into the session summary in the background."""
+        if settings.history_summary_enabled:
+            get_history_summarizer().schedule(session_id)
 
     def _generate_title(self, message: str, max_length: int = 50) -> str:
         """Generate a session title from the first message."""
@@ -391,3 +466,100 @@ class ChatService:
         if len(message) > max_length:
             title += "..."
         return title or "New Conversation"
+
+
+class RetrievalService:
+    """Service for retrieval without generation or sessions."""
+
+    def __init__(self, rag_service: RAGService) -> None:
+        self.rag_service = rag_service
+
+    async def retrieve_batch(
+        self,
+        request: BatchRetrieveRequest,
+    ) -> AsyncGenerator[BatchRetrieveResult, None]:
+        """
+        Retrieve the chunks for every question of a batch.
+
+        Args:
+            request: Batch retrieval request
+
+        Yields:
+            One result per question, in question order
+        """
+        async for index, result in self.rag_service.retrieve_batch(
+            request.questions,
+            scope=to_retrieval_scope(request.scope),
+        ):
+            yield BatchRetrieveResult(
+                index=index,
+                question=request.questions[index],
+                mode=result.mode,
+                k=result.k,
+                candidates=result.candidates,
+                context_tokens=result.context_tokens,
+                tokens_saved=result.tokens_saved,
+                references=[
+                    ReferenceDocument(
+                        source=doc.metadata.get("source"),
+                        content=doc.page_content,
+                        metadata=doc.metadata,
+                        similarity_score=doc.metadata.get("similarity_score"),
+                    )
+                    for doc in result.documents
+                ],
+            )
+
+
+class UsageService:
+    """Service for token usage reports."""
+
+    def __init__(self, usage_repo: TokenUsageRepository) -> None:
+        self.usage_repo = usage_repo
+
+    async def daily(self, days: int) -> List[DailyTokenUsageResponse]:
+        """
+        Get the token usage per day.
+
+        Args:
+            days: Number of latest days, including today (UTC)
+
+        Returns:
+            Usage of the days with messages, newest first
+        """
+        rows = await self.usage_repo.get_daily(days)
+        return [
+            DailyTokenUsageResponse(
+                day=row.day,
+                messages=row.messages,
+                input_tokens=row.input_tokens,
+                output_tokens=row.output_tokens,
+                rag_tokens=row.rag_tokens,
+                total_tokens=row.total_tokens,
+            )
+            for row in rows
+        ]
+
+    async def top_sessions(self, limit: int) -> List[SessionTokenUsageResponse]:
+        """
+        Get the sessions that used the most tokens.
+
+        Args:
+            limit: Maximum number of sessions
+
+        Returns:
+            Session usage, most expensive first
+        """
+        sessions = await self.usage_repo.top_sessions(limit)
+        return [
+            SessionTokenUsageResponse(
+                session_id=s.id,
+                title=s.title,
+                updated_at=s.updated_at,
+                input_tokens=s.input_tokens,
+                output_tokens=s.output_tokens,
+                rag_tokens=s.rag_tokens,
+                total_tokens=s.total_tokens,
+            )
+            for s in sessions
+        ]
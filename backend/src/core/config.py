@@ -29,17 +29,137 @@ class Settings(BaseSettings):
     database_password: str = "6666"
     database_name: str = "postgres"
 
+    # Providers: "gemini", or "fake" to run offline (load tests, benchmarks)
+    llm_provider: str = "gemini"
+    embedding_provider: str = "gemini"
+
     # Gemini API
-    gemini_api_key: str
+    gemini_api_key: Optional[str] = None  # Required by the gemini providers
     gemini_model: str = "gemini-3.1-pro-preview"
+    embedding_model: str = "models/gemini-embedding-001"
+    embedding_dimensions: Optional[int] = None  # e.g. 768, 1536 or 3072; changing requires a rebuild
+
+    # Fake providers: deterministic answers with simulated latency, hashed-term embeddings
+    fake_llm_ttft_ms: float = 300.0  # Time to first token
+    fake_llm_tokens_per_second: float = 50.0
+    fake_llm_jitter: float = 0.2  # Relative random deviation of every delay
+    fake_llm_answer_tokens: int = 120
+    fake_embedding_dimensions: int = 768  # Used unless embedding_dimensions is set
 
     # Chroma DB
     chroma_persist_directory: str = "./chroma_db"
     chroma_collection_name: str = "zev_simple_rag_1_docs"
 
+    # Retrieval backend: "chroma" (HNSW) or "flat" (memory-mapped exact search)
+    retrieval_backend: str = "chroma"
+    # Flat backend only: prefilter on "int8" or "binary" codes and rescore at full precision
+    flat_index_quantization: str = "none"
+    flat_index_rescore_multiplier: int = 10  # Candidates rescored per result, trades latency for recall
+    # Quantized only: False writes just the codes and rescores with vectors fetched from Chroma,
+    # trading a lookup per search for the disk and page cache of the float32 matrix
+    flat_index_keep_full_precision: bool = True
+
+    # Retrieval policy: relevance floor, MMR diversity and context-token budget
+    retrieval_fetch_k: int = 20  # Candidates considered per question
+    retrieval_max_k: int = 6
+    retrieval_score_threshold: float = 0.4  # Minimum cosine similarity
+    retrieval_mmr_lambda: float = 0.7  # 1.0 = relevance only, 0.0 = diversity only
+    retrieval_context_token_budget: int = 800
+
+    # Prompt context assembly: merge overlapping chunks, drop repeated sentences
+    context_packing_enabled: bool = True
+    context_packing_token_budget: int = 1000  # Includes the per-passage source lines
+
+    # Hybrid search: BM25 lexical index fused with vector results by reciprocal rank
+    hybrid_search_enabled: bool = True
+    rrf_k: int = 60
+    lexical_fast_path_enabled: bool = True  # Retrieve identifier lookups without embedding the question
+    lexical_fast_path_min_coverage: float = 0.7  # IDF-weighted share of question terms in the top hit
+
+    # Batch retrieval endpoint
+    retrieve_batch_size: int = 64  # Questions embedded and searched together
+
     # Knowledge base
     knowledge_base_path: str = "./knowledge_base"
 
+    # Chunking (changing these requires a collection rebuild)
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+
+    # Small-to-big retrieval: chunks are cut from larger parent sections, which are
+    # what the LLM reads; e.g. chunk_size=400 with parent_chunk_size=2000 (requires a rebuild)
+    parent_chunk_size: Optional[int] = None  # None disables
+    parent_chunk_overlap: int = 0
+
+    # Near-duplicate chunk elimination at ingest time
+    dedup_enabled: bool = True
+    dedup_similarity_threshold: float = 0.95  # SimHash similarity, 1.0 = identical only
+
+    # Collection rebuilds
+    rebuild_on_config_change: bool = True  # Rebuild at startup if the index config changed
+    rebuild_retain_previous: bool = True  # Keep the replaced collection for rollback
+
+    # Ingestion pipeline
+    ingest_workers: Optional[int] = None  # Read/split processes, defaults to CPU count
+    ingest_batch_size: int = 100  # Chunks per embedding request
+    ingest_embedding_concurrency: int = 4  # Concurrent embedding requests
+
+    # Knowledge base watcher (live re-ingestion of changed files)
+    kb_watcher_enabled: bool = False
+    kb_watcher_debounce_ms: int = 2000
+
+    # Embedding cache (SQLite file, set to empty to disable)
+    embedding_cache_path: Optional[str] = "./cache/embedding_cache.sqlite3"
+    embedding_cache_max_mb: int = 1024
+
+    # Query embedding cache (in memory, set size to 0 to disable)
+    query_cache_size: int = 10000
+    query_cache_ttl_seconds: int = 3600
+    query_cache_spill_to_disk: bool = True  # Also store query vectors in the embedding cache
+
+    # Semantic answer cache for first-turn questions (off by default: a close
+    # embedding does not make two questions the same question)
+    answer_cache_enabled: bool = False
+    answer_cache_size: int = 1000
+    answer_cache_max_distance: float = 0.01  # Cosine distance to a cached question
+    answer_cache_require_same_text: bool = True  # Also require the same normalized question
+
+    # Share one retrieval and LLM call among identical concurrent first-turn questions
+    request_coalescing_enabled: bool = True
+
+    # Admission control of LLM and embedding calls: concurrency cap, rate limit,
+    # priority wait queue (chat before batch work) and jittered retries
+    admission_enabled: bool = True
+    llm_max_concurrency: int = 8
+    llm_rate_limit_per_second: float = 0.0  # 0 = no rate limit
+    llm_rate_limit_burst: int = 8
+    embedding_max_concurrency: int = 16
+    embedding_rate_limit_per_second: float = 0.0  # 0 = no rate limit
+    embedding_rate_limit_burst: int = 16
+    admission_max_queue: int = 256  # Calls waiting per provider before new ones are rejected
+    admission_max_retries: int = 3  # Retries of rate-limited or unavailable provider calls
+    admission_retry_base_delay: float = 0.5  # Seconds, doubled per retry
+    admission_retry_max_delay: float = 8.0
+
+    # How often a streaming chat checks whether its client is still connected
+    stream_disconnect_poll_seconds: float = 0.5
+
+    # Follow-up questions reuse the chunks retrieved for the previous turn of their session
+    follow_up_reuse_enabled: bool = True
+    follow_up_reuse_similarity: float = 0.85  # Cosine similarity to the previous question
+    follow_up_extend_similarity: float = 0.7  # Keep the previous chunks and add a few new ones
+    follow_up_hint_similarity: float = 0.5  # Extend threshold for questions like "show an example of it"
+    follow_up_extend_k: int = 2
+    follow_up_cache_sessions: int = 1000
+    follow_up_cache_ttl_seconds: int = 1800
+
+    # Chat history: latest turns verbatim, older ones in a rolling summary on the session
+    history_max_turns: int = 6
+    history_token_budget: int = 1500
+    history_summary_enabled: bool = True
+    history_summary_min_messages: int = 2  # Messages to collect before updating the summary
+    history_summary_max_tokens: int = 400
+
     # Token counting (optional - for LangSmith)
     langsmith_api_key: Optional[str] = None
     langsmith_tracing: bool = False
@@ -2,7 +2,7 @@
 Domain entities for the application.
 """
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional
 from uuid import UUID, uuid4
 
@@ -23,6 +23,9 @@ class Message:
     rag_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
 
+    # Answer cut short because the client disconnected
+    truncated: bool = False
+
     # RAG references
     rag_references: Optional[List[Dict]] = None
 
@@ -38,8 +41,30 @@ class Session:
     is_active: bool = True
     messages: List[Message] = field(default_factory=list)
 
+    # Rolling summary of the first summary_message_count messages
+    summary: Optional[str] = None
+    summary_message_count: int = 0
+
+    # Token usage of all messages of the session
+    input_tokens: int = 0
+    output_tokens: int = 0
+    rag_tokens: int = 0
+    total_tokens: int = 0
+
     def add_message(self, message: Message) -> None:
         """Add a message to the session."""
         message.session_id = self.id
         self.messages.append(message)
         self.updated_at = datetime.utcnow()
+
+
+@dataclass
+class TokenUsageDay:
+    """Token usage of all messages of one day (UTC)."""
+
+    day: date
+    messages: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    rag_tokens: int = 0
+    total_tokens: int = 0
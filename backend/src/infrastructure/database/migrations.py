@@ -0,0 +1,39 @@
+"""
+Additive schema upgrades for existing databases.
+
+Tables are created with metadata.create_all, which does not touch tables
+that already exist. Columns added to the models after a table was created
+are listed here and added at startup.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from structlog import get_logger
+
+logger = get_logger()
+
+# (table, column, column definition)
+ADDED_COLUMNS: List[Tuple[str, str, str]] = [
+    ("zev_simple_rag_1_sessions", "summary", "TEXT"),
+    ("zev_simple_rag_1_sessions", "summary_message_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("zev_simple_rag_1_sessions", "input_tokens", "BIGINT NOT NULL DEFAULT 0"),
+    ("zev_simple_rag_1_sessions", "output_tokens", "BIGINT NOT NULL DEFAULT 0"),
+    ("zev_simple_rag_1_sessions", "rag_tokens", "BIGINT NOT NULL DEFAULT 0"),
+    ("zev_simple_rag_1_sessions", "total_tokens", "BIGINT NOT NULL DEFAULT 0"),
+    ("zev_simple_rag_1_messages", "truncated", "BOOLEAN NOT NULL DEFAULT FALSE"),
+]
+
+
+async def add_missing_columns(conn: AsyncConnection) -> None:
+    """
+    Add the columns of ADDED_COLUMNS that an existing table lacks.
+
+    Args:
+        conn: Connection inside a transaction
+    """
+    for table, column, definition in ADDED_COLUMNS:
+        await conn.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}")
+        )
+    logger.debug("Database schema upgraded", columns=len(ADDED_COLUMNS))
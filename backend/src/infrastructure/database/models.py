@@ -2,14 +2,14 @@
 SQLAlchemy ORM models for the application.
 All tables are prefixed with 'zev_simple_rag_1_'.
 """
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 
 
 class Base(DeclarativeBase):
@@ -34,6 +34,16 @@ class SessionModel(Base):
     )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    # Rolling summary of the messages that no longer go into the prompt verbatim
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summary_message_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+    # Token usage rollup of all messages of the session
+    input_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    output_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    rag_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    total_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+
     # Relationships
     messages: Mapped[List["MessageModel"]] = relationship(
         "MessageModel", back_populates="session", cascade="all, delete-orphan", order_by="MessageModel.created_at"
@@ -60,8 +70,27 @@ class MessageModel(Base):
     rag_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     total_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
+    # Set when the client disconnected before the answer was complete
+    truncated: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false())
+
     # RAG references (stored as JSONB)
     rag_references: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
 
     # Relationships
     session: Mapped["SessionModel"] = relationship("SessionModel", back_populates="messages")
+
+
+class TokenUsageDailyModel(Base):
+    """
+    Token usage rollup per day (UTC).
+    Table name: zev_simple_rag_1_token_usage_daily
+    """
+
+    __tablename__ = "zev_simple_rag_1_token_usage_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    input_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    output_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    rag_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    total_tokens: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
@@ -0,0 +1,319 @@
+"""
+Admission control of outbound provider calls.
+
+Bursts of requests must not all hit the LLM or embedding provider at once,
+or the provider answers with rate-limit errors. Calls are admitted through
+a concurrency cap and a token-bucket rate limit; calls that cannot start
+right away wait in a bounded priority queue, interactive chat before batch
+work such as ingestion, batch retrieval and history summaries. Calls that
+fail with a rate-limit or unavailability error are retried with jittered
+exponential backoff.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from langchain_core.embeddings import Embeddings
+from structlog import get_logger
+
+from src.infrastructure.ml.embedding_cache import aembed_queries
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+# Queue priorities, lower is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# Provider errors worth retrying: rate limits and temporary unavailability
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_MARKERS = ("429", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "Too Many Requests", "rate limit")
+
+# Recent wait times kept for the percentiles in stats()
+WAIT_SAMPLES = 1024
+
+_priority: ContextVar[int] = ContextVar("admission_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def admission_priority(priority: int) -> Iterator[None]:
+    """Run the provider calls made inside the block at a queue priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check if a provider error is a rate limit or temporary outage."""
+    for attribute in ("status_code", "code"):
+        if getattr(error, attribute, None) in RETRYABLE_STATUS_CODES:
+            return True
+    message = str(error)
+    return any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when the wait queue of a provider is full."""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: rate calls per second, bursts up to capacity."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a call may start."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdmissionController:
+    """Concurrency cap, rate limit, priority wait queue and retries for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        rate_per_second: float = 0.0,
+        burst: int = 1,
+        max_retries: int = 0,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second > 0 else None
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.retries = 0
+        self.max_queue_depth = 0
+        self._active = 0
+        self._sequence = itertools.count()
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    async def call(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: Optional[int] = None,
+    ) -> T:
+        """
+        Run a provider call once admitted, retrying rate-limit errors.
+
+        Args:
+            call: Factory of the awaitable to run, called once per attempt
+            priority: Queue priority; defaults to the one of admission_priority
+
+        Returns:
+            Result of the call
+
+        Raises:
+            AdmissionRejected: If the wait queue is full
+        """
+        priority = _priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                error = e
+            finally:
+                self._release()
+            attempt += 1
+            await self._backoff(attempt, error)
+
+    async def stream(
+        self,
+        stream: Callable[[], AsyncIterator[T]],
+        priority: Optional[int] = None,
+    ) -> AsyncIterator[T]:
+        """
+        Iterate a provider stream once admitted.
+
+        The slot is held until the stream is exhausted or closed. A stream
+        that fails before its first item is retried; once items have been
+        passed on, errors are raised as they are.
+
+        Args:
+            stream: Factory of the async iterator, called once per attempt
+            priority: Queue priority; defaults to the one of admission_priority
+
+        Yields:
+            Items of the stream
+
+        Raises:
+            AdmissionRejected: If the wait queue is full
+        """
+        priority = _priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            iterator = stream()
+            started = False
+            try:
+                async for item in iterator:
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                error = e
+            finally:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                self._release()
+            attempt += 1
+            await self._backoff(attempt, error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue depth, wait times and counters of the controller."""
+        waits = sorted(self._waits)
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "wait_ms_p50": round(_percentile(waits, 0.5) * 1000, 1),
+            "wait_ms_p95": round(_percentile(waits, 0.95) * 1000, 1),
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
+
+    async def _acquire(self, priority: int) -> None:
+        """Take a concurrency slot and a rate-limit token, waiting in the queue if needed."""
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected(f"Too many queued {self.name} calls, try again later")
+            future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+            entry = (priority, next(self._sequence), future)
+            heapq.heappush(self._waiters, entry)
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before the cancellation
+                    self._release()
+                else:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+
+        if self.bucket is not None:
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self._release()
+                raise
+        self.admitted += 1
+        self._waits.append(time.monotonic() - start)
+
+    def _release(self) -> None:
+        """Hand the slot of a finished call to the first waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _backoff(self, attempt: int, error: Exception) -> None:
+        """Sleep before a retry: full jitter over an exponentially growing window."""
+        self.retries += 1
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+        logger.warning(
+            "Provider call failed, retrying",
+            provider=self.name,
+            attempt=attempt,
+            delay=round(delay, 2),
+            error=str(error),
+        )
+        await asyncio.sleep(delay)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Percentile of sorted values, 0 if there are none."""
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class AdmittedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that sends asynchronous calls through an admission controller.
+
+    Synchronous calls are passed through as they are.
+    """
+
+    def __init__(self, embeddings: Embeddings, admission: AdmissionController) -> None:
+        self.embeddings = embeddings
+        self.admission = admission
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.admission.call(lambda: self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.admission.call(lambda: self.embeddings.aembed_query(text))
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one admitted call."""
+        return await self.admission.call(lambda: aembed_queries(self.embeddings, texts))
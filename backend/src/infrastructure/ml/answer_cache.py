@@ -0,0 +1,155 @@
+"""
+Semantic answer cache.
+
+First-turn questions that are near-identical to a question answered before
+are served the stored answer and references instead of calling the LLM.
+Questions are compared by the cosine distance of their embeddings and, by
+default, must also have the same normalized text, since two questions a
+word apart can be close in embedding space yet ask different things. Every
+entry records the knowledge base version it was answered against and only
+matches while that version is current.
+"""
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.embedding_cache import normalize_query
+from src.infrastructure.ml.flat_index import normalize_rows
+
+# Approximate size of the content chunks a cached answer is replayed in
+REPLAY_CHUNK_CHARS = 64
+
+_WORD_RE = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class CachedAnswer:
+    """An answer stored in the semantic cache."""
+
+    question: str
+    answer: str
+    documents: List[Document]
+    token_usage: Dict
+    kb_version: int
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def replay_chunks(answer: str, chunk_chars: int = REPLAY_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Split a cached answer into stream-sized chunks on word boundaries.
+
+    Args:
+        answer: Full answer text
+        chunk_chars: Approximate chunk size in characters
+
+    Yields:
+        Consecutive chunks that concatenate to the answer
+    """
+    buffer = ""
+    for word in _WORD_RE.findall(answer):
+        buffer += word
+        if len(buffer) >= chunk_chars:
+            yield buffer
+            buffer = ""
+    if buffer:
+        yield buffer
+
+
+class SemanticAnswerCache:
+    """Bounded LRU cache of answers looked up by question embedding similarity."""
+
+    def __init__(self, max_entries: int, max_distance: float, require_same_text: bool = True) -> None:
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.require_same_text = require_same_text
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        # Slot positions, least recently used first
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+
+    def lookup(
+        self,
+        question: str,
+        question_vector: List[float],
+        kb_version: int,
+    ) -> Optional[CachedAnswer]:
+        """
+        Find the cached answer of the most similar question.
+
+        Args:
+            question: The new question
+            question_vector: Embedding of the new question
+            kb_version: Current knowledge base version
+
+        Returns:
+            Cached answer within the distance bound, for the same knowledge
+            base version and, if required, the same normalized question
+            text, or None
+        """
+        if self._vectors is None or not self._lru or len(question_vector) != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        query = normalize_rows(np.asarray(question_vector, dtype=np.float32))
+        scores = self._vectors @ query
+        scores[~self._used] = -np.inf
+        slot = int(np.argmax(scores))
+        entry = self._entries[slot]
+
+        if (
+            1.0 - float(scores[slot]) > self.max_distance
+            or entry.kb_version != kb_version
+            or (self.require_same_text and normalize_query(entry.question) != normalize_query(question))
+        ):
+            self.misses += 1
+            return None
+
+        self._lru.move_to_end(slot)
+        self.hits += 1
+        return entry
+
+    def put(self, question_vector: List[float], entry: CachedAnswer) -> None:
+        """
+        Store an answer, evicting the least recently used one when full.
+
+        Args:
+            question_vector: Embedding of the answered question
+            entry: Answer to store
+        """
+        if self._vectors is None or len(question_vector) != self._vectors.shape[1]:
+            self.clear()
+            self._vectors = np.zeros((self.max_entries, len(question_vector)), dtype=np.float32)
+
+        if len(self._lru) >= self.max_entries:
+            slot, _ = self._lru.popitem(last=False)
+        else:
+            slot = int(np.argmin(self._used))
+
+        self._vectors[slot] = normalize_rows(np.asarray(question_vector, dtype=np.float32))
+        self._used[slot] = True
+        self._entries[slot] = entry
+        self._lru[slot] = None
+
+    def clear(self) -> None:
+        """Drop all cached answers."""
+        self._used[:] = False
+        self._entries = [None] * self.max_entries
+        self._lru.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Get cache hit/miss counters and size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._lru),
+        }
@@ -0,0 +1,127 @@
+"""
+Registry of the physical Chroma collections behind the logical collection.
+
+Rebuilds fill a shadow collection and then switch the active pointer to it,
+keeping the previous collection around for rollback.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from structlog import get_logger
+
+logger = get_logger()
+
+REGISTRY_VERSION = 1
+
+
+@dataclass
+class CollectionInfo:
+    """A physical collection and the index configuration it was built with."""
+
+    name: str
+    config: Dict[str, Any] = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+class CollectionRegistry:
+    """Persisted active/previous pointers for blue/green collection rebuilds."""
+
+    def __init__(self, path: Path, base_name: str) -> None:
+        self.path = path
+        self.base_name = base_name
+        self.generation = 0
+        self.active: Optional[CollectionInfo] = None
+        self.previous: Optional[CollectionInfo] = None
+
+    @classmethod
+    def load(cls, path: Path, base_name: str) -> "CollectionRegistry":
+        """
+        Load the registry from disk.
+
+        Args:
+            path: Path of the registry JSON file
+            base_name: Logical collection name (settings.chroma_collection_name)
+
+        Returns:
+            Loaded registry; empty if the file does not exist yet
+        """
+        registry = cls(path, base_name)
+        if not path.exists():
+            return registry
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != REGISTRY_VERSION:
+                logger.warning("Ignoring collection registry with unknown version", path=str(path))
+                return registry
+            registry.generation = data.get("generation", 0)
+            if data.get("active"):
+                registry.active = CollectionInfo(**data["active"])
+            if data.get("previous"):
+                registry.previous = CollectionInfo(**data["previous"])
+        except Exception as e:
+            logger.warning("Failed to load collection registry", path=str(path), error=str(e))
+
+        return registry
+
+    def save(self) -> None:
+        """Atomically write the registry to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        data = {
+            "version": REGISTRY_VERSION,
+            "generation": self.generation,
+            "active": asdict(self.active) if self.active else None,
+            "previous": asdict(self.previous) if self.previous else None,
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def next_name(self) -> str:
+        """Reserve the name of the next shadow collection."""
+        self.generation += 1
+        return f"{self.base_name}_g{self.generation}"
+
+    def activate(self, info: CollectionInfo) -> Optional[CollectionInfo]:
+        """
+        Make a collection active, demoting the current one to previous.
+
+        Returns:
+            The collection that was previous before, which is no longer
+            reachable through the registry
+        """
+        dropped = self.previous
+        self.previous = self.active
+        self.active = info
+        return dropped
+
+    def rollback(self) -> CollectionInfo:
+        """
+        Swap the active and previous collections.
+
+        Raises:
+            ValueError: If there is no previous collection
+        """
+        if not self.previous:
+            raise ValueError("No previous collection to roll back to")
+        self.active, self.previous = self.previous, self.active
+        return self.active
+
+    def names(self) -> List[str]:
+        """Names of the collections referenced by the registry."""
+        return [info.name for info in (self.active, self.previous) if info]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the registry state."""
+        return {
+            "base_name": self.base_name,
+            "generation": self.generation,
+            "active": asdict(self.active) if self.active else None,
+            "previous": asdict(self.previous) if self.previous else None,
+        }
@@ -0,0 +1,228 @@
+"""
+Context assembly: turn retrieved chunks into the context of the prompt.
+
+Chunks are split with an overlap, so retrieval often returns neighbouring
+chunks of the same file that repeat each other's edges. Chunks of a source
+are merged into one passage by their start_index, sentences that already
+appeared earlier in the context are dropped, and the passages are packed
+into a token budget in retrieval order.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.embedding_cache import normalize_query
+from src.infrastructure.ml.token_counting import estimate_tokens, truncate_to_tokens
+
+# Chunks at most this many characters apart are merged; the splitter cuts at
+# blank lines and strips the whitespace between neighbouring chunks
+MERGE_GAP_CHARS = 16
+
+# Shorter sentences (headings, "Example:", ...) are never dropped as redundant
+MIN_REDUNDANT_SENTENCE_CHARS = 40
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
+
+
+@dataclass
+class Passage:
+    """Contiguous text of one source, assembled from one or more chunks."""
+
+    source: str
+    text: str
+    start: Optional[int] = None
+    rank: int = 0  # Retrieval rank of the best chunk
+    chunks: int = 1
+
+    @property
+    def end(self) -> Optional[int]:
+        """Offset after the last character of the passage in its source."""
+        return None if self.start is None else self.start + len(self.text)
+
+    def format(self) -> str:
+        """Render the passage for the prompt."""
+        return f"Source: {self.source}\n{self.text}"
+
+
+@dataclass
+class PackedContext:
+    """Context text of a prompt and the numbers behind it."""
+
+    text: str = ""
+    passages: List[Passage] = field(default_factory=list)
+    tokens: int = 0
+    tokens_saved: int = 0  # Compared to pasting every chunk in full
+
+
+def format_chunks(docs: List[Document]) -> str:
+    """Render chunks for the prompt as they are, one after the other."""
+    return "\n\n".join(
+        f"Source: {doc.metadata.get('source', 'unknown')}\n{doc.page_content}"
+        for doc in docs
+    )
+
+
+def merge_chunks(docs: List[Document]) -> List[Passage]:
+    """
+    Merge overlapping and adjacent chunks of the same source.
+
+    Args:
+        docs: Retrieved chunks, best first
+
+    Returns:
+        Passages ordered by their best-ranked chunk; chunks without a
+        start_index stay passages of their own
+    """
+    passages: List[Passage] = []
+    for rank, doc in enumerate(docs):
+        metadata = doc.metadata or {}
+        start = metadata.get("start_index")
+        passage = Passage(
+            source=metadata.get("source", "unknown"),
+            text=doc.page_content,
+            start=start if isinstance(start, int) and start >= 0 else None,
+            rank=rank,
+        )
+        # A merged passage may now bridge a gap to another one, so start over
+        i = 0
+        while i < len(passages):
+            combined = _merge_pair(passages[i], passage)
+            if combined is None:
+                i += 1
+            else:
+                passage = combined
+                del passages[i]
+                i = 0
+        passages.append(passage)
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def _merge_pair(first: Passage, second: Passage) -> Optional[Passage]:
+    """Merge two passages of a source if they overlap or touch."""
+    if first.source != second.source or first.start is None or second.start is None:
+        return None
+    if first.start > second.start:
+        first, second = second, first
+    if second.start > first.end + MERGE_GAP_CHARS:
+        return None
+
+    if second.end <= first.end:
+        text = first.text
+    elif second.start >= first.end:
+        text = first.text + "\n\n" + second.text
+    else:
+        text = first.text + second.text[first.end - second.start:]
+    return Passage(
+        source=first.source,
+        text=text,
+        start=first.start,
+        rank=min(first.rank, second.rank),
+        chunks=first.chunks + second.chunks,
+    )
+
+
+def drop_redundant_sentences(text: str, seen: Set[str]) -> str:
+    """
+    Remove sentences that already appeared in the context.
+
+    Code blocks are kept as they are.
+
+    Args:
+        text: Passage text
+        seen: Normalized sentences of the context so far; updated in place
+
+    Returns:
+        Text without the repeated sentences
+    """
+    lines: List[str] = []
+    in_code = False
+    for line in text.split("\n"):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+            lines.append(line)
+            continue
+        if in_code or not line.strip():
+            lines.append(line)
+            continue
+
+        sentences = _SENTENCE_END_RE.split(line)
+        kept = []
+        for sentence in sentences:
+            key = normalize_query(sentence)
+            if len(key) >= MIN_REDUNDANT_SENTENCE_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        if len(kept) == len(sentences):
+            lines.append(line)
+        elif any(sentence.strip() for sentence in kept):
+            lines.append(" ".join(kept))
+    return "\n".join(lines)
+
+
+class ContextPacker:
+    """Merge, deduplicate and budget retrieved chunks into the prompt context."""
+
+    def __init__(self, token_budget: int) -> None:
+        self.token_budget = token_budget
+
+    def pack(self, docs: List[Document]) -> PackedContext:
+        """
+        Assemble the prompt context from retrieved chunks.
+
+        Args:
+            docs: Retrieved chunks, best first
+
+        Returns:
+            Packed context; a passage that does not fit the budget is cut
+            to fit, preferably at a line or sentence end
+        """
+        result = PackedContext()
+        if not docs:
+            return result
+
+        seen: Set[str] = set()
+        remaining = self.token_budget
+        for passage in merge_chunks(docs):
+            passage.text = drop_redundant_sentences(passage.text, seen).strip()
+            if not passage.text:
+                continue
+            tokens = estimate_tokens(passage.format())
+            if tokens > remaining:
+                passage.text = _cut_to_tokens(passage.text, remaining - estimate_tokens(
+                    f"Source: {passage.source}\n"
+                ))
+                if not passage.text:
+                    break
+                tokens = estimate_tokens(passage.format())
+            result.passages.append(passage)
+            remaining -= tokens
+            if remaining <= 0:
+                break
+
+        result.text = "\n\n".join(passage.format() for passage in result.passages)
+        result.tokens = estimate_tokens(result.text)
+        result.tokens_saved = max(estimate_tokens(format_chunks(docs)) - result.tokens, 0)
+        return result
+
+
+def _cut_to_tokens(text: str, tokens: int) -> str:
+    """
+    Shorten a text to at most a number of tokens.
+
+    The cut is moved back to the last line or sentence end if that keeps
+    more than half of the text.
+    """
+    cut = truncate_to_tokens(text, tokens)
+    if cut == text:
+        return text
+    boundary = max(
+        cut.rfind("\n"),
+        max((match.start() for match in _SENTENCE_END_RE.finditer(cut)), default=-1),
+    )
+    if boundary > len(cut) // 2:
+        return cut[:boundary].rstrip()
+    return cut
@@ -0,0 +1,91 @@
+"""
+Near-duplicate chunk detection with SimHash.
+
+Each chunk is fingerprinted with a 64-bit SimHash over word shingles. Two
+chunks are near-duplicates when the Hamming distance between their
+fingerprints is small; the index finds candidates by bucketing fingerprint
+bands, which by the pigeonhole principle catches every pair within the
+configured distance.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str) -> int:
+    """
+    Compute the 64-bit SimHash fingerprint of a text.
+
+    Args:
+        text: Text to fingerprint
+
+    Returns:
+        Fingerprint as a non-negative integer
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) >= SHINGLE_SIZE:
+        shingles = {
+            " ".join(tokens[i:i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        }
+    else:
+        shingles = {" ".join(tokens)}
+
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for shingle in shingles
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, FINGERPRINT_BITS)
+    # Majority vote per bit position
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return (a ^ b).bit_count()
+
+
+def max_distance_for(threshold: float) -> int:
+    """Convert a similarity threshold in [0, 1] into a maximum Hamming distance."""
+    return int(round((1.0 - threshold) * FINGERPRINT_BITS))
+
+
+class SimHashIndex:
+    """In-memory index of fingerprints for near-duplicate lookups."""
+
+    def __init__(self, threshold: float) -> None:
+        self.max_distance = max_distance_for(threshold)
+        # One more band than the allowed distance guarantees a shared band
+        num_bands = min(self.max_distance + 1, FINGERPRINT_BITS)
+        edges = [round(i * FINGERPRINT_BITS / num_bands) for i in range(num_bands + 1)]
+        self._bands: List[Tuple[int, int]] = [
+            (start, (1 << (end - start)) - 1)
+            for start, end in zip(edges[:-1], edges[1:])
+        ]
+        self._buckets: List[Dict[int, List[Tuple[str, int]]]] = [{} for _ in self._bands]
+
+    def add(self, key: str, fingerprint: int) -> None:
+        """Add a fingerprint under a key (e.g. a chunk ID)."""
+        for bucket, (shift, mask) in zip(self._buckets, self._bands):
+            bucket.setdefault((fingerprint >> shift) & mask, []).append((key, fingerprint))
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """
+        Find a near-duplicate of a fingerprint.
+
+        Returns:
+            Key of a fingerprint within the maximum distance, or None
+        """
+        for bucket, (shift, mask) in zip(self._buckets, self._bands):
+            for key, candidate in bucket.get((fingerprint >> shift) & mask, ()):
+                if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                    return key
+        return None
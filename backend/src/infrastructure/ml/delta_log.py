@@ -0,0 +1,83 @@
+"""
+Append-only change log of the indexes derived from a collection.
+
+Rebuilding the BM25, scope and flat indexes from the whole collection after
+every ingestion makes a one-file edit cost as much as a full export. Instead,
+the chunks an ingestion run wrote and deleted are appended as one JSON line
+to a log next to the index file, and readers apply the lines they have not
+seen yet on top of the loaded index. Every index build stamps the index file
+with a new build ID and starts a new log; lines of other builds are skipped,
+so a reader never applies changes to the wrong base. Once the log covers a
+sizeable share of the index, the next update rebuilds it instead.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+# The log is folded into a rebuild once it changed this many rows, or this
+# share of the rows of the index, whichever is larger
+COMPACT_MIN_ROWS = 1000
+COMPACT_RATIO = 0.2
+
+
+def should_compact(delta_rows: int, total_rows: int) -> bool:
+    """Check if an index has taken enough changes to be rebuilt instead."""
+    return delta_rows > max(COMPACT_MIN_ROWS, COMPACT_RATIO * total_rows)
+
+
+class DeltaLog:
+    """JSON-lines log of changes on top of one build of an index file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._offset = 0
+
+    def append(self, build_id: str, record: Dict[str, Any]) -> None:
+        """
+        Append a change record.
+
+        Args:
+            build_id: Build of the index the change applies to
+            record: JSON-serializable change
+        """
+        line = json.dumps({"build": build_id, **record}, ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def read_new(self, build_id: str) -> List[Dict[str, Any]]:
+        """
+        Read the records appended since the last call.
+
+        A line still being written is left for the next call.
+
+        Args:
+            build_id: Build of the loaded index; records of others are skipped
+
+        Returns:
+            New records of the build, oldest first
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+
+        records = []
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            if record.pop("build", None) == build_id:
+                records.append(record)
+        return records
+
+    def rewind(self) -> None:
+        """Read the log from the start again, after the index was reloaded."""
+        self._offset = 0
+
+    def clear(self) -> None:
+        """Delete the log, once a new build of the index is in place."""
+        self.path.unlink(missing_ok=True)
+        self._offset = 0
+
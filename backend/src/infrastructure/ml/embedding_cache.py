@@ -0,0 +1,439 @@
+"""
+Embedding caches.
+
+Embeddings are persisted in a single SQLite file keyed by
+(model name, dimensionality, embedding kind, sha256 of the text), so that
+rebuilding or re-creating a collection over an unchanged corpus does not
+call the embedding provider again. Query embeddings additionally go through
+a bounded in-memory LRU/TTL cache on the chat critical path.
+"""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from structlog import get_logger
+
+logger = get_logger()
+
+# Embedding kinds: providers embed documents and queries differently
+KIND_DOCUMENT = "document"
+KIND_QUERY = "query"
+
+
+def hash_text(text: str) -> str:
+    """Compute the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Size-bounded SQLite store of embedding vectors with LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, kind, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def get_many(
+        self,
+        model: str,
+        dimensions: int,
+        kind: str,
+        text_hashes: List[str],
+    ) -> Dict[str, List[float]]:
+        """
+        Look up cached vectors.
+
+        Args:
+            model: Embedding model name
+            dimensions: Output dimensionality (0 for the model default)
+            kind: Embedding kind (document or query)
+            text_hashes: SHA-256 digests of the texts
+
+        Returns:
+            Mapping of text hash -> vector for the hashes found
+        """
+        found: Dict[str, List[float]] = {}
+        if not text_hashes:
+            return found
+
+        unique = list(dict.fromkeys(text_hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND kind = ? "
+                    f"AND text_hash IN ({placeholders})",
+                    (model, dimensions, kind, *chunk),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND dimensions = ? AND kind = ? AND text_hash = ?",
+                    [(now, model, dimensions, kind, h) for h in found],
+                )
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: int,
+        kind: str,
+        items: Dict[str, List[float]],
+    ) -> None:
+        """
+        Store vectors and evict the least recently used ones over the size bound.
+
+        Args:
+            model: Embedding model name
+            dimensions: Output dimensionality (0 for the model default)
+            kind: Embedding kind (document or query)
+            items: Mapping of text hash -> vector
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model, dimensions, kind, text_hash, array("f", vector).tobytes(), now)
+            for text_hash, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, dimensions, kind, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._total_bytes += sum(len(row[4]) for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Get cache hit/miss counters and size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_bytes": self._total_bytes,
+        }
+
+    def _evict(self) -> None:
+        """Delete the least recently used rows until 90% of the size bound."""
+        target = int(self.max_bytes * 0.9)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+
+            to_delete = []
+            for rowid, size in rows:
+                to_delete.append((rowid,))
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+            evicted += len(to_delete)
+
+        logger.info("Evicted embeddings from cache", count=evicted, size_bytes=self._total_bytes)
+
+
+async def aembed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several queries, in a single provider request where possible.
+
+    The LangChain interface only embeds queries one at a time; wrappers in
+    this package expose aembed_queries, and Gemini accepts a batch of texts
+    with the query task type.
+
+    Args:
+        embeddings: Embeddings to use
+        texts: Query texts
+
+    Returns:
+        One vector per text
+    """
+    if not texts:
+        return []
+    if hasattr(embeddings, "aembed_queries"):
+        return await embeddings.aembed_queries(texts)
+    if isinstance(embeddings, GoogleGenerativeAIEmbeddings):
+        return await embeddings.aembed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return list(await asyncio.gather(*(embeddings.aembed_query(text) for text in texts)))
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a question so that trivially different spellings share a key."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Bounded in-memory LRU cache of query embeddings with a time-to-live."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """Get a vector, refreshing its recency; expired entries count as misses."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: List[float]) -> None:
+        """Store a vector, evicting the least recently used entries over the bound."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Get cache hit/miss counters and size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from caches.
+
+    Documents are cached in the on-disk EmbeddingCache. Queries are looked up
+    in the in-memory QueryEmbeddingCache first, keyed on the normalized
+    question, and optionally spill to the on-disk cache so that hits survive
+    restarts.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        cache: Optional[EmbeddingCache] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        spill_queries: bool = True,
+        dimensions: Optional[int] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.query_cache = query_cache
+        self.spill_queries = spill_queries
+        self.dimensions = dimensions or 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, calling the provider only for uncached texts."""
+        if not self.cache:
+            return self.embeddings.embed_documents(texts)
+
+        hashes = [hash_text(t) for t in texts]
+        found = self.cache.get_many(self.model, self.dimensions, KIND_DOCUMENT, hashes)
+        missing = self._missing(texts, hashes, found)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, self.dimensions, KIND_DOCUMENT, computed)
+            found.update(computed)
+        return [found[h] for h in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embed documents, calling the provider only for uncached texts."""
+        if not self.cache:
+            return await self.embeddings.aembed_documents(texts)
+
+        hashes = [hash_text(t) for t in texts]
+        found = await asyncio.to_thread(
+            self.cache.get_many, self.model, self.dimensions, KIND_DOCUMENT, hashes
+        )
+        missing = self._missing(texts, hashes, found)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(
+                self.cache.put_many, self.model, self.dimensions, KIND_DOCUMENT, computed
+            )
+            found.update(computed)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, serving it from the caches when possible."""
+        key = self._query_key(text)
+        vector = self.query_cache.get(key) if self.query_cache else None
+        if vector is not None:
+            return vector
+
+        if self._spills():
+            found = self.cache.get_many(self.model, self.dimensions, KIND_QUERY, [key])
+            vector = found.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            if self._spills():
+                self.cache.put_many(self.model, self.dimensions, KIND_QUERY, {key: vector})
+
+        if self.query_cache:
+            self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronously embed a query, serving it from the caches when possible."""
+        key = self._query_key(text)
+        vector = self.query_cache.get(key) if self.query_cache else None
+        if vector is not None:
+            return vector
+
+        if self._spills():
+            found = await asyncio.to_thread(
+                self.cache.get_many, self.model, self.dimensions, KIND_QUERY, [key]
+            )
+            vector = found.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            if self._spills():
+                await asyncio.to_thread(
+                    self.cache.put_many, self.model, self.dimensions, KIND_QUERY, {key: vector}
+                )
+
+        if self.query_cache:
+            self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embed several queries, batching the uncached ones."""
+        keys = [self._query_key(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        if self.query_cache:
+            for key in dict.fromkeys(keys):
+                vector = self.query_cache.get(key)
+                if vector is not None:
+                    found[key] = vector
+
+        if self._spills():
+            remaining = [key for key in dict.fromkeys(keys) if key not in found]
+            if remaining:
+                found.update(await asyncio.to_thread(
+                    self.cache.get_many, self.model, self.dimensions, KIND_QUERY, remaining
+                ))
+
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = await aembed_queries(self.embeddings, list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            if self._spills():
+                await asyncio.to_thread(
+                    self.cache.put_many, self.model, self.dimensions, KIND_QUERY, computed
+                )
+            found.update(computed)
+
+        if self.query_cache:
+            for key in dict.fromkeys(keys):
+                self.query_cache.put(key, found[key])
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, Optional[Dict[str, float]]]:
+        """Get the counters of the underlying caches."""
+        return {
+            "disk": self.cache.stats() if self.cache else None,
+            "query": self.query_cache.stats() if self.query_cache else None,
+        }
+
+    def _spills(self) -> bool:
+        """Whether query embeddings are also stored in the on-disk cache."""
+        return self.cache is not None and self.spill_queries
+
+    def _query_key(self, text: str) -> str:
+        """Cache key of a query: the model is part of the disk key and the wrapper."""
+        return hash_text(normalize_query(text))
+
+    def _missing(
+        self,
+        texts: List[str],
+        hashes: List[str],
+        found: Dict[str, List[float]],
+    ) -> Dict[str, str]:
+        """Map the hashes of uncached texts to their (deduplicated) texts."""
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found and text_hash not in missing:
+                missing[text_hash] = text
+        return missing
@@ -0,0 +1,196 @@
+"""
+Offline stand-ins for the LLM and embedding providers.
+
+They make the whole request path, streaming and ingestion included, run
+without network access or an API key, e.g. for load tests and benchmarks.
+The chat model answers with words taken from its prompt at a configurable
+time-to-first-token and token rate; the embeddings hash the terms of a text
+into a fixed number of dimensions, so texts sharing terms get similar vectors
+and retrieval still behaves like retrieval.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.infrastructure.ml.lexical_index import tokenize
+from src.infrastructure.ml.token_counting import estimate_tokens
+
+
+def _seed(text: str) -> int:
+    """Stable seed of a text, independent of PYTHONHASHSEED."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Plain text of a message, whether its content is a string or a list of parts."""
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in message.content
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model with simulated latency.
+
+    The same prompt always gets the same answer; only the timing is jittered.
+    Responses carry usage metadata like a real provider's.
+    """
+
+    ttft_ms: float = 300.0  # Time to first token
+    tokens_per_second: float = 50.0
+    jitter: float = 0.2  # Relative random deviation of every delay
+    answer_tokens: int = 120  # Words per answer
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> List[str]:
+        """Pieces of the answer to a prompt, one per streamed token."""
+        prompt = "\n".join(_message_text(message) for message in messages)
+        words = prompt.split() or ["answer"]
+        rng = random.Random(_seed(prompt))
+        return [
+            ("" if i == 0 else " ") + rng.choice(words)
+            for i in range(self.answer_tokens)
+        ]
+
+    def _usage(self, messages: List[BaseMessage], answer: str) -> dict:
+        """Usage metadata of a response."""
+        input_tokens = sum(estimate_tokens(_message_text(message)) for message in messages)
+        output_tokens = estimate_tokens(answer)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _delay(self, seconds: float) -> float:
+        """Jitter a delay."""
+        return max(seconds * (1 + random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def _token_interval(self) -> float:
+        """Delay between two streamed tokens."""
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _result(self, messages: List[BaseMessage], pieces: List[str]) -> ChatResult:
+        """Wrap a complete answer."""
+        answer = "".join(pieces)
+        message = AIMessage(content=answer, usage_metadata=self._usage(messages, answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        pieces = self._answer(messages)
+        time.sleep(self._delay(self.ttft_ms / 1000 + len(pieces) * self._token_interval()))
+        return self._result(messages, pieces)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        pieces = self._answer(messages)
+        await asyncio.sleep(self._delay(self.ttft_ms / 1000 + len(pieces) * self._token_interval()))
+        return self._result(messages, pieces)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        pieces = self._answer(messages)
+        time.sleep(self._delay(self.ttft_ms / 1000))
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self._delay(self._token_interval()))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        usage = self._usage(messages, "".join(pieces))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = self._answer(messages)
+        await asyncio.sleep(self._delay(self.ttft_ms / 1000))
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(self._delay(self._token_interval()))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        # Like real providers, usage metadata comes with the last chunk
+        usage = self._usage(messages, "".join(pieces))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic embeddings from hashed terms (the hashing trick).
+
+    Every index term of a text adds +1 or -1 to one dimension chosen by its
+    hash; vectors are L2-normalized. Texts without terms get a fixed vector.
+    """
+
+    def __init__(self, dimensions: int) -> None:
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        """Embed one text."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in tokenize(text):
+            seed = _seed(term)
+            vector[seed % self.dimensions] += 1.0 if seed >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    # Hashing is cheap, so skip the thread pool of the default async methods
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
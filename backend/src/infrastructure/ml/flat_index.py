@@ -0,0 +1,635 @@
+"""
+In-process, memory-mapped flat vector index.
+
+The embeddings of a collection are mirrored into a float32 ``.npy`` matrix of
+L2-normalized rows, described by a JSON sidecar holding the matrix file name
+and the chunk ID of every row. Every build writes a new matrix file and then
+atomically replaces the sidecar, so readers always see a matching pair. The
+matrix is opened with ``mmap_mode="r"`` so uvicorn workers on the same host
+share one copy through the page cache. Chunk texts and metadata are not
+copied into the index; those of the top-k rows are fetched from the Chroma
+collection. Ingestion runs append the vectors they wrote and the IDs they
+deleted to a delta log (see delta_log), which readers keep in memory on top
+of the mapped matrix until the next rebuild. Top-k is an exact cosine search
+with ``argpartition``, which for corpora of this size is faster and has a
+more predictable tail latency than going through HNSW.
+
+Optionally the index also keeps compact quantized codes of the rows, int8
+(one byte per dimension) or binary (one bit per dimension). Searches then
+prefilter all rows on the codes and rescore only a small candidate set
+against the full-precision rows, so the float32 matrix is paged in for those
+rows only. The matrix can also be left out, so that only the codes take disk
+and memory; the candidates are then rescored with their vectors fetched from
+the Chroma collection, which adds a lookup to every search.
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from structlog import get_logger
+
+from src.infrastructure.ml.delta_log import DeltaLog, should_compact
+
+logger = get_logger()
+
+EXPORT_PAGE_SIZE = 5000
+
+# Quantization modes
+QUANTIZATION_NONE = "none"
+QUANTIZATION_INT8 = "int8"
+QUANTIZATION_BINARY = "binary"
+
+# Rows scored per block when prefiltering, bounds the temporary memory
+PREFILTER_BLOCK_ROWS = 16384
+
+# Queries scored per matrix product in multi-query searches
+QUERY_BLOCK_SIZE = 64
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix, leaving zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def int8_scales(matrix: np.ndarray) -> np.ndarray:
+    """Per-dimension scales mapping the value range of a matrix onto int8."""
+    scales = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1])
+    scales[scales == 0] = 1.0
+    return scales.astype(np.float32)
+
+
+def quantize(
+    matrix: np.ndarray,
+    quantization: str,
+    scales: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Quantize the rows of a matrix.
+
+    Args:
+        matrix: Float matrix, one vector per row
+        quantization: QUANTIZATION_INT8 or QUANTIZATION_BINARY
+        scales: Per-dimension int8 scales, see int8_scales
+
+    Returns:
+        int8 codes of the same shape, or sign bits packed into uint8
+    """
+    if quantization == QUANTIZATION_INT8:
+        return np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    if quantization == QUANTIZATION_BINARY:
+        return np.packbits(matrix > 0, axis=-1)
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+class FlatVectorIndex:
+    """Exact cosine top-k over a memory-mapped float32 matrix."""
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        quantization: str = QUANTIZATION_NONE,
+        rescore_multiplier: int = 10,
+        vector_store: Optional[Chroma] = None,
+        keep_full_precision: bool = True,
+    ) -> None:
+        """
+        Args:
+            directory: Directory of the index files
+            name: Name of the collection the index mirrors
+            quantization: Prefilter on "int8" or "binary" codes, or "none"
+                          for an exact search over all rows
+            rescore_multiplier: Candidates rescored at full precision per
+                                requested result when quantized
+            vector_store: Collection the texts and metadata of search
+                          results are fetched from
+            keep_full_precision: Whether to write the float32 matrix when
+                                 quantized; without it, candidates are
+                                 rescored with vectors from vector_store
+        """
+        if quantization not in (QUANTIZATION_NONE, QUANTIZATION_INT8, QUANTIZATION_BINARY):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.directory = directory
+        self.name = name
+        self.quantization = quantization
+        self.rescore_multiplier = rescore_multiplier
+        self.vector_store = vector_store
+        self.keep_full_precision = keep_full_precision or quantization == QUANTIZATION_NONE
+        self.meta_path = directory / f"{name}_flat.json"
+        self.delta = DeltaLog(directory / f"{name}_flat.delta.jsonl")
+        self._build_id: Optional[str] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._dimensions = 0
+        # Rows added by the delta log after the matrix was built, and their codes
+        self._tail: Optional[np.ndarray] = None
+        self._tail_codes: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._live: np.ndarray = np.zeros(0, dtype=bool)
+        self._row_of: Dict[str, int] = {}
+        self._delta_rows = 0
+        self._loaded_mtime_ns: Optional[int] = None
+
+    def exists(self) -> bool:
+        """Check if the index files exist on disk."""
+        return self.meta_path.exists()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def build_from_store(self, vector_store: Chroma) -> int:
+        """
+        Mirror a Chroma collection into the index files.
+
+        The matrix and codes go to new files and the sidecar is renamed into
+        place, so readers in other processes never see a half-written index.
+
+        Args:
+            vector_store: Collection to export
+
+        Returns:
+            Number of vectors written
+        """
+        ids: List[str] = []
+        vectors: List[np.ndarray] = []
+
+        offset = 0
+        while True:
+            page = vector_store.get(
+                limit=EXPORT_PAGE_SIZE,
+                offset=offset,
+                include=["embeddings"],
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+
+        matrix = (
+            normalize_rows(np.vstack(vectors)).astype(np.float32)
+            if vectors
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        build_id = uuid.uuid4().hex
+        matrix_file = None
+        if self.keep_full_precision:
+            matrix_file = f"{self.name}_flat_{build_id}.npy"
+            np.save(self.directory / matrix_file, matrix)
+        meta: Dict[str, Any] = {
+            "build": build_id,
+            "matrix": matrix_file,
+            "dimensions": matrix.shape[1],
+            "quantization": self.quantization,
+        }
+
+        if self.quantization != QUANTIZATION_NONE:
+            codes_file = f"{self.name}_flat_{build_id}_{self.quantization}.npy"
+            scales = int8_scales(matrix) if self.quantization == QUANTIZATION_INT8 else None
+            np.save(self.directory / codes_file, quantize(matrix, self.quantization, scales))
+            meta["codes"] = codes_file
+            meta["scales"] = scales.tolist() if scales is not None else None
+
+        meta["ids"] = ids
+        tmp_meta = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, self.meta_path)
+        self.delta.clear()
+        self._remove_matrices(keep={matrix_file, meta.get("codes")})
+
+        logger.info("Flat vector index built", path=str(self.meta_path), vectors=len(ids))
+        return len(ids)
+
+    def update_from_store(
+        self,
+        vector_store: Chroma,
+        written_ids: List[str],
+        deleted_ids: List[str],
+    ) -> None:
+        """
+        Apply the chunks an ingestion run wrote and deleted to the index.
+
+        Only the vectors of the written chunks are read; the change is
+        appended to the delta log. After many changes the index is rebuilt
+        instead.
+
+        Args:
+            vector_store: Collection the index mirrors
+            written_ids: Chunks added or replaced
+            deleted_ids: Chunks removed
+        """
+        self.refresh()
+        if self._build_id is None or should_compact(
+            self._delta_rows + len(written_ids) + len(deleted_ids), len(self)
+        ):
+            self.build_from_store(vector_store)
+            return
+
+        added = []
+        for start in range(0, len(written_ids), EXPORT_PAGE_SIZE):
+            page = vector_store.get(
+                ids=written_ids[start:start + EXPORT_PAGE_SIZE], include=["embeddings"]
+            )
+            if not page["ids"]:
+                continue
+            vectors = normalize_rows(np.asarray(page["embeddings"], dtype=np.float32))
+            added.extend(
+                {"id": chunk_id, "vector": vector.tolist()}
+                for chunk_id, vector in zip(page["ids"], vectors)
+            )
+
+        removed = [i for i in dict.fromkeys(deleted_ids + written_ids) if i in self._row_of]
+        if not added and not removed:
+            return
+        self.delta.append(self._build_id, {"removed": removed, "added": added})
+        self.refresh()
+        logger.info(
+            "Flat vector index updated",
+            path=str(self.meta_path),
+            added=len(added),
+            removed=len(removed),
+        )
+
+    def refresh(self) -> None:
+        """(Re)load the index if it was rebuilt on disk, and apply new changes."""
+        try:
+            mtime_ns = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._loaded_mtime_ns:
+            self._load()
+            self._loaded_mtime_ns = mtime_ns
+
+        for record in self.delta.read_new(self._build_id):
+            self._apply(record)
+
+    def _load(self) -> None:
+        """Map the matrix and codes of the current build and load its sidecar."""
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._build_id = meta.get("build")
+        self._ids = list(meta["ids"])
+        self._matrix = None
+        if meta["matrix"]:
+            self._matrix = np.load(self.directory / meta["matrix"], mmap_mode="r")
+        # Builds from before the matrix could be left out have no dimensions
+        self._dimensions = meta["dimensions"] if "dimensions" in meta else self._matrix.shape[1]
+        self._codes = self._scales = None
+        if self.quantization != QUANTIZATION_NONE:
+            self._load_codes(meta)
+        if self._matrix is None and self._codes is None:
+            # Built without the matrix and no longer quantized
+            self._matrix = self._fetch_vectors(self._ids)
+            logger.warning(
+                "Flat index has no full-precision matrix, loaded the vectors from the collection",
+                path=str(self.meta_path),
+            )
+        self._live = np.ones(len(self._ids), dtype=bool)
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._tail = self._tail_codes = None
+        self._delta_rows = 0
+        self.delta.rewind()
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Apply a change record: tombstone removed rows, append added ones."""
+        for chunk_id in record["removed"]:
+            row = self._row_of.pop(chunk_id, None)
+            if row is not None:
+                self._live[row] = False
+
+        if record["added"]:
+            vectors = np.asarray([entry["vector"] for entry in record["added"]], dtype=np.float32)
+            first = len(self._ids)
+            for offset, entry in enumerate(record["added"]):
+                self._ids.append(entry["id"])
+                self._row_of[entry["id"]] = first + offset
+            self._live = np.concatenate([self._live, np.ones(len(vectors), dtype=bool)])
+            self._tail = vectors if self._tail is None else np.vstack([self._tail, vectors])
+            if self._codes is not None:
+                codes = quantize(vectors, self.quantization, self._scales)
+                self._tail_codes = (
+                    codes if self._tail_codes is None else np.concatenate([self._tail_codes, codes])
+                )
+        self._delta_rows += len(record["removed"]) + len(record["added"])
+
+    def _load_codes(self, meta: Dict[str, Any]) -> None:
+        """Load the quantized codes of a build, or derive them if it has none."""
+        if meta.get("quantization") == self.quantization and meta.get("codes"):
+            self._codes = np.load(self.directory / meta["codes"], mmap_mode="r")
+            if meta.get("scales") is not None:
+                self._scales = np.asarray(meta["scales"], dtype=np.float32)
+            return
+
+        # Built with another quantization setting: quantize in memory
+        if self._matrix is not None:
+            matrix = np.asarray(self._matrix)
+        else:
+            matrix = self._fetch_vectors(self._ids)
+        if self.quantization == QUANTIZATION_INT8 and matrix.size:
+            self._scales = int8_scales(matrix)
+        self._codes = quantize(matrix, self.quantization, self._scales) if matrix.size else None
+        logger.info(
+            "Quantized flat index in memory",
+            path=str(self.meta_path),
+            quantization=self.quantization,
+        )
+
+    def drop(self) -> None:
+        """Delete the index files and the delta log."""
+        self.meta_path.unlink(missing_ok=True)
+        self.delta.clear()
+        self._remove_matrices()
+
+    def _remove_matrices(self, keep: Optional[Set[str]] = None) -> None:
+        """
+        Delete matrix and code files of previous builds.
+
+        Workers that still map an old file keep reading it until they reload;
+        where the OS refuses to delete a mapped file it is retried next build.
+        """
+        for path in self.directory.glob(f"{self.name}_flat_*.npy"):
+            if keep and path.name in keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def search(
+        self,
+        query_vector: List[float],
+        k: int = 4,
+        candidate_rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Find the k most similar chunks to a query vector.
+
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            candidate_rows: Optional row positions to restrict the search to
+
+        Returns:
+            List of (document, cosine similarity), best first
+        """
+        rows, scores = self._top_rows(query_vector, k, candidate_rows)
+        documents = self._documents_at(rows)
+        return [
+            (documents[chunk_id], float(score))
+            for chunk_id, score in zip(self._ids_at(rows), scores)
+            if chunk_id in documents
+        ]
+
+    def search_ids(self, query_vector: List[float], k: int = 4) -> List[Tuple[str, float]]:
+        """
+        Find the chunk IDs of the k most similar chunks, without fetching them.
+
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (chunk ID, cosine similarity), best first
+        """
+        rows, scores = self._top_rows(query_vector, k)
+        return list(zip(self._ids_at(rows), (float(score) for score in scores)))
+
+    def search_with_vectors(
+        self,
+        query_vector: List[float],
+        k: int,
+        candidate_rows: Optional[np.ndarray] = None,
+    ) -> Tuple[List[Document], np.ndarray]:
+        """
+        Find the k most similar chunks together with their (normalized) vectors.
+
+        Args:
+            query_vector: Query embedding
+            k: Number of results
+            candidate_rows: Optional row positions to restrict the search to
+
+        Returns:
+            Tuple of (documents best first, matrix of their vectors)
+        """
+        rows, _ = self._top_rows(query_vector, k, candidate_rows)
+        return self._with_vectors(rows, self._documents_at(rows))
+
+    def search_many_with_vectors(
+        self,
+        query_vectors: List[List[float]],
+        k: int,
+        candidate_rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[List[Document], np.ndarray]]:
+        """
+        Find the k most similar chunks of several queries at once.
+
+        Exact searches score all queries with one matrix product per block
+        of queries; quantized searches prefilter each query separately.
+
+        Args:
+            query_vectors: Query embeddings
+            k: Number of results per query
+            candidate_rows: Optional row positions to restrict the search to
+
+        Returns:
+            One (documents best first, matrix of their vectors) per query
+        """
+        self.refresh()
+        if self._codes is not None and candidate_rows is None:
+            return [self.search_with_vectors(vector, k) for vector in query_vectors]
+
+        empty = ([], np.zeros((0, 0), dtype=np.float32))
+        if not len(self) or not query_vectors:
+            return [empty for _ in query_vectors]
+
+        live = self._live if candidate_rows is None else self._live[candidate_rows]
+        k = min(k, int(live.sum()))
+        if k <= 0:
+            return [empty for _ in query_vectors]
+
+        queries = normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+        ranked_rows = []
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            # (rows, queries) scores of a block of queries
+            scores = self._scores(queries[start:start + QUERY_BLOCK_SIZE].T, candidate_rows)
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            for column in range(scores.shape[1]):
+                ranked = top[np.argsort(-scores[top[:, column], column]), column]
+                ranked_rows.append(candidate_rows[ranked] if candidate_rows is not None else ranked)
+
+        # One fetch of the chunks of all queries
+        documents = self._documents_at(np.unique(np.concatenate(ranked_rows)))
+        return [self._with_vectors(rows, documents) for rows in ranked_rows]
+
+    def rows_for(self, ids: Iterable[str]) -> np.ndarray:
+        """Row positions of chunk IDs, skipping IDs not in the index."""
+        self.refresh()
+        rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+        return np.asarray(sorted(rows), dtype=np.int64)
+
+    def _top_rows(
+        self,
+        query_vector: List[float],
+        k: int,
+        candidate_rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Row positions and cosine similarities of the top-k rows, best first."""
+        self.refresh()
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if not len(self):
+            return empty
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        if candidate_rows is None and self._codes is not None:
+            candidate_rows = self._prefilter(query, k * self.rescore_multiplier)
+        scores = self._scores(query, candidate_rows)
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return empty
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidate_rows[top] if candidate_rows is not None else top
+        return rows, scores[top]
+
+    def _scores(self, queries: np.ndarray, candidate_rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine scores of rows against normalized queries.
+
+        Args:
+            queries: A query vector, or a (dimensions, queries) matrix
+            candidate_rows: Optional row positions to score instead of all rows
+
+        Returns:
+            Scores per row (and query); removed rows score -inf
+        """
+        if candidate_rows is not None:
+            scores = self._vectors_at(candidate_rows) @ queries
+            live = self._live[candidate_rows]
+        else:
+            parts = []
+            if self._base_rows():
+                parts.append(self._matrix @ queries)
+            if self._tail is not None:
+                parts.append(self._tail @ queries)
+            scores = np.concatenate(parts)
+            live = self._live
+        scores[~live] = -np.inf
+        return scores
+
+    def _base_rows(self) -> int:
+        """Number of rows of the build, before the rows added since."""
+        if self._matrix is not None:
+            return self._matrix.shape[0]
+        return self._codes.shape[0] if self._codes is not None else 0
+
+    def _vectors_at(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Full-precision vectors of row positions.
+
+        Rows of the build come from the matrix, or from the collection when
+        it was built without one; rows added since come from the delta log.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        in_matrix = rows < self._base_rows()
+        dimensions = self._tail.shape[1] if self._tail is not None else self._dimensions
+        vectors = np.empty((len(rows), dimensions), dtype=np.float32)
+        if self._matrix is not None:
+            vectors[in_matrix] = self._matrix[rows[in_matrix]]
+        else:
+            vectors[in_matrix] = self._fetch_vectors(self._ids_at(rows[in_matrix]))
+        if self._tail is not None:
+            vectors[~in_matrix] = self._tail[rows[~in_matrix] - self._base_rows()]
+        return vectors
+
+    def _fetch_vectors(self, ids: List[str]) -> np.ndarray:
+        """Normalized vectors of chunks from the collection; chunks missing there get zero rows."""
+        found: Dict[str, Any] = {}
+        if self.vector_store is not None:
+            for start in range(0, len(ids), EXPORT_PAGE_SIZE):
+                page = self.vector_store.get(
+                    ids=ids[start:start + EXPORT_PAGE_SIZE], include=["embeddings"]
+                )
+                found.update(zip(page["ids"], page["embeddings"]))
+
+        vectors = np.zeros((len(ids), self._dimensions), dtype=np.float32)
+        for position, chunk_id in enumerate(ids):
+            if chunk_id in found:
+                vectors[position] = found[chunk_id]
+        return normalize_rows(vectors)
+
+    def _prefilter(self, query: np.ndarray, count: int) -> np.ndarray:
+        """Row positions of the best candidates by quantized score, in row order."""
+        if count <= 0 or count >= len(self):
+            return np.flatnonzero(self._live)
+
+        if self.quantization == QUANTIZATION_INT8:
+            scaled_query = query * self._scales
+        else:
+            query_bits = np.packbits(query > 0)
+
+        scores = np.empty(len(self._live), dtype=np.float32)
+        parts = [(0, self._codes)]
+        if self._tail_codes is not None:
+            parts.append((self._base_rows(), self._tail_codes))
+        for first, codes in parts:
+            for start in range(0, codes.shape[0], PREFILTER_BLOCK_ROWS):
+                block = codes[start:start + PREFILTER_BLOCK_ROWS]
+                rows = slice(first + start, first + start + len(block))
+                if self.quantization == QUANTIZATION_INT8:
+                    scores[rows] = block.astype(np.float32) @ scaled_query
+                else:
+                    # Fewer differing bits is better
+                    scores[rows] = -_POPCOUNT[block ^ query_bits].sum(axis=1, dtype=np.int32)
+        scores[~self._live] = -np.inf
+
+        return np.sort(np.argpartition(-scores, count - 1)[:count])
+
+    def _ids_at(self, rows: np.ndarray) -> List[str]:
+        """Chunk IDs of row positions."""
+        return [self._ids[int(row)] for row in rows]
+
+    def _documents_at(self, rows: np.ndarray) -> Dict[str, Document]:
+        """
+        Fetch the chunks of row positions from the collection.
+
+        Chunks removed from the collection since the index was built are
+        missing from the result.
+        """
+        ids = self._ids_at(rows)
+        if not ids or self.vector_store is None:
+            return {}
+        page = self.vector_store.get(ids=ids, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+        }
+
+    def _with_vectors(
+        self,
+        rows: np.ndarray,
+        documents: Dict[str, Document],
+    ) -> Tuple[List[Document], np.ndarray]:
+        """Documents of rows, in row order, with their vectors."""
+        kept = [
+            (documents[chunk_id], int(row))
+            for chunk_id, row in zip(self._ids_at(rows), rows)
+            if chunk_id in documents
+        ]
+        if not kept:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return [doc for doc, _ in kept], self._vectors_at(np.asarray([row for _, row in kept]))
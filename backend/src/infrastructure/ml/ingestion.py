@@ -0,0 +1,739 @@
+"""
+Incremental, staged ingestion pipeline for the knowledge base.
+
+The ingestion manifest records, for every ingested file, the hash of its
+content and the IDs of the chunks it produced in the vector store. It lets
+ingestion skip unchanged files, replace only the chunks of changed files and
+remove the chunks of deleted files.
+
+The pipeline reads and splits files in a process pool, optionally drops
+near-duplicate chunks, embeds chunks in batches with a bounded number of
+concurrent requests, and writes to Chroma from worker threads so that the
+event loop is never blocked.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from structlog import get_logger
+
+from src.infrastructure.ml.admission import PRIORITY_BATCH, admission_priority
+from src.infrastructure.ml.dedup import SimHashIndex, simhash
+from src.infrastructure.ml.parent_store import ParentStore
+
+logger = get_logger()
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class FileRecord:
+    """Ingestion state of a single knowledge base file."""
+
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+    size: Optional[int] = None
+    mtime_ns: Optional[int] = None
+    # SimHash fingerprints aligned with chunk_ids (when deduplication is on)
+    fingerprints: List[int] = field(default_factory=list)
+    # Chunks of other files that this file's skipped near-duplicates matched
+    duplicate_of: List[str] = field(default_factory=list)
+    # Parent sections in the parent store (small-to-big retrieval)
+    parent_ids: List[str] = field(default_factory=list)
+
+
+class IngestionManifest:
+    """Persisted mapping of file path -> content hash -> chunk IDs."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.files: Dict[str, FileRecord] = {}
+        self.exists = False
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestionManifest":
+        """
+        Load a manifest from disk.
+
+        A missing or unreadable manifest yields an empty one, which makes the
+        next ingestion treat every file as new.
+
+        Args:
+            path: Path of the manifest JSON file
+
+        Returns:
+            Loaded manifest
+        """
+        manifest = cls(path)
+        if not path.exists():
+            return manifest
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                logger.warning("Ignoring ingestion manifest with unknown version", path=str(path))
+                return manifest
+            manifest.files = {
+                source: FileRecord(**record)
+                for source, record in data.get("files", {}).items()
+            }
+            manifest.exists = True
+        except Exception as e:
+            logger.warning("Failed to load ingestion manifest", path=str(path), error=str(e))
+
+        return manifest
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        data = {
+            "version": MANIFEST_VERSION,
+            "files": {source: asdict(record) for source, record in self.files.items()},
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def get(self, source: str) -> Optional[FileRecord]:
+        """Get the record of a file, if it has been ingested."""
+        return self.files.get(source)
+
+    def set(self, source: str, record: FileRecord) -> None:
+        """Set the record of a file."""
+        self.files[source] = record
+
+    def remove(self, source: str) -> Optional[FileRecord]:
+        """Remove and return the record of a file."""
+        return self.files.pop(source, None)
+
+    def sources(self) -> List[str]:
+        """List all ingested file paths."""
+        return list(self.files.keys())
+
+
+def hash_content(content: str) -> str:
+    """Compute the SHA-256 hex digest of a text."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, content_hash: str, index: int) -> str:
+    """
+    Build a deterministic chunk ID.
+
+    The ID depends on the file path, the file content and the position of the
+    chunk, so re-ingesting identical content upserts instead of duplicating.
+    """
+    return hashlib.sha256(f"{source}:{content_hash}:{index}".encode("utf-8")).hexdigest()
+
+
+def make_parent_id(source: str, content_hash: str, index: int) -> str:
+    """Build a deterministic parent section ID, like make_chunk_id."""
+    return hashlib.sha256(f"{source}:{content_hash}:parent:{index}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SplitResult:
+    """Output of reading and splitting a single file."""
+
+    source: str
+    content_hash: str
+    size: int
+    mtime_ns: int
+    chunks: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+    fingerprints: Optional[List[int]] = None
+    # Parent sections; chunk metadata then holds the parent_index
+    parents: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+
+
+@dataclass
+class IngestionStats:
+    """Counters describing a single ingestion run."""
+
+    files_found: int = 0
+    files_to_check: int = 0
+    files_scanned: int = 0
+    files_changed: int = 0
+    files_unchanged: int = 0
+    files_removed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_removed: int = 0
+    chunks_deduplicated: int = 0
+    bytes_deduplicated: int = 0
+    # Chunks the run wrote and deleted, to update the derived indexes with
+    written_ids: List[str] = field(default_factory=list)
+    deleted_ids: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    def elapsed_seconds(self) -> float:
+        """Seconds since the run started (or its total duration once finished)."""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def throughput(self) -> Optional[float]:
+        """Embedded chunks per second."""
+        elapsed = self.elapsed_seconds()
+        if not self.chunks_embedded or elapsed <= 0:
+            return None
+        return self.chunks_embedded / elapsed
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Estimate the remaining run time.
+
+        The total number of chunks is extrapolated from the files split so far,
+        since it is only known once every changed file has been split.
+        """
+        if self.finished_at is not None:
+            return 0.0
+        throughput = self.throughput()
+        checked = self.files_scanned - (self.files_found - self.files_to_check)
+        if not throughput or checked <= 0:
+            return None
+        estimated_total = self.chunks_total * self.files_to_check / checked
+        return max(estimated_total - self.chunks_embedded, 0) / throughput
+
+
+def load_and_split(
+    file_path: str,
+    source: str,
+    known_hash: Optional[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    fingerprint: bool = False,
+    parent_chunk_size: Optional[int] = None,
+    parent_chunk_overlap: int = 0,
+) -> SplitResult:
+    """
+    Read, hash and split a single markdown file.
+
+    Runs inside a worker process, so it must only depend on its arguments.
+
+    Args:
+        file_path: Absolute path of the file
+        source: Path of the file relative to the knowledge base
+        known_hash: Content hash recorded in the manifest, if any
+        chunk_size: Maximum size of a chunk in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+        fingerprint: Whether to compute SimHash fingerprints of the chunks
+        parent_chunk_size: Size of the parent sections to split first and
+                           cut the chunks from, None to split the file directly
+        parent_chunk_overlap: Overlap between consecutive parent sections
+
+    Returns:
+        Split result; chunks is None when the content hash is unchanged
+    """
+    stat = os.stat(file_path)
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    result = SplitResult(
+        source=source,
+        content_hash=hash_content(content),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+    if result.content_hash == known_hash:
+        return result
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True,
+    )
+    doc = Document(
+        page_content=content,
+        metadata={
+            "source": source,
+            "file_path": file_path,
+        },
+    )
+    if parent_chunk_size:
+        parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=parent_chunk_size,
+            chunk_overlap=parent_chunk_overlap,
+            add_start_index=True,
+        )
+        parents = parent_splitter.split_documents([doc])
+        result.parents = [(parent.page_content, parent.metadata) for parent in parents]
+        result.chunks = []
+        for i, parent in enumerate(parents):
+            for chunk in text_splitter.split_documents([parent]):
+                # Offsets of the children are relative to their parent
+                chunk.metadata["start_index"] += parent.metadata["start_index"]
+                chunk.metadata["parent_index"] = i
+                result.chunks.append((chunk.page_content, chunk.metadata))
+    else:
+        result.chunks = [
+            (chunk.page_content, chunk.metadata)
+            for chunk in text_splitter.split_documents([doc])
+        ]
+    if fingerprint:
+        result.fingerprints = [simhash(text) for text, _ in result.chunks]
+    return result
+
+
+class IngestionPipeline:
+    """Staged read/split -> embed -> write pipeline for the knowledge base."""
+
+    def __init__(
+        self,
+        vector_store: Chroma,
+        embeddings: Embeddings,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        workers: Optional[int] = None,
+        executor: Optional[ProcessPoolExecutor] = None,
+        dedup_threshold: Optional[float] = None,
+        parent_store: Optional[ParentStore] = None,
+        parent_chunk_size: Optional[int] = None,
+        parent_chunk_overlap: int = 0,
+    ) -> None:
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.workers = workers
+        # Similarity threshold for dropping near-duplicate chunks, None disables
+        self.dedup_threshold = dedup_threshold
+        # Small-to-big retrieval: chunks are cut from parent sections kept here
+        self.parent_store = parent_store if parent_chunk_size else None
+        self.parent_chunk_size = parent_chunk_size if parent_store else None
+        self.parent_chunk_overlap = parent_chunk_overlap
+        # A shared executor is owned (and shut down) by the caller
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._write_lock = asyncio.Lock()
+
+    def close(self) -> None:
+        """Shut down the worker process pool, unless it is shared."""
+        if self._executor and self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(
+        self,
+        kb_path: Path,
+        manifest: IngestionManifest,
+        stats: Optional[IngestionStats] = None,
+        paths: Optional[List[str]] = None,
+    ) -> IngestionStats:
+        """
+        Synchronize the vector store with the knowledge base directory.
+
+        Args:
+            kb_path: Knowledge base directory
+            manifest: Ingestion manifest of the target collection
+            stats: Optional stats object updated in place as the run progresses
+            paths: Optional files or directories to synchronize instead of the
+                   whole knowledge base
+
+        Returns:
+            Stats of the run
+        """
+        stats = stats or IngestionStats()
+        stats.started_at = time.monotonic()
+
+        candidates, unchanged, removed = await asyncio.to_thread(
+            self._scan, kb_path, manifest, paths
+        )
+
+        dedup_index: Optional[SimHashIndex] = None
+        forced: set = set()
+        if self.dedup_threshold is not None:
+            forced = self._add_dedup_dependents(kb_path, manifest, candidates, unchanged, removed)
+            dedup_index = self._build_dedup_index(manifest, candidates, removed)
+        stats.files_found = len(candidates) + len(unchanged)
+        stats.files_to_check = len(candidates)
+        stats.files_unchanged = len(unchanged)
+        stats.files_scanned = len(unchanged)
+        stats.files_removed = len(removed)
+        logger.info(f"Found {stats.files_found} markdown files", to_check=len(candidates))
+
+        pending: Dict[str, FileRecord] = {}
+        failed: set = set()
+        stale_ids: Dict[str, List[str]] = {}
+        new_ids: Dict[str, List[str]] = {}
+        stale_parent_ids: Dict[str, List[str]] = {}
+        new_parent_ids: Dict[str, List[str]] = {}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: List[asyncio.Task] = []
+        batch: List[Tuple[str, str, Dict[str, Any]]] = []
+
+        async def flush(items: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+            try:
+                await self._embed_and_write(items, stats)
+            except Exception as e:
+                sources = {item[2]["source"] for item in items}
+                failed.update(sources)
+                stats.errors.append(f"Embedding batch failed for {sorted(sources)}: {e}")
+                logger.error("Embedding batch failed", sources=sorted(sources), error=str(e))
+            finally:
+                semaphore.release()
+
+        async def submit(items: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+            # Acquire before spawning so that splitting waits for embedding capacity
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(flush(items)))
+
+        if candidates:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            futures = [
+                loop.run_in_executor(
+                    executor,
+                    load_and_split,
+                    str(path),
+                    source,
+                    record.content_hash if record and source not in forced else None,
+                    self.chunk_size,
+                    self.chunk_overlap,
+                    dedup_index is not None,
+                    self.parent_chunk_size,
+                    self.parent_chunk_overlap,
+                )
+                for path, source, record in candidates
+            ]
+
+            # Consume results in path order so deduplication is deterministic;
+            # the files are still split in parallel.
+            for future in futures:
+                try:
+                    result: SplitResult = await future
+                except Exception as e:
+                    stats.files_scanned += 1
+                    stats.errors.append(f"Failed to process file: {e}")
+                    logger.error("Failed to process file", error=str(e))
+                    continue
+
+                stats.files_scanned += 1
+                record = manifest.get(result.source)
+
+                if result.chunks is None:
+                    # Only the file metadata changed
+                    record.size = result.size
+                    record.mtime_ns = result.mtime_ns
+                    pending[result.source] = record
+                    stats.files_unchanged += 1
+                    continue
+
+                new_record = FileRecord(
+                    content_hash=result.content_hash,
+                    size=result.size,
+                    mtime_ns=result.mtime_ns,
+                )
+                if result.parents is not None:
+                    new_record.parent_ids = [
+                        make_parent_id(result.source, result.content_hash, i)
+                        for i in range(len(result.parents))
+                    ]
+                    # Parents are written before the chunks that point to them
+                    await asyncio.to_thread(
+                        self.parent_store.put_many,
+                        [
+                            (parent_id, text, metadata)
+                            for parent_id, (text, metadata)
+                            in zip(new_record.parent_ids, result.parents)
+                        ],
+                    )
+
+                kept = []
+                for i, (text, metadata) in enumerate(result.chunks):
+                    chunk_id = make_chunk_id(result.source, result.content_hash, i)
+                    if "parent_index" in metadata:
+                        metadata["parent_id"] = new_record.parent_ids[metadata.pop("parent_index")]
+                    if dedup_index is not None:
+                        fingerprint = result.fingerprints[i]
+                        match = dedup_index.find(fingerprint)
+                        if match:
+                            new_record.duplicate_of.append(match)
+                            stats.chunks_deduplicated += 1
+                            stats.bytes_deduplicated += len(text.encode("utf-8"))
+                            continue
+                        dedup_index.add(chunk_id, fingerprint)
+                        new_record.fingerprints.append(fingerprint)
+                    new_record.chunk_ids.append(chunk_id)
+                    kept.append((chunk_id, text, metadata))
+
+                if record:
+                    stale_ids[result.source] = record.chunk_ids
+                    stale_parent_ids[result.source] = record.parent_ids
+                new_ids[result.source] = new_record.chunk_ids
+                new_parent_ids[result.source] = new_record.parent_ids
+                pending[result.source] = new_record
+                stats.files_changed += 1
+                stats.chunks_total += len(kept)
+                logger.debug(
+                    f"Processed {result.source}: {len(kept)} chunks",
+                    duplicates=len(result.chunks) - len(kept),
+                )
+
+                for item in kept:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        await submit(batch)
+                        batch = []
+
+        if batch:
+            await submit(batch)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        # Files whose chunks were not fully written keep their previous state,
+        # and so do files whose near-duplicates matched those chunks
+        if failed:
+            failed_ids = {i for source in failed for i in new_ids.get(source, [])}
+            failed.update(
+                source
+                for source, record in pending.items()
+                if failed_ids.intersection(record.duplicate_of)
+            )
+
+        orphan_ids: List[str] = []
+        orphan_parent_ids: List[str] = []
+        for source in failed:
+            pending.pop(source, None)
+            stale_ids.pop(source, None)
+            stale_parent_ids.pop(source, None)
+            orphan_ids.extend(new_ids.get(source, []))
+            orphan_parent_ids.extend(new_parent_ids.get(source, []))
+
+        for source in removed:
+            stale_ids[source] = manifest.get(source).chunk_ids
+            stale_parent_ids[source] = manifest.get(source).parent_ids
+
+        # New chunks are committed before stale ones are deleted, so queries keep
+        # being served from the old vectors until the replacement is in place.
+        # Re-split files can reuse their chunk IDs, which must not be deleted.
+        written_ids = {
+            i for source, ids in new_ids.items() if source not in failed for i in ids
+        }
+        removed_ids = [
+            i for ids in stale_ids.values() for i in ids if i not in written_ids
+        ]
+        to_delete = removed_ids + orphan_ids
+        if to_delete:
+            async with self._write_lock:
+                await asyncio.to_thread(self.vector_store.delete, ids=to_delete)
+        stats.chunks_removed = len(removed_ids)
+        stats.written_ids = sorted(written_ids)
+        stats.deleted_ids = to_delete
+
+        if self.parent_store is not None:
+            written_parent_ids = {
+                i for source, ids in new_parent_ids.items() if source not in failed for i in ids
+            }
+            parents_to_delete = [
+                i for ids in stale_parent_ids.values() for i in ids if i not in written_parent_ids
+            ]
+            # A failed file keeps its previous parents, which may share IDs with its new ones
+            kept_parent_ids = {
+                i for source in failed if manifest.get(source) for i in manifest.get(source).parent_ids
+            }
+            parents_to_delete += [i for i in orphan_parent_ids if i not in kept_parent_ids]
+            await asyncio.to_thread(self.parent_store.delete_many, parents_to_delete)
+
+        for source in removed:
+            manifest.remove(source)
+        for source, record in pending.items():
+            manifest.set(source, record)
+        await asyncio.to_thread(manifest.save)
+
+        stats.finished_at = time.monotonic()
+        logger.info(
+            f"Ingested {stats.chunks_embedded} document chunks",
+            changed_files=stats.files_changed,
+            unchanged_files=stats.files_unchanged,
+            removed_files=stats.files_removed,
+            removed_chunks=stats.chunks_removed,
+            deduplicated_chunks=stats.chunks_deduplicated,
+            deduplicated_bytes=stats.bytes_deduplicated,
+            errors=len(stats.errors),
+            seconds=round(stats.finished_at - stats.started_at, 3),
+        )
+        return stats
+
+    def _scan(
+        self,
+        kb_path: Path,
+        manifest: IngestionManifest,
+        paths: Optional[List[str]] = None,
+    ) -> Tuple[List[Tuple[Path, str, Optional[FileRecord]]], List[str], List[str]]:
+        """
+        Compare the knowledge base directory (or a part of it) with the manifest.
+
+        Files whose size and modification time match the manifest are
+        considered unchanged without being read.
+
+        Returns:
+            Tuple of (files_to_check, unchanged_sources, removed_sources)
+        """
+        candidates = []
+        unchanged = []
+        seen = set()
+        md_files, scopes = self._resolve_paths(kb_path, paths)
+
+        for md_file in md_files:
+            source = str(md_file.relative_to(kb_path))
+            seen.add(source)
+            record = manifest.get(source)
+            try:
+                stat = md_file.stat()
+            except OSError as e:
+                logger.error(f"Failed to stat {md_file}", error=str(e))
+                continue
+
+            if (
+                record
+                and record.size == stat.st_size
+                and record.mtime_ns == stat.st_mtime_ns
+            ):
+                unchanged.append(source)
+            else:
+                candidates.append((md_file, source, record))
+
+        removed = [
+            source
+            for source in manifest.sources()
+            if source not in seen
+            and (scopes is None or any(
+                source == scope or source.startswith(scope + os.sep)
+                for scope in scopes
+            ))
+        ]
+        return candidates, unchanged, removed
+
+    def _add_dedup_dependents(
+        self,
+        kb_path: Path,
+        manifest: IngestionManifest,
+        candidates: List[Tuple[Path, str, Optional[FileRecord]]],
+        unchanged: List[str],
+        removed: List[str],
+    ) -> set:
+        """
+        Schedule unchanged files whose skipped duplicates matched changing chunks.
+
+        When a kept chunk goes away, the files that relied on it as their
+        near-duplicate must be split again so their content stays indexed.
+        Candidates and unchanged lists are updated in place.
+
+        Returns:
+            Sources that must be re-split even if their content is unchanged
+        """
+        changing_ids = {
+            chunk_id
+            for source in [c[1] for c in candidates] + removed
+            if manifest.get(source)
+            for chunk_id in manifest.get(source).chunk_ids
+        }
+        if not changing_ids:
+            return set()
+
+        forced = set()
+        for source in list(unchanged):
+            record = manifest.get(source)
+            if changing_ids.intersection(record.duplicate_of):
+                unchanged.remove(source)
+                candidates.append((kb_path / source, source, record))
+                forced.add(source)
+        return forced
+
+    def _build_dedup_index(
+        self,
+        manifest: IngestionManifest,
+        candidates: List[Tuple[Path, str, Optional[FileRecord]]],
+        removed: List[str],
+    ) -> SimHashIndex:
+        """Index the fingerprints of the chunks that stay in the collection."""
+        index = SimHashIndex(self.dedup_threshold)
+        changing = {c[1] for c in candidates} | set(removed)
+        for source, record in manifest.files.items():
+            if source in changing:
+                continue
+            for chunk_id, fingerprint in zip(record.chunk_ids, record.fingerprints):
+                index.add(chunk_id, fingerprint)
+        return index
+
+    def _resolve_paths(
+        self,
+        kb_path: Path,
+        paths: Optional[List[str]],
+    ) -> Tuple[List[Path], Optional[List[str]]]:
+        """
+        Expand the paths to synchronize into markdown files.
+
+        Returns:
+            Tuple of (markdown_files, scopes); scopes are the relative paths
+            that bound file removal, or None for the whole knowledge base
+        """
+        if paths is None:
+            return sorted(kb_path.rglob("*.md")), None
+
+        kb_root = kb_path.resolve()
+        md_files = set()
+        scopes = []
+        for path in paths:
+            try:
+                relative = Path(path).resolve().relative_to(kb_root)
+            except ValueError:
+                continue
+            if relative == Path("."):
+                return sorted(kb_path.rglob("*.md")), None
+
+            target = kb_path / relative
+            scopes.append(str(relative))
+            if target.is_dir():
+                md_files.update(target.rglob("*.md"))
+            elif target.suffix == ".md" and target.exists():
+                md_files.add(target)
+
+        return sorted(md_files), scopes
+
+    async def _embed_and_write(
+        self,
+        items: List[Tuple[str, str, Dict[str, Any]]],
+        stats: IngestionStats,
+    ) -> None:
+        """Embed a batch of chunks and upsert it into the vector store."""
+        ids = [item[0] for item in items]
+        texts = [item[1] for item in items]
+        metadatas = [item[2] for item in items]
+
+        with admission_priority(PRIORITY_BATCH):
+            vectors = await self.embeddings.aembed_documents(texts)
+
+        async with self._write_lock:
+            await asyncio.to_thread(
+                self.vector_store._collection.upsert,
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=metadatas,
+            )
+        stats.chunks_embedded += len(items)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Get the worker process pool, creating it on first use."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
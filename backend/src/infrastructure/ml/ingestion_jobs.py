@@ -0,0 +1,135 @@
+"""
+Background ingestion jobs with progress reporting.
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from uuid import UUID, uuid4
+
+from structlog import get_logger
+
+from src.infrastructure.ml.ingestion import IngestionStats
+from src.infrastructure.ml.rag_service import RAGService, get_rag_service
+
+logger = get_logger()
+
+# Job kinds
+JOB_INGEST = "ingest"
+JOB_REBUILD = "rebuild"
+
+# Job statuses
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    """A single background ingestion run."""
+
+    id: UUID = field(default_factory=uuid4)
+    kind: str = JOB_INGEST
+    status: str = JOB_QUEUED
+    knowledge_base_path: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    stats: IngestionStats = field(default_factory=IngestionStats)
+    error: Optional[str] = None
+
+    def is_active(self) -> bool:
+        """Check if the job is queued or running."""
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+
+class IngestionJobManager:
+    """
+    Run ingestion in background tasks and keep track of recent jobs.
+
+    Triggers that arrive while a job of the same kind is queued or running
+    coalesce into that job instead of starting a duplicate run.
+    """
+
+    def __init__(self, rag_service: RAGService, max_jobs: int = 50) -> None:
+        self.rag_service = rag_service
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[UUID, IngestionJob]" = OrderedDict()
+        self._current: Dict[str, IngestionJob] = {}
+        self._tasks: Dict[UUID, asyncio.Task] = {}
+
+    def submit(
+        self,
+        knowledge_base_path: Optional[str] = None,
+        kind: str = JOB_INGEST,
+    ) -> Tuple[IngestionJob, bool]:
+        """
+        Enqueue an ingestion job, or join the one already in progress.
+
+        Args:
+            knowledge_base_path: Optional knowledge base directory override
+            kind: Job kind, incremental ingestion or full collection rebuild
+
+        Returns:
+            Tuple of (job, coalesced)
+        """
+        current = self._current.get(kind)
+        if (
+            current
+            and current.is_active()
+            and current.knowledge_base_path == knowledge_base_path
+        ):
+            return current, True
+
+        job = IngestionJob(kind=kind, knowledge_base_path=knowledge_base_path)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+        self._current[kind] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        logger.info("Ingestion job queued", job_id=str(job.id), kind=kind)
+        return job, False
+
+    def get(self, job_id: UUID) -> Optional[IngestionJob]:
+        """Get a job by ID."""
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: IngestionJob) -> None:
+        """Run a job and record its outcome."""
+        try:
+            job.status = JOB_RUNNING
+            job.started_at = datetime.utcnow()
+            if job.kind == JOB_REBUILD:
+                await self.rag_service.rebuild_collection(
+                    knowledge_base_path=job.knowledge_base_path,
+                    stats=job.stats,
+                )
+            else:
+                await self.rag_service.ingest_documents(
+                    knowledge_base_path=job.knowledge_base_path,
+                    stats=job.stats,
+                )
+            job.status = JOB_COMPLETED
+            logger.info("Ingestion job completed", job_id=str(job.id))
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error("Ingestion job failed", job_id=str(job.id), error=str(e))
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+
+
+# Singleton instance
+_ingestion_job_manager: Optional[IngestionJobManager] = None
+
+
+def get_ingestion_job_manager() -> IngestionJobManager:
+    """Get or create the ingestion job manager singleton."""
+    global _ingestion_job_manager
+    if _ingestion_job_manager is None:
+        _ingestion_job_manager = IngestionJobManager(get_rag_service())
+    return _ingestion_job_manager
@@ -0,0 +1,147 @@
+"""
+Background watcher that live-reindexes the knowledge base.
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from structlog import get_logger
+from watchfiles import Change, awatch
+
+from src.core.config import settings
+from src.infrastructure.ml.rag_service import RAGService, get_rag_service
+
+logger = get_logger()
+
+
+class KnowledgeBaseWatcher:
+    """
+    Watch the knowledge base directory and re-ingest touched files.
+
+    Bursts of filesystem events are debounced into a single incremental
+    ingestion of the touched paths. Changes that arrive while an ingestion is
+    running are batched into the next one.
+    """
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        knowledge_base_path: str,
+        debounce_ms: int = 2000,
+    ) -> None:
+        self.rag_service = rag_service
+        self.kb_path = Path(knowledge_base_path)
+        self.debounce_ms = debounce_ms
+
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self._pending: Set[str] = set()
+        self._oldest_pending_at: Optional[float] = None
+        self._last_sync_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._syncs = 0
+
+    def start(self) -> None:
+        """Start watching in a background task."""
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Knowledge base watcher started", path=str(self.kb_path))
+
+    async def stop(self) -> None:
+        """Stop watching and wait for the background task to finish."""
+        if not self._task:
+            return
+        self._stop_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        logger.info("Knowledge base watcher stopped")
+
+    def is_running(self) -> bool:
+        """Check if the watcher task is running."""
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> Dict:
+        """
+        Report how far behind the watcher is.
+
+        Returns:
+            Dict with pending file count, lag and last sync information
+        """
+        now = time.time()
+        return {
+            "enabled": True,
+            "running": self.is_running(),
+            "path": str(self.kb_path),
+            "pending_files": len(self._pending),
+            "lag_seconds": (
+                round(now - self._oldest_pending_at, 3)
+                if self._oldest_pending_at is not None
+                else 0.0
+            ),
+            "last_sync_at": self._last_sync_at,
+            "syncs": self._syncs,
+            "last_error": self._last_error,
+        }
+
+    async def _run(self) -> None:
+        """Consume debounced filesystem events and ingest the touched paths."""
+        try:
+            async for changes in awatch(
+                self.kb_path,
+                debounce=self.debounce_ms,
+                stop_event=self._stop_event,
+                watch_filter=self._watch_filter,
+            ):
+                if self._oldest_pending_at is None:
+                    self._oldest_pending_at = time.time()
+                self._pending.update(path for _, path in changes)
+                await self._sync()
+        except Exception as e:
+            self._last_error = str(e)
+            logger.error("Knowledge base watcher failed", error=str(e))
+
+    async def _sync(self) -> None:
+        """Ingest the pending paths; they stay pending until the chunks commit."""
+        paths = sorted(self._pending)
+
+        try:
+            count = await self.rag_service.ingest_documents(
+                knowledge_base_path=str(self.kb_path),
+                paths=paths,
+            )
+            self._pending.difference_update(paths)
+            self._oldest_pending_at = None
+            self._last_sync_at = time.time()
+            self._last_error = None
+            self._syncs += 1
+            logger.info("Knowledge base changes ingested", paths=len(paths), chunks=count)
+        except Exception as e:
+            self._last_error = str(e)
+            logger.error("Failed to ingest knowledge base changes", error=str(e))
+
+    @staticmethod
+    def _watch_filter(change: Change, path: str) -> bool:
+        """Accept markdown files, and any deletion (which may be a directory)."""
+        return change == Change.deleted or path.endswith(".md")
+
+
+# Singleton instance
+_kb_watcher: Optional[KnowledgeBaseWatcher] = None
+
+
+def get_kb_watcher() -> KnowledgeBaseWatcher:
+    """Get or create the knowledge base watcher singleton."""
+    global _kb_watcher
+    if _kb_watcher is None:
+        _kb_watcher = KnowledgeBaseWatcher(
+            rag_service=get_rag_service(),
+            knowledge_base_path=settings.knowledge_base_path,
+            debounce_ms=settings.kb_watcher_debounce_ms,
+        )
+    return _kb_watcher
@@ -0,0 +1,335 @@
+"""
+In-process BM25 lexical index.
+
+The chunks of a collection are tokenized into an inverted index persisted as
+a JSON file next to the Chroma directory; the chunks later ingestion runs
+write and delete are appended to a delta log (see delta_log) instead of
+rebuilding it. Identifiers such as ``as_retriever`` or ``addDocuments`` are
+indexed both whole and split into their parts, so exact API names match
+exactly while their words still match prose.
+"""
+import json
+import math
+import os
+import re
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_chroma import Chroma
+from structlog import get_logger
+
+from src.infrastructure.ml.delta_log import DeltaLog, should_compact
+from src.infrastructure.ml.flat_index import EXPORT_PAGE_SIZE
+
+logger = get_logger()
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def is_identifier(word: str) -> bool:
+    """Check if a word looks like a code identifier (snake_case or camelCase)."""
+    stripped = word.strip("_")
+    return "_" in stripped or bool(re.search(r"[a-z][A-Z]", stripped))
+
+
+def identifiers(text: str) -> List[str]:
+    """Lowercased code identifiers mentioned in a text."""
+    return [word.lower() for word in _WORD_RE.findall(text) if is_identifier(word)]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into index terms.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Lowercased terms; identifiers yield the whole identifier followed
+        by its parts
+    """
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text):
+        terms.append(word.lower())
+        if is_identifier(word):
+            parts = [p for chunk in word.split("_") for p in _CAMEL_RE.findall(chunk)]
+            terms.extend(p.lower() for p in parts if len(parts) > 1)
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of a collection."""
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self.directory = directory
+        self.name = name
+        self.path = directory / f"{name}_bm25.json"
+        self.delta = DeltaLog(directory / f"{name}_bm25.delta.jsonl")
+        self._build_id: Optional[str] = None
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._live: np.ndarray = np.zeros(0, dtype=bool)
+        self._doc_lengths: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_norms: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._delta_rows = 0
+        self._loaded_mtime_ns: Optional[int] = None
+
+    def exists(self) -> bool:
+        """Check if the index file exists on disk."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def build_from_store(self, vector_store: Chroma) -> int:
+        """
+        Tokenize the chunks of a Chroma collection into the index file.
+
+        Args:
+            vector_store: Collection to index
+
+        Returns:
+            Number of chunks indexed
+        """
+        ids: List[str] = []
+        doc_lengths: List[int] = []
+        postings: Dict[str, List[List[int]]] = {}
+
+        offset = 0
+        while True:
+            page = vector_store.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["documents"])
+            if not page["ids"]:
+                break
+            for chunk_id, text in zip(page["ids"], page["documents"]):
+                terms = tokenize(text or "")
+                row = len(ids)
+                ids.append(chunk_id)
+                doc_lengths.append(len(terms))
+                for term, count in Counter(terms).items():
+                    postings.setdefault(term, []).append([row, count])
+            offset += len(page["ids"])
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "build": uuid.uuid4().hex,
+                    "ids": ids,
+                    "doc_lengths": doc_lengths,
+                    "postings": postings,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+        self.delta.clear()
+
+        logger.info("BM25 index built", path=str(self.path), chunks=len(ids), terms=len(postings))
+        return len(ids)
+
+    def update_from_store(
+        self,
+        vector_store: Chroma,
+        written_ids: List[str],
+        deleted_ids: List[str],
+    ) -> None:
+        """
+        Apply the chunks an ingestion run wrote and deleted to the index.
+
+        Only those chunks are read and tokenized; the change is appended to
+        the delta log. After many changes the index is rebuilt instead.
+
+        Args:
+            vector_store: Collection the index mirrors
+            written_ids: Chunks added or replaced
+            deleted_ids: Chunks removed
+        """
+        self.refresh()
+        if self._build_id is None or should_compact(
+            self._delta_rows + len(written_ids) + len(deleted_ids), len(self)
+        ):
+            self.build_from_store(vector_store)
+            return
+
+        added = []
+        for start in range(0, len(written_ids), EXPORT_PAGE_SIZE):
+            page = vector_store.get(
+                ids=written_ids[start:start + EXPORT_PAGE_SIZE], include=["documents"]
+            )
+            for chunk_id, text in zip(page["ids"], page["documents"]):
+                terms = tokenize(text or "")
+                added.append({"id": chunk_id, "length": len(terms), "terms": Counter(terms)})
+
+        removed = [i for i in dict.fromkeys(deleted_ids + written_ids) if i in self._row_of]
+        if not added and not removed:
+            return
+        self.delta.append(self._build_id, {"removed": removed, "added": added})
+        self.refresh()
+        logger.info(
+            "BM25 index updated",
+            path=str(self.path),
+            added=len(added),
+            removed=len(removed),
+        )
+
+    def refresh(self) -> None:
+        """(Re)load the index if it was rebuilt on disk, and apply new changes."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._loaded_mtime_ns:
+            self._load()
+            self._loaded_mtime_ns = mtime_ns
+
+        records = self.delta.read_new(self._build_id)
+        for record in records:
+            self._apply(record)
+        if records:
+            self._update_norms()
+
+    def _load(self) -> None:
+        """Load the index file."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self._postings = {}
+        for term, entries in data["postings"].items():
+            pairs = np.asarray(entries, dtype=np.int64)
+            self._postings[term] = (pairs[:, 0], pairs[:, 1].astype(np.float32))
+        self._build_id = data.get("build")
+        self._ids = data["ids"]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._live = np.ones(len(self._ids), dtype=bool)
+        self._doc_lengths = np.asarray(data["doc_lengths"], dtype=np.float32)
+        self._delta_rows = 0
+        self.delta.rewind()
+        self._update_norms()
+
+    def _apply(self, record: Dict) -> None:
+        """Apply a change record: tombstone removed rows, append added ones."""
+        for chunk_id in record["removed"]:
+            row = self._row_of.pop(chunk_id, None)
+            if row is not None:
+                self._live[row] = False
+
+        if record["added"]:
+            first = len(self._ids)
+            term_rows: Dict[str, List[Tuple[int, int]]] = {}
+            for offset, entry in enumerate(record["added"]):
+                self._row_of[entry["id"]] = first + offset
+                self._ids.append(entry["id"])
+                for term, count in entry["terms"].items():
+                    term_rows.setdefault(term, []).append((first + offset, count))
+            lengths = [entry["length"] for entry in record["added"]]
+            self._doc_lengths = np.concatenate(
+                [self._doc_lengths, np.asarray(lengths, dtype=np.float32)]
+            )
+            self._live = np.concatenate([self._live, np.ones(len(lengths), dtype=bool)])
+            for term, pairs in term_rows.items():
+                new = np.asarray(pairs, dtype=np.int64)
+                rows, tf = self._postings.get(
+                    term, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+                )
+                self._postings[term] = (
+                    np.concatenate([rows, new[:, 0]]),
+                    np.concatenate([tf, new[:, 1].astype(np.float32)]),
+                )
+        self._delta_rows += len(record["removed"]) + len(record["added"])
+
+    def _update_norms(self) -> None:
+        """Recompute the document length normalization over the live rows."""
+        live_lengths = self._doc_lengths[self._live]
+        avg_length = float(live_lengths.mean()) if len(live_lengths) else 0.0
+        self._doc_norms = (
+            BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths / avg_length)
+            if avg_length
+            else np.full(len(self._doc_lengths), BM25_K1, dtype=np.float32)
+        )
+
+    def drop(self) -> None:
+        """Delete the index file and its delta log."""
+        self.path.unlink(missing_ok=True)
+        self.delta.clear()
+
+    def _idf(self, term: str) -> float:
+        """Inverse document frequency of a term over the live rows."""
+        rows = self._postings.get(term, (np.zeros(0, dtype=np.int64),))[0]
+        return self._idf_for(int(self._live[rows].sum()), len(self._row_of))
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        allowed_ids: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k best matching chunks for a query.
+
+        Args:
+            query: Query text
+            k: Number of results
+            allowed_ids: Optional chunk IDs to restrict the search to
+
+        Returns:
+            List of (chunk ID, BM25 score), best first; chunks that match no
+            query term are not returned
+        """
+        self.refresh()
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self._postings]
+        if not terms or not self._row_of:
+            return []
+
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        for term in terms:
+            rows, tf = self._postings[term]
+            scores[rows] += self._idf(term) * tf * (BM25_K1 + 1) / (tf + self._doc_norms[rows])
+        scores[~self._live] = 0.0
+
+        matched = np.flatnonzero(scores)
+        if allowed_ids is not None:
+            matched = matched[np.fromiter(
+                (self._ids[row] in allowed_ids for row in matched), dtype=bool, count=len(matched)
+            )]
+        k = min(k, len(matched))
+        if k <= 0:
+            return []
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[row], float(scores[row])) for row in top]
+
+    def coverage(self, query: str, text: str) -> float:
+        """
+        Share of the query's information contained in a text.
+
+        Args:
+            query: Query text
+            text: Chunk text
+
+        Returns:
+            IDF-weighted fraction of the query terms that occur in the text;
+            terms unknown to the index weigh as much as the rarest possible
+        """
+        self.refresh()
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return 0.0
+        text_terms = set(tokenize(text))
+        weights = {t: self._idf(t) for t in query_terms}
+        total = sum(weights.values())
+        return sum(w for t, w in weights.items() if t in text_terms) / total if total else 0.0
+
+    @staticmethod
+    def _idf_for(doc_freq: int, num_docs: int) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        return math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
@@ -0,0 +1,70 @@
+"""
+Reduced-dimensionality (Matryoshka) embeddings.
+
+Models trained with Matryoshka representation learning, such as
+gemini-embedding-001, keep most of their retrieval quality when vectors are
+cut to a prefix of their dimensions. Truncated vectors are no longer unit
+length, so they are renormalized before being stored or compared.
+"""
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.infrastructure.ml.embedding_cache import aembed_queries
+
+
+def truncate_and_normalize(vectors: List[List[float]], dimensions: int) -> List[List[float]]:
+    """
+    Cut vectors to their first dimensions and L2-normalize them.
+
+    Args:
+        vectors: Embedding vectors
+        dimensions: Number of leading dimensions to keep
+
+    Returns:
+        Truncated unit-length vectors
+    """
+    if not vectors:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
+
+class MatryoshkaEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that returns vectors of a fixed reduced dimensionality.
+
+    The provider is asked for the reduced size where it supports it (e.g.
+    output_dimensionality for Gemini); the wrapper truncates whatever comes
+    back and renormalizes it for both documents and queries.
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int) -> None:
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents at the configured dimensionality."""
+        return truncate_and_normalize(self.embeddings.embed_documents(texts), self.dimensions)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embed documents at the configured dimensionality."""
+        vectors = await self.embeddings.aembed_documents(texts)
+        return truncate_and_normalize(vectors, self.dimensions)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query at the configured dimensionality."""
+        return truncate_and_normalize([self.embeddings.embed_query(text)], self.dimensions)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronously embed a query at the configured dimensionality."""
+        vector = await self.embeddings.aembed_query(text)
+        return truncate_and_normalize([vector], self.dimensions)[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embed several queries at the configured dimensionality."""
+        vectors = await aembed_queries(self.embeddings, texts)
+        return truncate_and_normalize(vectors, self.dimensions)
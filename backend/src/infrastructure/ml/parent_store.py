@@ -0,0 +1,114 @@
+"""
+Parent section store for small-to-big retrieval.
+
+With small-to-big retrieval, the vector store holds small child chunks that
+match questions precisely, while the larger sections they were cut from are
+what the LLM gets to read. The parent sections are kept in a SQLite file
+next to the Chroma directory, keyed by parent ID, so that expanding the
+retrieved children is a primary-key lookup instead of a second vector query.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ParentStore:
+    """SQLite key-value store of parent sections."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def drop(self) -> None:
+        """Delete the store file."""
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.path}{suffix}").unlink(missing_ok=True)
+
+    def put_many(self, parents: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """
+        Store parent sections, replacing existing ones with the same ID.
+
+        Args:
+            parents: List of (parent ID, text, metadata)
+        """
+        if not parents:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO parents (id, text, metadata) VALUES (?, ?, ?)",
+                [
+                    (parent_id, text, json.dumps(metadata, ensure_ascii=False))
+                    for parent_id, text, metadata in parents
+                ],
+            )
+            conn.commit()
+
+    def get_many(self, parent_ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Look up parent sections.
+
+        Args:
+            parent_ids: IDs of the parent sections
+
+        Returns:
+            Mapping of parent ID -> (text, metadata) for the IDs found
+        """
+        found: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        unique = list(dict.fromkeys(parent_ids))
+        if not unique:
+            return found
+
+        with self._lock:
+            conn = self._connect()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, text, metadata FROM parents WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for parent_id, text, metadata in rows:
+                    found[parent_id] = (text, json.loads(metadata))
+        return found
+
+    def delete_many(self, parent_ids: List[str]) -> None:
+        """Delete parent sections by ID."""
+        if not parent_ids:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM parents WHERE id = ?", [(i,) for i in parent_ids])
+            conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use; the caller holds the lock."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parents (
+                    id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
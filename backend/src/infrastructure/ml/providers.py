@@ -0,0 +1,123 @@
+"""
+LLM and embedding providers, selected by configuration.
+
+A provider is a factory that builds a LangChain chat model or embeddings
+from the settings. The "gemini" providers call the Gemini API; the "fake"
+providers run offline (see fake_providers). Further providers can be added
+with register_chat_provider and register_embedding_provider.
+"""
+from typing import Callable, Dict
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+from src.core.config import settings
+from src.infrastructure.ml.fake_providers import FakeChatModel, HashEmbeddings
+
+# Provider names
+PROVIDER_GEMINI = "gemini"
+PROVIDER_FAKE = "fake"
+
+ChatProvider = Callable[[], BaseChatModel]
+EmbeddingProvider = Callable[[], Embeddings]
+
+
+def _gemini_api_key() -> str:
+    """The Gemini API key, which the gemini providers cannot do without."""
+    if not settings.gemini_api_key:
+        raise ValueError("GEMINI_API_KEY is required for the gemini provider")
+    return settings.gemini_api_key
+
+
+def _gemini_chat() -> BaseChatModel:
+    return ChatGoogleGenerativeAI(
+        model=settings.gemini_model,
+        google_api_key=_gemini_api_key(),
+        temperature=0.7,
+        streaming=True,
+    )
+
+
+def _gemini_embeddings() -> Embeddings:
+    return GoogleGenerativeAIEmbeddings(
+        model=settings.embedding_model,
+        google_api_key=_gemini_api_key(),
+        output_dimensionality=settings.embedding_dimensions,
+    )
+
+
+def _fake_chat() -> BaseChatModel:
+    return FakeChatModel(
+        ttft_ms=settings.fake_llm_ttft_ms,
+        tokens_per_second=settings.fake_llm_tokens_per_second,
+        jitter=settings.fake_llm_jitter,
+        answer_tokens=settings.fake_llm_answer_tokens,
+    )
+
+
+def _fake_embeddings() -> Embeddings:
+    return HashEmbeddings(
+        dimensions=settings.embedding_dimensions or settings.fake_embedding_dimensions,
+    )
+
+
+_chat_providers: Dict[str, ChatProvider] = {
+    PROVIDER_GEMINI: _gemini_chat,
+    PROVIDER_FAKE: _fake_chat,
+}
+_embedding_providers: Dict[str, EmbeddingProvider] = {
+    PROVIDER_GEMINI: _gemini_embeddings,
+    PROVIDER_FAKE: _fake_embeddings,
+}
+
+
+def register_chat_provider(name: str, factory: ChatProvider) -> None:
+    """Make a chat model factory selectable as llm_provider."""
+    _chat_providers[name] = factory
+
+
+def register_embedding_provider(name: str, factory: EmbeddingProvider) -> None:
+    """Make an embeddings factory selectable as embedding_provider."""
+    _embedding_providers[name] = factory
+
+
+def create_chat_model() -> BaseChatModel:
+    """
+    Build the chat model of the configured llm_provider.
+
+    Raises:
+        ValueError: If the provider is unknown or misconfigured
+    """
+    factory = _chat_providers.get(settings.llm_provider)
+    if factory is None:
+        raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
+    return factory()
+
+
+def create_embeddings() -> Embeddings:
+    """
+    Build the embeddings of the configured embedding_provider.
+
+    Raises:
+        ValueError: If the provider is unknown or misconfigured
+    """
+    factory = _embedding_providers.get(settings.embedding_provider)
+    if factory is None:
+        raise ValueError(f"Unknown embedding provider: {settings.embedding_provider}")
+    return factory()
+
+
+def embedding_model_name() -> str:
+    """
+    Identifier of the configured embedding model.
+
+    Used to key embedding caches and to detect collections that need a
+    rebuild, so vectors of different providers are never mixed.
+    """
+    if settings.embedding_provider == PROVIDER_GEMINI:
+        return settings.embedding_model
+    if settings.embedding_provider == PROVIDER_FAKE:
+        dimensions = settings.embedding_dimensions or settings.fake_embedding_dimensions
+        return f"{PROVIDER_FAKE}:hash-{dimensions}"
+    return f"{settings.embedding_provider}:{settings.embedding_model}"
@@ -1,31 +1,156 @@
 """
 RAG (Retrieval-Augmented Generation) service using LangChain and Chroma.
 """
-import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
 
+import chromadb
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from structlog import get_logger
 
 from src.core.config import settings
+from src.infrastructure.ml.admission import (
+    PRIORITY_BATCH,
+    AdmissionController,
+    AdmittedEmbeddings,
+    admission_priority,
+)
+from src.infrastructure.ml.answer_cache import (
+    CachedAnswer,
+    SemanticAnswerCache,
+    replay_chunks,
+)
+from src.infrastructure.ml.collection_registry import CollectionInfo, CollectionRegistry
+from src.infrastructure.ml.context_packing import (
+    ContextPacker,
+    PackedContext,
+    format_chunks,
+)
+from src.infrastructure.ml.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+    aembed_queries,
+    normalize_query,
+)
+from src.infrastructure.ml.flat_index import FlatVectorIndex
+from src.infrastructure.ml.ingestion import (
+    IngestionManifest,
+    IngestionPipeline,
+    IngestionStats,
+)
+from src.infrastructure.ml.lexical_index import BM25Index, identifiers, tokenize
+from src.infrastructure.ml.matryoshka import MatryoshkaEmbeddings
+from src.infrastructure.ml.parent_store import ParentStore
+from src.infrastructure.ml.providers import (
+    create_chat_model,
+    create_embeddings,
+    embedding_model_name,
+)
+from src.infrastructure.ml.request_coalescing import SingleFlight, StreamFanout
+from src.infrastructure.ml.retrieval_policy import (
+    MODE_HYBRID,
+    RetrievalPolicy,
+    RetrievalResult,
+    reciprocal_rank_fusion,
+)
+from src.infrastructure.ml.scope_index import RetrievalScope, ScopeIndex, ScopeSelection
+from src.infrastructure.ml.session_retrieval import (
+    PATH_ANSWER_CACHE,
+    PATH_EXTENDED,
+    PATH_FULL,
+    PATH_REUSED,
+    SessionRetrievalCache,
+    SessionTurn,
+    looks_like_follow_up,
+)
+from src.infrastructure.ml.token_counting import (
+    GenerationStats,
+    count_usage,
+    estimate_tokens,
+)
 
 logger = get_logger()
 
+# Retrieval backends
+BACKEND_CHROMA = "chroma"
+BACKEND_FLAT = "flat"
+
+
+@dataclass
+class CollectionHandle:
+    """A physical collection with its ingestion pipeline and derived indexes."""
+
+    name: str
+    vector_store: Chroma
+    pipeline: IngestionPipeline
+    flat_index: Optional[FlatVectorIndex] = None
+    lexical_index: Optional[BM25Index] = None
+    scope_index: Optional[ScopeIndex] = None
+    parent_store: Optional[ParentStore] = None
+
+    def sync_indexes(
+        self,
+        changed: bool = True,
+        stats: Optional[IngestionStats] = None,
+    ) -> None:
+        """
+        Bring the indexes derived from the vector store up to date.
+
+        Args:
+            changed: Whether the collection changed; missing indexes are
+                     built regardless
+            stats: Stats of the ingestion run that changed it; existing
+                   indexes are then updated with the chunks the run wrote
+                   and deleted instead of being rebuilt
+        """
+        for index in (self.flat_index, self.lexical_index, self.scope_index):
+            if index is None:
+                continue
+            if not index.exists():
+                index.build_from_store(self.vector_store)
+            elif changed and stats is not None:
+                index.update_from_store(self.vector_store, stats.written_ids, stats.deleted_ids)
+            elif changed:
+                index.build_from_store(self.vector_store)
+
 
 class RAGService:
     """Service for RAG operations using LangChain and Chroma."""
 
     def __init__(self) -> None:
         """Initialize the RAG service."""
-        self.llm: Optional[ChatGoogleGenerativeAI] = None
-        self.embeddings: Optional[GoogleGenerativeAIEmbeddings] = None
+        self.llm: Optional[BaseChatModel] = None
+        self.embeddings: Optional[Embeddings] = None
+        self.llm_admission: Optional[AdmissionController] = None
+        self.generation_stats = GenerationStats()
+        self.embedding_admission: Optional[AdmissionController] = None
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.query_cache: Optional[QueryEmbeddingCache] = None
+        self.answer_cache: Optional[SemanticAnswerCache] = None
+        self.kb_version = 0
+        self.query_flights: Optional[SingleFlight] = None
+        self.stream_flights: Optional[StreamFanout] = None
+        self.session_retrievals: Optional[SessionRetrievalCache] = None
         self.vector_store: Optional[Chroma] = None
-        self.retriever = None
+        self.retrieval_policy: Optional[RetrievalPolicy] = None
+        self.context_packer: Optional[ContextPacker] = None
+        self.ingestion_pipeline: Optional[IngestionPipeline] = None
+        self.flat_index: Optional[FlatVectorIndex] = None
+        self.registry: Optional[CollectionRegistry] = None
+        self._chroma_client: Optional[chromadb.ClientAPI] = None
+        self._collection: Optional[CollectionHandle] = None
+        self._ingest_executor: Optional[ProcessPoolExecutor] = None
+        self._ingest_lock = asyncio.Lock()
+        self._rebuild_lock = asyncio.Lock()
         self._initialized = False
 
     def initialize(self) -> None:
@@ -38,35 +163,119 @@ class RAGService:
         try:
             logger.info("Initializing RAG service...")
 
-            # Initialize LLM
-            self.llm = ChatGoogleGenerativeAI(
-                model=settings.gemini_model,
-                google_api_key=settings.gemini_api_key,
-                temperature=0.7,
-                streaming=True,
-            )
+            # Initialize LLM and embeddings of the configured providers
+            self.llm = create_chat_model()
+            self.embeddings = create_embeddings()
+            if settings.embedding_dimensions:
+                self.embeddings = MatryoshkaEmbeddings(
+                    embeddings=self.embeddings,
+                    dimensions=settings.embedding_dimensions,
+                )
 
-            # Initialize embeddings
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/gemini-embedding-001",
-                google_api_key=settings.gemini_api_key,
+            # Queue provider calls instead of letting bursts run into rate limits;
+            # cache hits below do not take a slot
+            if settings.admission_enabled:
+                self.llm_admission = AdmissionController(
+                    name="llm",
+                    max_concurrency=settings.llm_max_concurrency,
+                    max_queue=settings.admission_max_queue,
+                    rate_per_second=settings.llm_rate_limit_per_second,
+                    burst=settings.llm_rate_limit_burst,
+                    max_retries=settings.admission_max_retries,
+                    retry_base_delay=settings.admission_retry_base_delay,
+                    retry_max_delay=settings.admission_retry_max_delay,
+                )
+                self.embedding_admission = AdmissionController(
+                    name="embedding",
+                    max_concurrency=settings.embedding_max_concurrency,
+                    max_queue=settings.admission_max_queue,
+                    rate_per_second=settings.embedding_rate_limit_per_second,
+                    burst=settings.embedding_rate_limit_burst,
+                    max_retries=settings.admission_max_retries,
+                    retry_base_delay=settings.admission_retry_base_delay,
+                    retry_max_delay=settings.admission_retry_max_delay,
+                )
+                self.embeddings = AdmittedEmbeddings(self.embeddings, self.embedding_admission)
+
+            # Serve repeated texts from the on-disk and in-memory embedding caches
+            if settings.embedding_cache_path:
+                self.embedding_cache = EmbeddingCache(
+                    path=settings.embedding_cache_path,
+                    max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+                )
+            if settings.query_cache_size > 0:
+                self.query_cache = QueryEmbeddingCache(
+                    max_entries=settings.query_cache_size,
+                    ttl_seconds=settings.query_cache_ttl_seconds,
+                )
+            if self.embedding_cache or self.query_cache:
+                self.embeddings = CachedEmbeddings(
+                    embeddings=self.embeddings,
+                    model=embedding_model_name(),
+                    cache=self.embedding_cache,
+                    query_cache=self.query_cache,
+                    spill_queries=settings.query_cache_spill_to_disk,
+                    dimensions=settings.embedding_dimensions,
+                )
+
+            # Serve repeated first-turn questions without calling the LLM
+            if settings.answer_cache_enabled:
+                self.answer_cache = SemanticAnswerCache(
+                    max_entries=settings.answer_cache_size,
+                    max_distance=settings.answer_cache_max_distance,
+                    require_same_text=settings.answer_cache_require_same_text,
+                )
+
+            # Share in-flight answers among identical concurrent questions
+            if settings.request_coalescing_enabled:
+                self.query_flights = SingleFlight()
+                self.stream_flights = StreamFanout()
+
+            # Let follow-up questions reuse the chunks of the previous turn
+            if settings.follow_up_reuse_enabled:
+                self.session_retrievals = SessionRetrievalCache(
+                    max_sessions=settings.follow_up_cache_sessions,
+                    ttl_seconds=settings.follow_up_cache_ttl_seconds,
+                )
+
+            # Decide how many and which retrieved chunks go into the prompt
+            self.retrieval_policy = RetrievalPolicy(
+                max_k=settings.retrieval_max_k,
+                score_threshold=settings.retrieval_score_threshold,
+                mmr_lambda=settings.retrieval_mmr_lambda,
+                context_token_budget=settings.retrieval_context_token_budget,
             )
 
+            # Merge overlapping chunks into the prompt context
+            if settings.context_packing_enabled:
+                self.context_packer = ContextPacker(
+                    token_budget=settings.context_packing_token_budget,
+                )
+
             # Initialize vector store
             persist_dir = Path(settings.chroma_persist_directory)
             persist_dir.mkdir(parents=True, exist_ok=True)
+            self._chroma_client = chromadb.PersistentClient(path=str(persist_dir))
 
-            self.vector_store = Chroma(
-                collection_name=settings.chroma_collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=str(persist_dir),
+            # Resolve the active physical collection
+            self.registry = CollectionRegistry.load(
+                persist_dir / f"{settings.chroma_collection_name}_collections.json",
+                settings.chroma_collection_name,
             )
+            if not self.registry.active:
+                self.registry.activate(
+                    CollectionInfo(
+                        name=settings.chroma_collection_name,
+                        config=self._index_config(),
+                    )
+                )
+                self.registry.save()
 
-            # Create retriever
-            self.retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 4},
-            )
+            # Open the active collection: vector store, indexes and ingestion pipeline
+            self._ingest_executor = ProcessPoolExecutor(max_workers=settings.ingest_workers)
+            collection = self._open_collection(self.registry.active.name)
+            collection.sync_indexes(changed=False)
+            self._swap_collection(collection)
 
             self._initialized = True
             logger.info("RAG service initialized successfully")
@@ -79,18 +288,91 @@ class RAGService:
         """Check if the service is initialized."""
         return self._initialized
 
-    async def ingest_documents(self, knowledge_base_path: Optional[str] = None) -> int:
+    def needs_rebuild(self) -> bool:
+        """
+        Check if the active collection was built with a different index config.
+
+        Chunking parameters, the embedding model and its output dimensionality
+        cannot be changed incrementally, so a mismatch requires a full rebuild.
+        Vectors stored with another dimensionality than configured are
+        detected even if the collection predates the setting.
+        """
+        if not self.registry:
+            return False
+        if self.registry.active.config != self._index_config():
+            return True
+
+        if not settings.embedding_dimensions:
+            return False
+        stored = self._stored_dimensions()
+        return bool(stored and stored != settings.embedding_dimensions)
+
+    def collections_status(self) -> Dict[str, Any]:
+        """Describe the active and previous collections."""
+        if not self.registry:
+            raise RuntimeError("RAG service not initialized")
+        status = self.registry.to_dict()
+        status["needs_rebuild"] = self.needs_rebuild()
+        status["rollback_available"] = bool(
+            self.registry.previous and not self._config_changes(self.registry.previous.config)
+        )
+        status["index_config"] = self._index_config()
+        return status
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get cache, queue and generation counters of the service."""
+        return {
+            "query_embedding_cache": self.query_cache.stats() if self.query_cache else None,
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "coalescing": {
+                "query": self.query_flights.stats(),
+                "stream": self.stream_flights.stats(),
+            } if self.query_flights else None,
+            "follow_up_retrieval": (
+                self.session_retrievals.stats() if self.session_retrievals else None
+            ),
+            "admission": {
+                "llm": self.llm_admission.stats(),
+                "embedding": self.embedding_admission.stats(),
+            } if self.llm_admission else None,
+            "generation": self.generation_stats.stats(),
+            "kb_version": self.kb_version,
+        }
+
+    def close(self) -> None:
+        """Release background resources held by the service."""
+        if self._ingest_executor:
+            self._ingest_executor.shutdown(wait=False, cancel_futures=True)
+        if self.embedding_cache:
+            self.embedding_cache.close()
+        if self._collection and self._collection.parent_store:
+            self._collection.parent_store.close()
+
+    async def ingest_documents(
+        self,
+        knowledge_base_path: Optional[str] = None,
+        paths: Optional[List[str]] = None,
+        stats: Optional[IngestionStats] = None,
+    ) -> int:
         """
-        Ingest documents from the knowledge base directory.
+        Incrementally ingest documents from the knowledge base directory.
+
+        Files whose content hash matches the ingestion manifest are skipped,
+        changed files have their chunks replaced and deleted files have their
+        chunks removed from the vector store.
 
         Args:
             knowledge_base_path: Path to the knowledge base directory.
                                Uses settings.knowledge_base_path if not provided.
+            paths: Optional files or directories to ingest instead of the
+                   whole knowledge base
+            stats: Optional stats object updated in place to report progress
 
         Returns:
-            Number of documents ingested
+            Number of document chunks ingested
         """
-        if not self.vector_store or not self.embeddings:
+        if not self.vector_store or not self.embeddings or not self.ingestion_pipeline:
             raise RuntimeError("RAG service not initialized")
 
         kb_path = Path(knowledge_base_path or settings.knowledge_base_path)
@@ -99,109 +381,538 @@ class RAGService:
             logger.warning("Knowledge base path does not exist", path=str(kb_path))
             return 0
 
-        documents = []
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            add_start_index=True,
-        )
+        async with self._ingest_lock:
+            manifest = await asyncio.to_thread(IngestionManifest.load, self._manifest_path())
+            reset = not manifest.exists
+            if reset:
+                await asyncio.to_thread(self._reset_legacy_collection)
+                # Nothing is tracked yet, so a partial run is not enough
+                paths = None
+
+            stats = await self._collection.pipeline.run(
+                kb_path, manifest, stats=stats, paths=paths
+            )
+            changed = bool(stats.chunks_embedded or stats.chunks_removed)
+            # After a reset the run does not know what was deleted, so rebuild
+            await asyncio.to_thread(
+                self._collection.sync_indexes,
+                changed=changed,
+                stats=None if reset else stats,
+            )
+            if changed:
+                self._bump_kb_version()
 
-        # Load all markdown files
-        md_files = list(kb_path.rglob("*.md"))
-        logger.info(f"Found {len(md_files)} markdown files")
+        return stats.chunks_embedded
 
-        for md_file in md_files:
+    async def rebuild_collection(
+        self,
+        knowledge_base_path: Optional[str] = None,
+        stats: Optional[IngestionStats] = None,
+    ) -> str:
+        """
+        Rebuild the knowledge base into a shadow collection and swap to it.
+
+        Queries keep being served from the live collection while the shadow
+        collection fills. Changes made to the knowledge base in the meantime
+        are caught up before retrieval is switched over. The replaced
+        collection is kept for rollback unless settings.rebuild_retain_previous
+        is disabled; older collections are dropped.
+
+        Args:
+            knowledge_base_path: Path to the knowledge base directory.
+                               Uses settings.knowledge_base_path if not provided.
+            stats: Optional stats object updated in place to report progress
+
+        Returns:
+            Name of the new active collection
+        """
+        if not self.registry or not self.ingestion_pipeline:
+            raise RuntimeError("RAG service not initialized")
+
+        kb_path = Path(knowledge_base_path or settings.knowledge_base_path)
+        if not kb_path.exists():
+            raise ValueError(f"Knowledge base path does not exist: {kb_path}")
+
+        stats = stats or IngestionStats()
+        async with self._rebuild_lock:
+            name = self.registry.next_name()
+            await asyncio.to_thread(self.registry.save)
+            logger.info("Rebuilding knowledge base into shadow collection", collection=name)
+
+            collection = await asyncio.to_thread(self._open_collection, name)
+            manifest = IngestionManifest(self._manifest_path(name))
             try:
-                with open(md_file, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                # Create document with metadata
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "source": str(md_file.relative_to(kb_path)),
-                        "file_path": str(md_file),
-                    },
+                await collection.pipeline.run(kb_path, manifest, stats=stats)
+                if stats.errors:
+                    raise RuntimeError(f"Rebuild had {len(stats.errors)} errors")
+
+                async with self._ingest_lock:
+                    # Catch up with changes made while the shadow collection filled
+                    await collection.pipeline.run(kb_path, manifest)
+                    await asyncio.to_thread(collection.sync_indexes)
+
+                    self._swap_collection(collection)
+                    dropped = [self.registry.activate(
+                        CollectionInfo(name=name, config=self._index_config())
+                    )]
+                    if not settings.rebuild_retain_previous:
+                        dropped.append(self.registry.previous)
+                        self.registry.previous = None
+                    await asyncio.to_thread(self.registry.save)
+            except Exception:
+                logger.error("Rebuild failed, dropping shadow collection", collection=name)
+                await asyncio.to_thread(self._drop_collection, name)
+                raise
+
+            for info in dropped:
+                if info:
+                    await asyncio.to_thread(self._drop_collection, info.name)
+
+        logger.info("Switched to rebuilt collection", collection=name)
+        return name
+
+    async def rollback_collection(self) -> str:
+        """
+        Switch back to the previous collection.
+
+        The previous collection is used as it was; the collection rolled back
+        from becomes the previous one, so the rollback can itself be undone.
+        Only a collection built with the current index config can be rolled
+        back to: questions are embedded with the configured model, and
+        ingestion into it uses the configured chunking.
+
+        Returns:
+            Name of the new active collection
+
+        Raises:
+            ValueError: If there is no previous collection, or it was built
+                        with a different index config
+        """
+        if not self.registry:
+            raise RuntimeError("RAG service not initialized")
+
+        async with self._rebuild_lock:
+            async with self._ingest_lock:
+                if not self.registry.previous:
+                    raise ValueError("No previous collection to roll back to")
+                changed = self._config_changes(self.registry.previous.config)
+                if changed:
+                    raise ValueError(
+                        "Previous collection was built with a different index config "
+                        f"({', '.join(changed)}); restore those settings to roll back"
+                    )
+
+                collection = await asyncio.to_thread(
+                    self._open_collection, self.registry.previous.name
+                )
+                await asyncio.to_thread(collection.sync_indexes, changed=False)
+                self._swap_collection(collection)
+                active = self.registry.rollback()
+                await asyncio.to_thread(self.registry.save)
+
+        logger.info("Rolled back to previous collection", collection=active.name)
+        return active.name
+
+    def _config_changes(self, config: Dict[str, Any]) -> List[str]:
+        """Index parameters that differ between a collection's config and the current one."""
+        current = self._index_config()
+        return sorted(key for key in set(config) | set(current) if config.get(key) != current.get(key))
+
+    def _index_config(self) -> Dict[str, Any]:
+        """Index parameters that require a rebuild when they change."""
+        config = {
+            "embedding_model": embedding_model_name(),
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+        }
+        # Only recorded when set, so collections built before the setting still match
+        if settings.embedding_dimensions:
+            config["embedding_dimensions"] = settings.embedding_dimensions
+        if settings.parent_chunk_size:
+            config["parent_chunk_size"] = settings.parent_chunk_size
+            config["parent_chunk_overlap"] = settings.parent_chunk_overlap
+        return config
+
+    def _stored_dimensions(self) -> Optional[int]:
+        """Dimensionality of the vectors in the active collection, if it has any."""
+        if not self.vector_store:
+            return None
+        sample = self.vector_store.get(limit=1, include=["embeddings"])
+        if not sample["ids"]:
+            return None
+        return len(sample["embeddings"][0])
+
+    def _open_collection(self, name: str) -> CollectionHandle:
+        """Create the vector store, ingestion pipeline and indexes of a physical collection."""
+        store = Chroma(
+            collection_name=name,
+            embedding_function=self.embeddings,
+            client=self._chroma_client,
+        )
+        parent_store = None
+        if settings.parent_chunk_size:
+            parent_store = ParentStore(self._parent_store_path(name))
+        pipeline = IngestionPipeline(
+            vector_store=store,
+            embeddings=self.embeddings,
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            batch_size=settings.ingest_batch_size,
+            concurrency=settings.ingest_embedding_concurrency,
+            executor=self._ingest_executor,
+            dedup_threshold=(
+                settings.dedup_similarity_threshold if settings.dedup_enabled else None
+            ),
+            parent_store=parent_store,
+            parent_chunk_size=settings.parent_chunk_size,
+            parent_chunk_overlap=settings.parent_chunk_overlap,
+        )
+        flat_index = None
+        if settings.retrieval_backend == BACKEND_FLAT:
+            flat_index = FlatVectorIndex(
+                Path(settings.chroma_persist_directory),
+                name,
+                quantization=settings.flat_index_quantization,
+                rescore_multiplier=settings.flat_index_rescore_multiplier,
+                vector_store=store,
+                keep_full_precision=settings.flat_index_keep_full_precision,
+            )
+        lexical_index = None
+        if settings.hybrid_search_enabled:
+            lexical_index = BM25Index(Path(settings.chroma_persist_directory), name)
+        return CollectionHandle(
+            name=name,
+            vector_store=store,
+            pipeline=pipeline,
+            flat_index=flat_index,
+            lexical_index=lexical_index,
+            scope_index=ScopeIndex(Path(settings.chroma_persist_directory), name),
+            parent_store=parent_store,
+        )
+
+    def _swap_collection(self, collection: CollectionHandle) -> None:
+        """
+        Point retrieval and ingestion at another collection.
+
+        Runs without awaiting, so the switch is atomic for the event loop;
+        in-flight queries finish on the collection they started with.
+        """
+        self._collection = collection
+        self.vector_store = collection.vector_store
+        self.ingestion_pipeline = collection.pipeline
+        self.flat_index = collection.flat_index
+        self._bump_kb_version()
+
+    def _bump_kb_version(self) -> None:
+        """Record that the corpus served by retrieval changed."""
+        self.kb_version += 1
+        if self.answer_cache:
+            self.answer_cache.clear()
+
+    def _drop_collection(self, name: str) -> None:
+        """Delete a physical collection and its ingestion manifest."""
+        try:
+            self._chroma_client.delete_collection(name)
+        except Exception as e:
+            logger.warning("Failed to delete collection", collection=name, error=str(e))
+        self._manifest_path(name).unlink(missing_ok=True)
+        FlatVectorIndex(Path(settings.chroma_persist_directory), name).drop()
+        BM25Index(Path(settings.chroma_persist_directory), name).drop()
+        ScopeIndex(Path(settings.chroma_persist_directory), name).drop()
+        ParentStore(self._parent_store_path(name)).drop()
+        logger.info("Dropped collection", collection=name)
+
+    def _manifest_path(self, name: Optional[str] = None) -> Path:
+        """Path of the ingestion manifest of a collection (the active one by default)."""
+        name = name or self.registry.active.name
+        return Path(settings.chroma_persist_directory) / f"{name}_manifest.json"
+
+    def _parent_store_path(self, name: str) -> Path:
+        """Path of the parent section store of a collection."""
+        return Path(settings.chroma_persist_directory) / f"{name}_parents.sqlite3"
+
+    def _reset_legacy_collection(self) -> None:
+        """
+        Drop vectors that were ingested before the manifest existed.
+
+        Those chunks have random IDs that the manifest cannot track, so keeping
+        them would leave duplicates next to the re-ingested chunks.
+        """
+        existing = self.vector_store.get(include=[])
+        if existing["ids"]:
+            logger.info(
+                "Removing untracked vectors from collection",
+                count=len(existing["ids"]),
+            )
+            self.vector_store.delete(ids=existing["ids"])
+
+    async def retrieve(
+        self,
+        question: str,
+        question_vector: Optional[List[float]] = None,
+        scope: Optional[RetrievalScope] = None,
+    ) -> RetrievalResult:
+        """
+        Retrieve the chunks to answer a question with.
+
+        Fetches settings.retrieval_fetch_k candidates from the active
+        collection, fuses them with the BM25 results by reciprocal rank when
+        hybrid search is enabled, and lets the retrieval policy pick among
+        them. Questions naming identifiers that the best lexical hit contains
+        are answered by the lexical index alone, without embedding them.
+
+        Args:
+            question: The user's question
+            question_vector: Embedding of the question, if already computed
+            scope: Optional knowledge base subtree to search in
+
+        Returns:
+            Retrieval result with the selected chunks and their scores
+        """
+        if not self._collection or not self.retrieval_policy:
+            raise RuntimeError("RAG service not initialized")
+
+        collection = self._collection
+        selection = None
+        if scope and not scope.is_empty():
+            selection = collection.scope_index.resolve(scope)
+            if not selection.chunk_ids:
+                logger.info("Retrieval scope matches no chunks", scope=str(scope))
+                return RetrievalResult()
+
+        if question_vector is None:
+            result = await self._lexical_fast_path(question, selection)
+            if result:
+                return result
+            question_vector = await self.embeddings.aembed_query(question)
+
+        if collection.flat_index is not None:
+            docs, vectors = collection.flat_index.search_with_vectors(
+                question_vector,
+                settings.retrieval_fetch_k,
+                candidate_rows=(
+                    collection.flat_index.rows_for(selection.chunk_ids) if selection else None
+                ),
+            )
+        else:
+            [(docs, vectors)] = await asyncio.to_thread(
+                self._query_chroma,
+                collection.vector_store,
+                [question_vector],
+                {"source": {"$in": selection.sources}} if selection else None,
+            )
+
+        return await self._select(collection, question, question_vector, docs, vectors, selection)
+
+    async def retrieve_batch(
+        self,
+        questions: List[str],
+        scope: Optional[RetrievalScope] = None,
+    ) -> AsyncGenerator[Tuple[int, RetrievalResult], None]:
+        """
+        Retrieve the chunks for many questions, for offline and evaluation use.
+
+        Questions are processed in blocks of settings.retrieve_batch_size:
+        each block is embedded with one provider request and searched with
+        one multi-query top-k, then every question goes through the same
+        fusion and retrieval policy as retrieve(). The LLM is not called.
+
+        Args:
+            questions: Questions to retrieve for
+            scope: Optional knowledge base subtree to search in
+
+        Yields:
+            Tuples of (question index, retrieval result), in question order
+        """
+        if not self._collection or not self.retrieval_policy:
+            raise RuntimeError("RAG service not initialized")
+
+        collection = self._collection
+        selection = None
+        candidate_rows = None
+        where = None
+        if scope and not scope.is_empty():
+            selection = collection.scope_index.resolve(scope)
+            if not selection.chunk_ids:
+                for index in range(len(questions)):
+                    yield index, RetrievalResult()
+                return
+            if collection.flat_index is not None:
+                candidate_rows = collection.flat_index.rows_for(selection.chunk_ids)
+            where = {"source": {"$in": selection.sources}}
+
+        for start in range(0, len(questions), settings.retrieve_batch_size):
+            block = questions[start:start + settings.retrieve_batch_size]
+            with admission_priority(PRIORITY_BATCH):
+                question_vectors = await aembed_queries(self.embeddings, block)
+
+            if collection.flat_index is not None:
+                candidates = collection.flat_index.search_many_with_vectors(
+                    question_vectors, settings.retrieval_fetch_k, candidate_rows=candidate_rows
+                )
+            else:
+                candidates = await asyncio.to_thread(
+                    self._query_chroma, collection.vector_store, question_vectors, where
                 )
 
-                # Split document
-                split_docs = text_splitter.split_documents([doc])
-                documents.extend(split_docs)
-                logger.debug(f"Processed {md_file.name}: {len(split_docs)} chunks")
+            for offset, (question, question_vector, (docs, vectors)) in enumerate(
+                zip(block, question_vectors, candidates)
+            ):
+                result = await self._select(
+                    collection, question, question_vector, docs, vectors, selection
+                )
+                yield start + offset, result
 
-            except Exception as e:
-                logger.error(f"Failed to process {md_file}", error=str(e))
+    async def _select(
+        self,
+        collection: CollectionHandle,
+        question: str,
+        question_vector: List[float],
+        docs: List[Document],
+        vectors: np.ndarray,
+        selection: Optional[ScopeSelection] = None,
+    ) -> RetrievalResult:
+        """Fuse vector candidates with lexical hits and apply the retrieval policy."""
+        if collection.lexical_index is None:
+            result = self.retrieval_policy.select(question_vector, docs, vectors)
+        else:
+            hits = collection.lexical_index.search(
+                question,
+                settings.retrieval_fetch_k,
+                allowed_ids=selection.chunk_ids if selection else None,
+            )
+            hit_ids = [chunk_id for chunk_id, _ in hits]
+            fused = reciprocal_rank_fusion(
+                [[doc.id for doc in docs], hit_ids], k=settings.rrf_k
+            )
 
-        if documents:
-            # Add to vector store
-            self.vector_store.add_documents(documents)
-            logger.info(f"Ingested {len(documents)} document chunks")
-            return len(documents)
+            # Lexical hits the vector search did not return
+            known = {doc.id for doc in docs}
+            missing = [chunk_id for chunk_id in hit_ids if chunk_id not in known]
+            if missing:
+                extra_docs, extra_vectors = await asyncio.to_thread(
+                    self._get_chunks, collection.vector_store, missing, True
+                )
+                vectors = np.vstack([vectors, extra_vectors]) if docs else extra_vectors
+                docs = docs + extra_docs
 
-        return 0
+            matched = set(hit_ids)
+            result = self.retrieval_policy.select(
+                question_vector,
+                docs,
+                vectors,
+                relevance=np.array([fused[doc.id] for doc in docs]),
+                lexical_matches=np.array([doc.id in matched for doc in docs], dtype=bool),
+            )
+            result.mode = MODE_HYBRID
+
+        result = await self._expand_to_parents(collection, result)
+        logger.debug(
+            "Retrieved context",
+            mode=result.mode,
+            k=result.k,
+            candidates=result.candidates,
+            scores=[round(score, 3) for score in result.scores],
+            context_tokens=result.context_tokens,
+            tokens_saved=result.tokens_saved,
+        )
+        return result
 
     async def query(
         self,
         question: str,
         chat_history: Optional[List[Dict]] = None,
+        scope: Optional[RetrievalScope] = None,
+        session_id: Optional[str] = None,
+        history_summary: Optional[str] = None,
     ) -> Tuple[str, List[Document], Dict]:
         """
         Query the RAG system.
 
+        First-turn questions are served from the semantic answer cache when
+        a near-identical question was answered for the current knowledge base,
+        and share the answer of an identical question that is still in flight.
+        Follow-up questions of a session may reuse the chunks of its previous
+        turn; token_usage["retrieval_path"] tells how the chunks were obtained.
+
         Args:
             question: The user's question
             chat_history: Optional chat history as list of message dicts
+            scope: Optional knowledge base subtree to retrieve from
+            session_id: Optional chat session the question belongs to
+            history_summary: Optional summary of the turns older than chat_history
 
         Returns:
             Tuple of (answer, referenced_documents, token_usage)
         """
-        if not self.llm or not self.retriever:
+        if not self.llm or not self._collection:
             raise RuntimeError("RAG service not initialized")
 
-        try:
-            # First retrieve relevant documents
-            docs = await self.retriever.ainvoke(question)
-
-            # Format context
-            context = "\n\n".join([
-                f"Source: {doc.metadata.get('source', 'unknown')}\n{doc.page_content}"
-                for doc in docs
-            ])
-
-            # Build prompt
-            system_prompt = f"""You are a helpful AI assistant. Use the following pieces of retrieved context to answer the user's question.
-If you don't know the answer, just say that you don't know, don't try to make up an answer.
-Keep the answer concise and well-structured using markdown formatting where appropriate.
-
-Context:
-{context}
-"""
+        if self.query_flights and not chat_history and not history_summary:
+            answer, docs, token_usage = await self.query_flights.do(
+                self._flight_key(question, scope),
+                lambda: self._query(question, None, scope),
+            )
+            answer, docs, token_usage = answer, list(docs), dict(token_usage)
+        else:
+            answer, docs, token_usage = await self._query(
+                question, chat_history, scope, session_id, history_summary
+            )
+        self._remember_turn(session_id, question, scope, docs, token_usage)
+        return answer, docs, token_usage
 
-            messages = [
-                ("system", system_prompt),
-            ]
+    async def _query(
+        self,
+        question: str,
+        chat_history: Optional[List[Dict]] = None,
+        scope: Optional[RetrievalScope] = None,
+        session_id: Optional[str] = None,
+        history_summary: Optional[str] = None,
+    ) -> Tuple[str, List[Document], Dict]:
+        """Answer a question; see query()."""
+        try:
+            kb_version = self.kb_version
+            question_vector = None
+            retrieval = None
+            if self.answer_cache and not chat_history and not (scope and not scope.is_empty()):
+                # Lexical fast-path hits skip embedding, and with it the cache lookup
+                retrieval = await self._lexical_fast_path(question)
+                if not retrieval:
+                    question_vector = await self.embeddings.aembed_query(question)
+                    cached = self.answer_cache.lookup(question, question_vector, kb_version)
+                    if cached:
+                        logger.info("Serving answer from semantic cache")
+                        token_usage = self._cached_token_usage(cached.token_usage)
+                        return cached.answer, list(cached.documents), token_usage
 
-            # Add chat history
-            if chat_history:
-                for msg in chat_history:
-                    if msg.get("role") == "user":
-                        messages.append(("human", msg.get("content", "")))
-                    elif msg.get("role") == "assistant":
-                        messages.append(("ai", msg.get("content", "")))
+            # First retrieve relevant documents
+            path = PATH_FULL
+            if not retrieval:
+                retrieval, path = await self._retrieve_turn(
+                    question, question_vector, scope, session_id if chat_history else None
+                )
+            docs = retrieval.documents
 
-            messages.append(("human", question))
+            context = self._pack_context(docs)
 
             # Get response
-            response = await self.llm.ainvoke(messages)
+            messages = self._build_messages(question, context.text, chat_history, history_summary)
+            response = await self._invoke_llm(messages)
             answer = response.content if hasattr(response, 'content') else str(response)
 
             # Token usage
+            usage, source = count_usage(response, messages, answer)
             token_usage = {
-                "input_tokens": None,
-                "output_tokens": None,
-                "rag_tokens": self._estimate_rag_tokens(docs),
-                "total_tokens": None,
+                **usage,
+                "rag_tokens": context.tokens,
+                "rag_tokens_saved": retrieval.tokens_saved + context.tokens_saved,
+                "packing_tokens_saved": context.tokens_saved,
+                "retrieval_path": path,
             }
+            logger.debug("LLM token usage", source=source, **usage)
+
+            if question_vector is not None:
+                self._cache_answer(question, question_vector, answer, docs, token_usage, kb_version)
 
             return answer, docs, token_usage
 
@@ -213,75 +924,562 @@ Context:
         self,
         question: str,
         chat_history: Optional[List[Dict]] = None,
+        scope: Optional[RetrievalScope] = None,
+        session_id: Optional[str] = None,
+        history_summary: Optional[str] = None,
     ) -> AsyncGenerator[Tuple[str, Optional[List[Document]], Optional[Dict]], None]:
         """
         Stream the RAG query response.
 
+        Answers served from the semantic answer cache are replayed in chunks.
+        Identical first-turn questions asked while one is being answered
+        subscribe to its stream instead of starting their own. Follow-up
+        questions may reuse the chunks of the previous turn, see query().
+
         Args:
             question: The user's question
             chat_history: Optional chat history
+            scope: Optional knowledge base subtree to retrieve from
+            session_id: Optional chat session the question belongs to
+            history_summary: Optional summary of the turns older than chat_history
 
         Yields:
-            Tuples of (content_chunk, documents, token_usage)
+            Tuples of (content_chunk, documents, token_usage); the documents
+            come with the first chunk, and a last empty chunk carries the
+            token_usage including the LLM token counts
         """
-        if not self.llm or not self.retriever:
+        if not self.llm or not self._collection:
             raise RuntimeError("RAG service not initialized")
 
+        if self.stream_flights and not chat_history and not history_summary:
+            stream = self.stream_flights.subscribe(
+                self._flight_key(question, scope),
+                lambda: self._stream_query(question, None, scope),
+            )
+        else:
+            stream = self._stream_query(
+                question, chat_history, scope, session_id, history_summary
+            )
         try:
+            async for chunk, docs, token_usage in stream:
+                if docs is not None:
+                    self._remember_turn(session_id, question, scope, docs, token_usage)
+                yield (
+                    chunk,
+                    list(docs) if docs is not None else None,
+                    dict(token_usage) if token_usage is not None else None,
+                )
+        finally:
+            # Leave a shared stream right away when the caller stops reading
+            await stream.aclose()
+
+    async def _stream_query(
+        self,
+        question: str,
+        chat_history: Optional[List[Dict]] = None,
+        scope: Optional[RetrievalScope] = None,
+        session_id: Optional[str] = None,
+        history_summary: Optional[str] = None,
+    ) -> AsyncGenerator[Tuple[str, Optional[List[Document]], Optional[Dict]], None]:
+        """Stream the answer to a question; see stream_query()."""
+        try:
+            kb_version = self.kb_version
+            question_vector = None
+            retrieval = None
+            if self.answer_cache and not chat_history and not (scope and not scope.is_empty()):
+                # Lexical fast-path hits skip embedding, and with it the cache lookup
+                retrieval = await self._lexical_fast_path(question)
+                if not retrieval:
+                    question_vector = await self.embeddings.aembed_query(question)
+                    cached = self.answer_cache.lookup(question, question_vector, kb_version)
+                    if cached:
+                        logger.info("Replaying answer from semantic cache")
+                        token_usage = self._cached_token_usage(cached.token_usage)
+                        first = True
+                        for chunk in replay_chunks(cached.answer):
+                            if first:
+                                yield chunk, list(cached.documents), token_usage
+                                first = False
+                            else:
+                                yield chunk, None, None
+                        return
+
             # First retrieve relevant documents
-            docs = await self.retriever.ainvoke(question)
+            path = PATH_FULL
+            if not retrieval:
+                retrieval, path = await self._retrieve_turn(
+                    question, question_vector, scope, session_id if chat_history else None
+                )
+            docs = retrieval.documents
+            context = self._pack_context(docs)
+            messages = self._build_messages(question, context.text, chat_history, history_summary)
 
-            # Format context
-            context = "\n\n".join([
-                f"Source: {doc.metadata.get('source', 'unknown')}\n{doc.page_content}"
-                for doc in docs
-            ])
+            # Stream the response
+            docs_sent = False
+            token_usage = {
+                # Estimated until the provider reports usage at the end of the stream
+                "input_tokens": sum(estimate_tokens(content) for _, content in messages),
+                "rag_tokens": context.tokens,
+                "rag_tokens_saved": retrieval.tokens_saved + context.tokens_saved,
+                "packing_tokens_saved": context.tokens_saved,
+                "retrieval_path": path,
+            }
+            answer = ""
+            response = None
+
+            llm_stream = self._stream_llm(messages)
+            try:
+                async for chunk in llm_stream:
+                    answer += chunk.content or ""
+                    # Summed chunks carry the usage metadata of the whole stream
+                    response = chunk if response is None else response + chunk
+                    if not docs_sent:
+                        yield chunk.content, docs, token_usage
+                        docs_sent = True
+                    else:
+                        yield chunk.content, None, None
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away; closing the LLM stream below stops the generation
+                generated = estimate_tokens(answer)
+                saved = self.generation_stats.record_cancelled(generated)
+                logger.info("Generation cancelled", generated_tokens=generated, tokens_saved=saved)
+                raise
+            finally:
+                # Release the admission slot now, not when the stream is collected
+                await llm_stream.aclose()
+
+            # The LLM token counts are only known once the stream has ended
+            usage, source = count_usage(response, messages, answer)
+            token_usage = {**token_usage, **usage}
+            self.generation_stats.record_completed(usage["output_tokens"])
+            logger.debug("LLM token usage", source=source, **usage)
+            yield "", None, token_usage
+
+            if question_vector is not None:
+                self._cache_answer(question, question_vector, answer, docs, token_usage, kb_version)
+
+        except Exception as e:
+            logger.error("Stream query failed", error=str(e))
+            raise
+
+    def _cached_token_usage(self, token_usage: Dict) -> Dict:
+        """Token usage of an answer served from the cache, which costs no LLM call."""
+        return {
+            **token_usage,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "retrieval_path": PATH_ANSWER_CACHE,
+        }
+
+    async def _retrieve_turn(
+        self,
+        question: str,
+        question_vector: Optional[List[float]],
+        scope: Optional[RetrievalScope],
+        session_id: Optional[str],
+    ) -> Tuple[RetrievalResult, str]:
+        """
+        Retrieve the chunks for a turn, reusing the previous turn for follow-ups.
+
+        A follow-up is reused as is when its embedding is close to the
+        previous question; moderately close questions keep the previous
+        chunks and add a few new ones. Questions that only refer back with
+        a pronoun are extended at a lower similarity, since their wording
+        shares little with the question they refer to.
+
+        Args:
+            question: The user's question
+            question_vector: Question embedding, if already computed
+            scope: Optional knowledge base subtree to retrieve from
+            session_id: Session whose previous turn may be reused, None for
+                        a full retrieval
+
+        Returns:
+            Tuple of (retrieval result, retrieval path)
+        """
+        turn = None
+        if self.session_retrievals and session_id:
+            turn = self.session_retrievals.get(session_id)
+            if turn and (turn.kb_version != self.kb_version or turn.scope_key != self._scope_key(scope)):
+                turn = None
+
+        path = PATH_FULL
+        result = None
+        if turn:
+            if question_vector is None:
+                question_vector = await self.embeddings.aembed_query(question)
+            # The previous question was embedded on its turn, so this hits the cache
+            previous_vector = await self.embeddings.aembed_query(turn.question)
+            similarity = float(
+                np.dot(question_vector, previous_vector)
+                / max(np.linalg.norm(question_vector) * np.linalg.norm(previous_vector), 1e-9)
+            )
+            extend_similarity = settings.follow_up_extend_similarity
+            if looks_like_follow_up(question):
+                extend_similarity = min(extend_similarity, settings.follow_up_hint_similarity)
+            if similarity >= settings.follow_up_reuse_similarity:
+                path = PATH_REUSED
+            elif similarity >= extend_similarity:
+                path = PATH_EXTENDED
+
+            if path == PATH_REUSED:
+                result = self._turn_result(turn.documents)
+            elif path == PATH_EXTENDED:
+                fresh = await self.retrieve(question, question_vector, scope)
+                known = {doc.id for doc in turn.documents}
+                added = [doc for doc in fresh.documents if doc.id not in known]
+                result = self._turn_result(
+                    turn.documents + added[:settings.follow_up_extend_k]
+                )
+                result.candidates = fresh.candidates
+                result.mode = fresh.mode
+
+        if result is None:
+            result = await self.retrieve(question, question_vector, scope)
+        if self.session_retrievals and session_id:
+            self.session_retrievals.record_path(path)
+            logger.debug("Follow-up retrieval", path=path, k=result.k)
+        return result, path
+
+    def _turn_result(self, documents: List[Document]) -> RetrievalResult:
+        """Wrap chunks carried over from a previous turn as a retrieval result."""
+        return RetrievalResult(
+            documents=list(documents),
+            scores=[doc.metadata.get("similarity_score") or 0.0 for doc in documents],
+            candidates=len(documents),
+            context_tokens=sum(estimate_tokens(doc.page_content) for doc in documents),
+        )
+
+    def _remember_turn(
+        self,
+        session_id: Optional[str],
+        question: str,
+        scope: Optional[RetrievalScope],
+        docs: List[Document],
+        token_usage: Optional[Dict],
+    ) -> None:
+        """Keep the chunks of a turn for the follow-ups of its session."""
+        if not self.session_retrievals or not session_id or not docs:
+            return
+        # Reused turns keep the question the chunks were retrieved for
+        if (token_usage or {}).get("retrieval_path") == PATH_REUSED:
+            return
+        self.session_retrievals.put(
+            session_id,
+            SessionTurn(
+                question=question,
+                documents=list(docs),
+                scope_key=self._scope_key(scope),
+                kb_version=self.kb_version,
+            ),
+        )
 
-            # Build prompt
-            system_prompt = f"""You are a helpful AI assistant. Use the following pieces of retrieved context to answer the user's question.
+    def _scope_key(self, scope: Optional[RetrievalScope]) -> Tuple:
+        """Hashable identity of a retrieval scope."""
+        scope = scope or RetrievalScope()
+        return tuple(sorted(scope.path_prefixes)), tuple(sorted(scope.tags))
+
+    def _flight_key(self, question: str, scope: Optional[RetrievalScope]) -> Tuple:
+        """Identity of a first-turn question for request coalescing."""
+        return (normalize_query(question), *self._scope_key(scope), self.kb_version)
+
+    def _pack_context(self, docs: List[Document]) -> PackedContext:
+        """Assemble the prompt context from the retrieved documents."""
+        if self.context_packer:
+            context = self.context_packer.pack(docs)
+            logger.debug(
+                "Packed context",
+                chunks=len(docs),
+                passages=len(context.passages),
+                tokens=context.tokens,
+                tokens_saved=context.tokens_saved,
+            )
+            return context
+        text = format_chunks(docs)
+        return PackedContext(text=text, tokens=estimate_tokens(text))
+
+    def _build_messages(
+        self,
+        question: str,
+        context: str,
+        chat_history: Optional[List[Dict]] = None,
+        history_summary: Optional[str] = None,
+    ) -> List[Tuple[str, str]]:
+        """Build the LLM prompt from the retrieved context, chat history and the question."""
+        # Build prompt
+        system_prompt = f"""You are a helpful AI assistant. Use the following pieces of retrieved context to answer the user's question.
 If you don't know the answer, just say that you don't know, don't try to make up an answer.
 Keep the answer concise and well-structured using markdown formatting where appropriate.
 
 Context:
 {context}
+"""
+        if history_summary:
+            system_prompt += f"""
+Summary of the earlier conversation:
+{history_summary}
 """
 
-            messages = [
-                ("system", system_prompt),
-            ]
+        messages = [
+            ("system", system_prompt),
+        ]
 
-            # Add chat history
-            if chat_history:
-                for msg in chat_history:
-                    if msg.get("role") == "user":
-                        messages.append(("human", msg.get("content", "")))
-                    elif msg.get("role") == "assistant":
-                        messages.append(("ai", msg.get("content", "")))
+        # Add chat history
+        if chat_history:
+            for msg in chat_history:
+                if msg.get("role") == "user":
+                    messages.append(("human", msg.get("content", "")))
+                elif msg.get("role") == "assistant":
+                    messages.append(("ai", msg.get("content", "")))
 
-            messages.append(("human", question))
+        messages.append(("human", question))
+        return messages
 
-            # Stream the response
-            docs_sent = False
-            token_usage = {
-                "rag_tokens": self._estimate_rag_tokens(docs),
-            }
+    async def summarize_history(
+        self,
+        summary: Optional[str],
+        messages: List[Dict],
+        max_tokens: int,
+    ) -> str:
+        """
+        Fold chat messages into the rolling summary of a conversation.
+
+        Args:
+            summary: Current summary, if any
+            messages: Messages to add, oldest first, as role/content dicts
+            max_tokens: Approximate length limit of the summary
 
-            async for chunk in self.llm.astream(messages):
-                if not docs_sent:
-                    yield chunk.content, docs, token_usage
-                    docs_sent = True
+        Returns:
+            Updated summary
+        """
+        if not self.llm:
+            raise RuntimeError("RAG service not initialized")
+
+        transcript = "\n\n".join(
+            f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}" for msg in messages
+        )
+        prompt = f"""Update the running summary of a conversation between a user and an AI assistant with the new messages below.
+Keep the questions asked, facts and decisions established, and any names, identifiers or code the user may refer back to.
+Write at most {max_tokens * 3 // 4} words. Reply with the updated summary only.
+
+Current summary:
+{summary or "(none)"}
+
+New messages:
+{transcript}
+"""
+        response = await self._invoke_llm([("human", prompt)], priority=PRIORITY_BATCH)
+        return (response.content if hasattr(response, 'content') else str(response)).strip()
+
+    async def _invoke_llm(self, messages: List[Tuple[str, str]], priority: Optional[int] = None) -> Any:
+        """Call the LLM once admitted."""
+        if self.llm_admission is None:
+            return await self.llm.ainvoke(messages)
+        return await self.llm_admission.call(lambda: self.llm.ainvoke(messages), priority)
+
+    def _stream_llm(self, messages: List[Tuple[str, str]]) -> AsyncIterator[Any]:
+        """Stream from the LLM once admitted; the slot is held until the stream ends or is closed."""
+        if self.llm_admission is None:
+            return self.llm.astream(messages)
+        return self.llm_admission.stream(lambda: self.llm.astream(messages))
+
+    def _cache_answer(
+        self,
+        question: str,
+        question_vector: List[float],
+        answer: str,
+        docs: List[Document],
+        token_usage: Dict,
+        kb_version: int,
+    ) -> None:
+        """Store an answer unless the knowledge base changed while it was generated."""
+        if not answer or kb_version != self.kb_version:
+            return
+        self.answer_cache.put(
+            question_vector,
+            CachedAnswer(
+                question=question,
+                answer=answer,
+                documents=list(docs),
+                token_usage=dict(token_usage),
+                kb_version=kb_version,
+            ),
+        )
+
+    async def _lexical_fast_path(
+        self,
+        question: str,
+        selection: Optional[ScopeSelection] = None,
+    ) -> Optional[RetrievalResult]:
+        """
+        Retrieve by BM25 alone when the lexical match is unambiguous.
+
+        The question has to name at least one code identifier, and the best
+        lexical hit has to contain all of them and cover at least
+        settings.lexical_fast_path_min_coverage of the question's terms.
+
+        Returns:
+            Retrieval result, or None to fall back to embedding search
+        """
+        collection = self._collection
+        if not settings.lexical_fast_path_enabled or collection.lexical_index is None:
+            return None
+        names = identifiers(question)
+        if not names:
+            return None
+
+        hits = collection.lexical_index.search(
+            question,
+            settings.retrieval_fetch_k,
+            allowed_ids=selection.chunk_ids if selection else None,
+        )
+        if not hits:
+            return None
+        docs, _ = await asyncio.to_thread(
+            self._get_chunks, collection.vector_store, [chunk_id for chunk_id, _ in hits]
+        )
+        if not docs:
+            return None
+
+        top_terms = set(tokenize(docs[0].page_content))
+        if not all(name in top_terms for name in names):
+            return None
+        if collection.lexical_index.coverage(question, docs[0].page_content) < (
+            settings.lexical_fast_path_min_coverage
+        ):
+            return None
+
+        scores = dict(hits)
+        result = self.retrieval_policy.select_lexical(docs, [scores[doc.id] for doc in docs])
+        result = await self._expand_to_parents(collection, result)
+        logger.debug(
+            "Retrieved context by lexical fast path",
+            k=result.k,
+            identifiers=names,
+            context_tokens=result.context_tokens,
+        )
+        return result
+
+    async def _expand_to_parents(
+        self,
+        collection: CollectionHandle,
+        result: RetrievalResult,
+    ) -> RetrievalResult:
+        """
+        Replace the selected child chunks by the parent sections they were cut from.
+
+        Children of the same parent collapse into the parent at the rank of
+        the best one; chunks without a stored parent are kept as they are.
+        A parent is only taken if it and the children ranked after it still
+        fit the context-token budget; otherwise its child is kept.
+        """
+        if collection.parent_store is None or not result.documents:
+            return result
+
+        parent_ids = [doc.metadata.get("parent_id") for doc in result.documents]
+        parents = await asyncio.to_thread(
+            collection.parent_store.get_many, [i for i in parent_ids if i]
+        )
+        if not parents:
+            return result
+
+        budget = self.retrieval_policy.context_token_budget
+        child_tokens = [estimate_tokens(doc.page_content) for doc in result.documents]
+        documents: List[Document] = []
+        scores: List[float] = []
+        expanded = set()
+        kept_as_children = set()
+        used = 0
+        for i, (doc, score, parent_id) in enumerate(zip(result.documents, result.scores, parent_ids)):
+            if parent_id in expanded:
+                continue
+            tokens = child_tokens[i]
+            if parent_id in parents and parent_id not in kept_as_children:
+                text, metadata = parents[parent_id]
+                parent_tokens = estimate_tokens(text)
+                # Leave room for the children still to come, except those the parent absorbs
+                reserved = sum(
+                    child_tokens[j]
+                    for j in range(i + 1, len(parent_ids))
+                    if parent_ids[j] != parent_id and parent_ids[j] not in expanded
+                )
+                if used + parent_tokens + reserved > budget:
+                    kept_as_children.add(parent_id)
                 else:
-                    yield chunk.content, None, None
+                    expanded.add(parent_id)
+                    tokens = parent_tokens
+                    doc = Document(
+                        id=parent_id,
+                        page_content=text,
+                        metadata={**doc.metadata, **metadata, "child_id": doc.id},
+                    )
+            documents.append(doc)
+            scores.append(score)
+            used += tokens
 
-        except Exception as e:
-            logger.error("Stream query failed", error=str(e))
-            raise
+        result.documents = documents
+        result.scores = scores
+        result.context_tokens = used
+        result.tokens_saved = max(result.baseline_tokens - used, 0)
+        return result
 
-    def _estimate_rag_tokens(self, docs: List[Document]) -> int:
-        """Estimate the number of tokens in retrieved documents."""
-        total_chars = sum(len(doc.page_content) for doc in docs)
-        # Rough estimate: 1 token ≈ 4 characters
-        return total_chars // 4
+    def _get_chunks(
+        self,
+        vector_store: Chroma,
+        ids: List[str],
+        with_embeddings: bool = False,
+    ) -> Tuple[List[Document], Optional[np.ndarray]]:
+        """
+        Fetch chunks by ID from a Chroma collection, in the order of the IDs.
+
+        IDs that are no longer in the collection are skipped.
+        """
+        include = ["documents", "metadatas"] + (["embeddings"] if with_embeddings else [])
+        results = vector_store._collection.get(ids=ids, include=include)
+        positions = {chunk_id: i for i, chunk_id in enumerate(results["ids"])}
+        order = [positions[chunk_id] for chunk_id in ids if chunk_id in positions]
+
+        docs = [
+            Document(
+                id=results["ids"][i],
+                page_content=results["documents"][i],
+                metadata=results["metadatas"][i] or {},
+            )
+            for i in order
+        ]
+        vectors = None
+        if with_embeddings:
+            vectors = np.asarray(results["embeddings"], dtype=np.float32)[order]
+        return docs, vectors
+
+    def _query_chroma(
+        self,
+        vector_store: Chroma,
+        question_vectors: List[List[float]],
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[List[Document], np.ndarray]]:
+        """Fetch retrieval candidates and their embeddings for each query from a Chroma collection."""
+        results = vector_store._collection.query(
+            query_embeddings=question_vectors,
+            n_results=settings.retrieval_fetch_k,
+            where=where,
+            include=["documents", "metadatas", "embeddings"],
+        )
+
+        candidates = []
+        for i, ids in enumerate(results["ids"]):
+            if not ids:
+                candidates.append(([], np.zeros((0, 0), dtype=np.float32)))
+                continue
+            docs = [
+                Document(id=doc_id, page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(
+                    ids, results["documents"][i], results["metadatas"][i]
+                )
+            ]
+            candidates.append((docs, np.asarray(results["embeddings"][i], dtype=np.float32)))
+        return candidates
 
 
 # Singleton instance
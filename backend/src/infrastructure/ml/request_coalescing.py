@@ -0,0 +1,180 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+When the same question arrives several times while it is still being
+answered (a popular question, a double submit), only the first request
+embeds, retrieves and calls the LLM; the others wait for and share its
+result. Streaming subscribers fan out from one upstream stream: every
+subscriber receives all items from the start, however late it joined.
+"""
+import asyncio
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from structlog import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key."""
+
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a call, or join the identical call that is already running.
+
+        The shared call keeps running if a single caller is cancelled.
+
+        Args:
+            key: Identity of the call
+            call: Factory of the awaitable to run when no call is in flight
+
+        Returns:
+            Result of the shared call
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight request")
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the coalescing counters."""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        """Remove a finished call, unless the key already belongs to a newer one."""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+
+class _Broadcast:
+    """Items of one upstream stream, kept for every subscriber to read."""
+
+    def __init__(self) -> None:
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    def notify(self) -> None:
+        """Wake up the subscribers waiting for the next item."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StreamFanout:
+    """Share one in-flight stream among concurrent subscribers with the same key."""
+
+    def __init__(self) -> None:
+        self.leaders = 0
+        self.coalesced = 0
+        self._streams: Dict[Hashable, _Broadcast] = {}
+
+    async def subscribe(
+        self,
+        key: Hashable,
+        stream: Callable[[], AsyncIterator[T]],
+    ) -> AsyncGenerator[T, None]:
+        """
+        Read a stream, or join the identical stream that is already running.
+
+        The upstream stream is consumed by a background task. It is
+        cancelled when its last subscriber goes away before it finished.
+
+        Args:
+            key: Identity of the stream
+            stream: Factory of the upstream stream to start when none is running
+
+        Yields:
+            All items of the upstream stream, from the first one
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(self._pump(key, broadcast, stream()))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight stream", subscribers=broadcast.subscribers + 1)
+
+        broadcast.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(broadcast.items):
+                    position += 1
+                    yield broadcast.items[position - 1]
+                elif broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                else:
+                    await broadcast.changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                logger.debug("Cancelling stream without subscribers")
+                self._forget(key, broadcast)
+                broadcast.task.cancel()
+                # Wait for the upstream stream to be closed, so whatever it
+                # holds is released before the subscriber returns
+                await asyncio.wait([broadcast.task])
+
+    def stats(self) -> Dict[str, int]:
+        """Get the coalescing counters."""
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._streams),
+        }
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, stream: AsyncIterator[Any]) -> None:
+        """Consume the upstream stream into the broadcast."""
+        try:
+            async for item in stream:
+                broadcast.items.append(item)
+                broadcast.notify()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            broadcast.done = True
+            self._forget(key, broadcast)
+            broadcast.notify()
+
+    def _forget(self, key: Hashable, broadcast: _Broadcast) -> None:
+        """Stop offering a stream to new subscribers."""
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
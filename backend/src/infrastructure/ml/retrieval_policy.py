@@ -0,0 +1,209 @@
+"""
+Retrieval policy: how many and which retrieved chunks go into the prompt.
+
+Instead of always sending a fixed number of chunks, candidates below a
+relevance-score floor are cut, the rest are picked greedily with maximal
+marginal relevance (MMR) so near-identical chunks do not crowd out other
+information, and chunks that no longer fit the context-token budget are
+skipped. The best chunk is always sent, cut to the budget if it is larger.
+Candidates found by lexical search are exempt from the floor, since exact
+identifier matches can have a low embedding similarity.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.flat_index import normalize_rows
+from src.infrastructure.ml.token_counting import estimate_tokens, truncate_to_tokens
+
+# Number of chunks the fixed retriever used to send, the baseline for savings
+BASELINE_K = 4
+
+# Retrieval modes
+MODE_VECTOR = "vector"
+MODE_HYBRID = "hybrid"
+MODE_LEXICAL = "lexical"
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """
+    Fuse several rankings of the same items.
+
+    Args:
+        rankings: Item IDs of each ranking, best first
+        k: Damping constant; larger values flatten the head of each ranking
+
+    Returns:
+        Mapping of item ID -> fused score (higher is better)
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+@dataclass
+class RetrievalResult:
+    """Chunks selected for a question and the numbers behind the selection."""
+
+    documents: List[Document] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    candidates: int = 0
+    context_tokens: int = 0
+    baseline_tokens: int = 0  # What the fixed top-k retriever would have sent
+    tokens_saved: int = 0
+    mode: str = MODE_VECTOR
+
+    @property
+    def k(self) -> int:
+        """Number of chunks selected."""
+        return len(self.documents)
+
+
+class RetrievalPolicy:
+    """Select chunks by score floor, MMR and a context-token budget."""
+
+    def __init__(
+        self,
+        max_k: int,
+        score_threshold: float,
+        mmr_lambda: float,
+        context_token_budget: int,
+    ) -> None:
+        self.max_k = max_k
+        self.score_threshold = score_threshold
+        self.mmr_lambda = mmr_lambda
+        self.context_token_budget = context_token_budget
+
+    def select(
+        self,
+        query_vector: List[float],
+        documents: List[Document],
+        vectors: np.ndarray,
+        relevance: Optional[np.ndarray] = None,
+        lexical_matches: Optional[np.ndarray] = None,
+    ) -> RetrievalResult:
+        """
+        Select the chunks to put into the prompt.
+
+        Args:
+            query_vector: Question embedding
+            documents: Candidate chunks
+            vectors: Embeddings of the candidate chunks, one row per chunk
+            relevance: Optional ranking scores (e.g. fused with lexical
+                       search) used instead of the cosine similarity to
+                       order and trade off candidates
+            lexical_matches: Optional mask of candidates found by lexical
+                             search, which are exempt from the score floor
+
+        Returns:
+            Selected chunks, best first, with their cosine similarity
+            stored in metadata["similarity_score"]
+        """
+        result = RetrievalResult(candidates=len(documents))
+        if not documents:
+            return result
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        candidates = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        similarities = candidates @ query
+        tokens = [estimate_tokens(doc.page_content) for doc in documents]
+
+        by_similarity = np.argsort(-similarities)
+        result.baseline_tokens = sum(tokens[i] for i in by_similarity[:BASELINE_K])
+
+        if relevance is None:
+            relevance = similarities
+        else:
+            # Bring ranking scores onto the scale of the redundancy penalty
+            relevance = np.asarray(relevance, dtype=np.float32) / max(float(np.max(relevance)), 1e-9)
+        keep = similarities >= self.score_threshold
+        if lexical_matches is not None:
+            keep |= lexical_matches
+
+        remaining = [int(i) for i in np.argsort(-relevance) if keep[i]]
+        selected: List[int] = []
+        contents = [doc.page_content for doc in documents]
+        while remaining and len(selected) < self.max_k:
+            if selected:
+                redundancy = (candidates[remaining] @ candidates[selected].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+            mmr = (
+                self.mmr_lambda * relevance[remaining]
+                - (1.0 - self.mmr_lambda) * redundancy
+            )
+            best = remaining.pop(int(np.argmax(mmr)))
+            if result.context_tokens + tokens[best] > self.context_token_budget:
+                if selected:
+                    # Smaller lower-ranked chunks may still fit
+                    continue
+                contents[best] = truncate_to_tokens(contents[best], self.context_token_budget)
+                tokens[best] = estimate_tokens(contents[best])
+            selected.append(best)
+            result.context_tokens += tokens[best]
+
+        for i in selected:
+            doc = documents[i]
+            score = float(similarities[i])
+            result.documents.append(
+                Document(
+                    id=doc.id,
+                    page_content=contents[i],
+                    metadata={**(doc.metadata or {}), "similarity_score": score},
+                )
+            )
+            result.scores.append(score)
+
+        result.tokens_saved = max(result.baseline_tokens - result.context_tokens, 0)
+        return result
+
+    def select_lexical(self, documents: List[Document], scores: List[float]) -> RetrievalResult:
+        """
+        Select chunks found by lexical search alone, without embeddings.
+
+        Chunks are taken in rank order up to max_k, skipping those that do
+        not fit the context-token budget; their normalized BM25 score is stored in
+        metadata["lexical_score"].
+
+        Args:
+            documents: Candidate chunks, best first
+            scores: BM25 scores of the candidates
+
+        Returns:
+            Selected chunks
+        """
+        result = RetrievalResult(candidates=len(documents), mode=MODE_LEXICAL)
+        if not documents:
+            return result
+
+        tokens = [estimate_tokens(doc.page_content) for doc in documents]
+        result.baseline_tokens = sum(tokens[:BASELINE_K])
+        top_score = max(scores[0], 1e-9)
+
+        for doc, score, doc_tokens in zip(documents, scores, tokens):
+            if result.k >= self.max_k:
+                break
+            content = doc.page_content
+            if result.context_tokens + doc_tokens > self.context_token_budget:
+                if result.documents:
+                    continue
+                # The best chunk is always sent, cut to the budget
+                content = truncate_to_tokens(content, self.context_token_budget)
+                doc_tokens = estimate_tokens(content)
+            relative = score / top_score
+            result.documents.append(
+                Document(
+                    id=doc.id,
+                    page_content=content,
+                    metadata={**(doc.metadata or {}), "lexical_score": relative},
+                )
+            )
+            result.scores.append(relative)
+            result.context_tokens += doc_tokens
+
+        result.tokens_saved = max(result.baseline_tokens - result.context_tokens, 0)
+        return result
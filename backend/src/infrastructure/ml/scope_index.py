@@ -0,0 +1,254 @@
+"""
+Knowledge base subtree index for scoped retrieval.
+
+Maps every directory prefix of the chunk sources (``gemini``,
+``gemini/guides``, ...) and every directory name used as a tag
+(``chroma_official``, ``guides``, ...) to the sources below it, and every
+source to its chunk IDs. The index is persisted as a JSON file next to the
+Chroma directory and kept current with a delta log of the chunks ingestion
+runs write and delete (see delta_log), so resolving a scope is a handful of
+dictionary lookups.
+"""
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from langchain_chroma import Chroma
+from structlog import get_logger
+
+from src.infrastructure.ml.delta_log import DeltaLog, should_compact
+from src.infrastructure.ml.flat_index import EXPORT_PAGE_SIZE
+
+logger = get_logger()
+
+
+def normalize_prefix(prefix: str) -> str:
+    """Normalize a knowledge base path prefix to the form used in chunk sources."""
+    prefix = prefix.replace("\\", "/").strip()
+    while prefix.startswith("./"):
+        prefix = prefix[2:]
+    return prefix.strip("/")
+
+
+def path_prefixes(source: str) -> List[str]:
+    """All component-wise prefixes of a source path, including the path itself."""
+    parts = normalize_prefix(source).split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def path_tags(source: str) -> List[str]:
+    """Directory names of a source path, usable as tags."""
+    return [part.lower() for part in normalize_prefix(source).split("/")[:-1]]
+
+
+@dataclass
+class RetrievalScope:
+    """Subset of the knowledge base to retrieve from."""
+
+    path_prefixes: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        """Check if the scope places no restriction."""
+        return not self.path_prefixes and not self.tags
+
+
+@dataclass
+class ScopeSelection:
+    """Chunks and sources a scope resolved to."""
+
+    chunk_ids: Set[str] = field(default_factory=set)
+    sources: List[str] = field(default_factory=list)
+
+
+class ScopeIndex:
+    """Precomputed source-prefix and tag -> chunk ID lookups."""
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self.directory = directory
+        self.name = name
+        self.path = directory / f"{name}_scope.json"
+        self.delta = DeltaLog(directory / f"{name}_scope.delta.jsonl")
+        self._build_id: Optional[str] = None
+        self._source_ids: Dict[str, Set[str]] = {}
+        self._chunk_sources: Dict[str, str] = {}
+        self._prefix_sources: Dict[str, Set[str]] = {}
+        self._tag_sources: Dict[str, Set[str]] = {}
+        self._delta_rows = 0
+        self._loaded_mtime_ns: Optional[int] = None
+
+    def exists(self) -> bool:
+        """Check if the index file exists on disk."""
+        return self.path.exists()
+
+    def build_from_store(self, vector_store: Chroma) -> int:
+        """
+        Group the chunks of a Chroma collection by source into the index file.
+
+        Args:
+            vector_store: Collection to index
+
+        Returns:
+            Number of sources indexed
+        """
+        source_ids: Dict[str, List[str]] = {}
+        offset = 0
+        while True:
+            page = vector_store.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                source = (metadata or {}).get("source")
+                if source:
+                    source_ids.setdefault(source, []).append(chunk_id)
+            offset += len(page["ids"])
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"build": uuid.uuid4().hex, "sources": source_ids}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.delta.clear()
+
+        logger.info("Scope index built", path=str(self.path), sources=len(source_ids))
+        return len(source_ids)
+
+    def update_from_store(
+        self,
+        vector_store: Chroma,
+        written_ids: List[str],
+        deleted_ids: List[str],
+    ) -> None:
+        """
+        Apply the chunks an ingestion run wrote and deleted to the index.
+
+        Args:
+            vector_store: Collection the index mirrors
+            written_ids: Chunks added or replaced
+            deleted_ids: Chunks removed
+        """
+        self.refresh()
+        if self._build_id is None or should_compact(
+            self._delta_rows + len(written_ids) + len(deleted_ids), len(self._chunk_sources)
+        ):
+            self.build_from_store(vector_store)
+            return
+
+        added = []
+        for start in range(0, len(written_ids), EXPORT_PAGE_SIZE):
+            page = vector_store.get(
+                ids=written_ids[start:start + EXPORT_PAGE_SIZE], include=["metadatas"]
+            )
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                source = (metadata or {}).get("source")
+                if source:
+                    added.append([chunk_id, source])
+
+        removed = [i for i in dict.fromkeys(deleted_ids + written_ids) if i in self._chunk_sources]
+        if added or removed:
+            self.delta.append(self._build_id, {"removed": removed, "added": added})
+            self.refresh()
+
+    def refresh(self) -> None:
+        """(Re)load the index if it was rebuilt on disk, and apply new changes."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._loaded_mtime_ns:
+            self._load()
+            self._loaded_mtime_ns = mtime_ns
+
+        for record in self.delta.read_new(self._build_id):
+            for chunk_id in record["removed"]:
+                self._remove_chunk(chunk_id)
+            for chunk_id, source in record["added"]:
+                self._add_chunk(chunk_id, source)
+            self._delta_rows += len(record["removed"]) + len(record["added"])
+
+    def _load(self) -> None:
+        """Load the index file."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self._build_id = data.get("build")
+        self._source_ids = {}
+        self._chunk_sources = {}
+        self._prefix_sources = {}
+        self._tag_sources = {}
+        for source, chunk_ids in data["sources"].items():
+            for chunk_id in chunk_ids:
+                self._add_chunk(chunk_id, source)
+        self._delta_rows = 0
+        self.delta.rewind()
+
+    def _add_chunk(self, chunk_id: str, source: str) -> None:
+        """Index a chunk under its source."""
+        self._chunk_sources[chunk_id] = source
+        if source not in self._source_ids:
+            self._source_ids[source] = set()
+            for prefix in path_prefixes(source):
+                self._prefix_sources.setdefault(prefix, set()).add(source)
+            for tag in path_tags(source):
+                self._tag_sources.setdefault(tag, set()).add(source)
+        self._source_ids[source].add(chunk_id)
+
+    def _remove_chunk(self, chunk_id: str) -> None:
+        """Remove a chunk, and its source once that has no chunks left."""
+        source = self._chunk_sources.pop(chunk_id, None)
+        if source is None:
+            return
+        chunk_ids = self._source_ids[source]
+        chunk_ids.discard(chunk_id)
+        if chunk_ids:
+            return
+        del self._source_ids[source]
+        for lookup, keys in (
+            (self._prefix_sources, path_prefixes(source)),
+            (self._tag_sources, path_tags(source)),
+        ):
+            for key in keys:
+                sources = lookup.get(key)
+                if sources is not None:
+                    sources.discard(source)
+                    if not sources:
+                        del lookup[key]
+
+    def drop(self) -> None:
+        """Delete the index file and its delta log."""
+        self.path.unlink(missing_ok=True)
+        self.delta.clear()
+
+    def resolve(self, scope: RetrievalScope) -> ScopeSelection:
+        """
+        Resolve a scope to the chunks it covers.
+
+        Prefixes match whole path components. Chunks have to match any of
+        the prefixes and any of the tags; an empty list does not restrict.
+
+        Args:
+            scope: Scope to resolve
+
+        Returns:
+            Selected chunk IDs and sources
+        """
+        self.refresh()
+        sources: Optional[Set[str]] = None
+        if scope.path_prefixes:
+            sources = set().union(*(
+                self._prefix_sources.get(normalize_prefix(p), set())
+                for p in scope.path_prefixes
+            ))
+        if scope.tags:
+            tagged = set().union(*(self._tag_sources.get(t.lower(), set()) for t in scope.tags))
+            sources = tagged if sources is None else sources & tagged
+        if sources is None:
+            sources = set(self._source_ids)
+
+        selection = ScopeSelection(sources=sorted(sources))
+        for source in selection.sources:
+            selection.chunk_ids.update(self._source_ids[source])
+        return selection
@@ -0,0 +1,113 @@
+"""
+Per-session retrieval reuse for follow-up questions.
+
+Follow-ups such as "can you show an example?" are about the chunks that were
+just retrieved, and retrieving for them from scratch tends to find worse
+ones. The chunks retrieved for the last turn of every session are kept in a
+bounded LRU/TTL cache, so a follow-up can reuse them, or extend them with a
+few new chunks, instead of going through a full retrieval.
+"""
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.lexical_index import identifiers
+
+# How the chunks of a turn were obtained
+PATH_FULL = "full"
+PATH_REUSED = "reused"
+PATH_EXTENDED = "extended"
+PATH_ANSWER_CACHE = "answer_cache"
+
+# A follow-up refers back with a pronoun instead of naming a new topic: it
+# consists of a referring word and otherwise only function words and
+# generic requests, e.g. "can you show an example of it?"
+FOLLOW_UP_MAX_WORDS = 8
+FOLLOW_UP_ANAPHORA = {"it", "its", "this", "that", "these", "those", "them", "they", "above"}
+FOLLOW_UP_FILLER = {
+    "a", "an", "the", "of", "for", "about", "on", "with", "in", "to", "and", "or",
+    "what", "how", "why", "when", "where", "which", "is", "are", "was", "does", "do",
+    "can", "could", "would", "you", "me", "i", "please", "show", "give", "tell",
+    "explain", "elaborate", "more", "again", "also", "example", "examples", "detail",
+    "details", "mean", "work", "works", "use", "used",
+}
+FOLLOW_UP_ANAPHORA_CJK = ("这个", "那个", "它", "上面", "这些", "那些")
+FOLLOW_UP_MAX_CHARS_CJK = 12
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def looks_like_follow_up(question: str) -> bool:
+    """
+    Cheap check whether a question refers back to the previous turn.
+
+    Only a hint: the embedding similarity to the previous question still
+    decides whether its chunks are reused.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        True for short questions with a referring word and no content words
+    """
+    words = [word.lower() for word in _WORD_RE.findall(question)]
+    if not words or identifiers(question):
+        return False
+    if any(marker in question for marker in FOLLOW_UP_ANAPHORA_CJK):
+        return len(question.strip()) <= FOLLOW_UP_MAX_CHARS_CJK
+    return (
+        len(words) <= FOLLOW_UP_MAX_WORDS
+        and any(word in FOLLOW_UP_ANAPHORA for word in words)
+        and all(word in FOLLOW_UP_ANAPHORA or word in FOLLOW_UP_FILLER for word in words)
+    )
+
+
+@dataclass
+class SessionTurn:
+    """Chunks retrieved for the last full retrieval of a session."""
+
+    question: str
+    documents: List[Document]
+    scope_key: Tuple
+    kb_version: int
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SessionRetrievalCache:
+    """Bounded LRU cache of the last retrieval of each session, with a time-to-live."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float) -> None:
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.paths: Dict[str, int] = {PATH_FULL: 0, PATH_REUSED: 0, PATH_EXTENDED: 0}
+        self._turns: "OrderedDict[str, SessionTurn]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[SessionTurn]:
+        """Get the last turn of a session, if it has not expired."""
+        turn = self._turns.get(session_id)
+        if turn is None:
+            return None
+        if time.monotonic() - turn.created_at > self.ttl_seconds:
+            del self._turns[session_id]
+            return None
+        self._turns.move_to_end(session_id)
+        return turn
+
+    def put(self, session_id: str, turn: SessionTurn) -> None:
+        """Record the last turn of a session, evicting the least recently used session."""
+        self._turns[session_id] = turn
+        self._turns.move_to_end(session_id)
+        while len(self._turns) > self.max_sessions:
+            self._turns.popitem(last=False)
+
+    def record_path(self, path: str) -> None:
+        """Count how the chunks of a follow-up turn were obtained."""
+        self.paths[path] = self.paths.get(path, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        """Get the path counters and size of the cache."""
+        return {**self.paths, "sessions": len(self._turns)}
@@ -0,0 +1,197 @@
+"""
+Token accounting.
+
+The LLM provider reports the real token usage of every call in the usage
+metadata of its response; this module extracts it. Where the provider
+reports nothing, and for text that is not sent on its own (retrieved chunks,
+history), tokens are counted with a local tokenizer: tiktoken when it is
+installed, otherwise a word/punctuation approximation of BPE. Counts are
+cached per text, since the same chunks are counted over and over.
+"""
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from structlog import get_logger
+
+logger = get_logger()
+
+# Where the token counts of an LLM call came from
+USAGE_PROVIDER = "provider"
+USAGE_ESTIMATE = "estimate"
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_WORD_RE = re.compile(rf"[{_CJK}]|\w+|[^\w\s]", re.UNICODE)
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+@lru_cache(maxsize=1)
+def _tiktoken_encoding() -> Optional[Any]:
+    """Load the tiktoken encoding once, if tiktoken is installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("tiktoken not installed, approximating token counts")
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the local tokenizer.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    # Common words are one token, longer words about one per 4 characters,
+    # CJK characters and punctuation one each
+    tokens = 0
+    for piece in _WORD_RE.findall(text):
+        if len(piece) == 1 or _CJK_RE.match(piece):
+            tokens += 1
+        else:
+            tokens += max(1, math.ceil(len(piece) / 4))
+    return tokens
+
+
+def usage_from_message(message: Any) -> Optional[Dict[str, int]]:
+    """
+    Extract the token usage reported by the provider for an LLM response.
+
+    Args:
+        message: AIMessage, or the sum of the AIMessageChunks of a stream
+
+    Returns:
+        Input, output and total tokens, or None if the provider reported none
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage or not usage.get("total_tokens"):
+        return None
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+def count_usage(
+    message: Any,
+    prompt: Sequence[Tuple[str, str]],
+    answer: str,
+) -> Tuple[Dict[str, int], str]:
+    """
+    Token usage of an LLM call, from the provider or counted locally.
+
+    Args:
+        message: LLM response (or summed stream chunks), may be None
+        prompt: Prompt messages as (role, content) tuples
+        answer: Generated text
+
+    Returns:
+        Tuple of (input/output/total tokens, USAGE_PROVIDER or USAGE_ESTIMATE)
+    """
+    usage = usage_from_message(message)
+    if usage is not None:
+        return usage, USAGE_PROVIDER
+
+    input_tokens = sum(estimate_tokens(content) for _, content in prompt)
+    output_tokens = estimate_tokens(answer)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }, USAGE_ESTIMATE
+
+
+class GenerationStats:
+    """
+    Counters of streamed LLM generations, including those cancelled by the client.
+
+    The tokens a cancelled generation saved are estimated as the mean output
+    of the completed generations minus what was generated before the cancel.
+    """
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.cancelled = 0
+        self.output_tokens = 0  # Of completed generations
+        self.tokens_before_cancel = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, output_tokens: int) -> None:
+        """Count a generation that ran to the end."""
+        self.completed += 1
+        self.output_tokens += output_tokens
+
+    def record_cancelled(self, generated_tokens: int) -> int:
+        """
+        Count a generation that was cancelled.
+
+        Args:
+            generated_tokens: Output tokens generated before the cancel
+
+        Returns:
+            Estimated output tokens saved
+        """
+        self.cancelled += 1
+        self.tokens_before_cancel += generated_tokens
+        saved = 0
+        if self.completed:
+            saved = max(self.output_tokens // self.completed - generated_tokens, 0)
+        self.tokens_saved += saved
+        return saved
+
+    def stats(self) -> Dict[str, int]:
+        """Get the generation counters."""
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "tokens_before_cancel": self.tokens_before_cancel,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """
+    Shorten a text to at most a number of tokens.
+
+    The cut is moved back to the last line break, or failing that the last
+    whitespace, in the second half of the kept text.
+
+    Args:
+        text: Text to shorten
+        tokens: Maximum number of tokens
+
+    Returns:
+        The text itself if it fits, else a prefix of it
+    """
+    if tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= tokens:
+        return text
+
+    # Longest prefix that fits; token counts grow with the prefix length
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    for separator in ("\n", " "):
+        boundary = cut.rfind(separator)
+        if boundary > len(cut) // 2:
+            return cut[:boundary].rstrip()
+    return cut
@@ -5,7 +5,7 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from structlog import get_logger
@@ -132,6 +132,23 @@ class SessionRepository:
         await self.db_session.commit()
         return True
 
+    async def update_summary(self, session_id: UUID, summary: str, message_count: int) -> None:
+        """
+        Store the rolling history summary of a session.
+
+        Args:
+            session_id: Session UUID
+            summary: Summary of the first message_count messages
+            message_count: Number of messages the summary covers
+        """
+        db_session = await self.db_session.get(SessionModel, session_id)
+        if not db_session:
+            return
+
+        db_session.summary = summary
+        db_session.summary_message_count = message_count
+        await self.db_session.commit()
+
     def _to_entity(self, db_session: SessionModel, include_messages: bool = False) -> Session:
         """Convert DB model to domain entity."""
         messages = []
@@ -147,6 +164,7 @@ class SessionRepository:
                     output_tokens=m.output_tokens,
                     rag_tokens=m.rag_tokens,
                     total_tokens=m.total_tokens,
+                    truncated=m.truncated or False,
                     rag_references=m.rag_references,
                 )
                 for m in db_session.messages
@@ -159,6 +177,12 @@ class SessionRepository:
             updated_at=db_session.updated_at,
             is_active=db_session.is_active,
             messages=messages,
+            summary=db_session.summary,
+            summary_message_count=db_session.summary_message_count or 0,
+            input_tokens=db_session.input_tokens or 0,
+            output_tokens=db_session.output_tokens or 0,
+            rag_tokens=db_session.rag_tokens or 0,
+            total_tokens=db_session.total_tokens or 0,
         )
 
 
@@ -188,6 +212,7 @@ class MessageRepository:
             output_tokens=message.output_tokens,
             rag_tokens=message.rag_tokens,
             total_tokens=message.total_tokens,
+            truncated=message.truncated,
             rag_references=message.rag_references,
         )
         self.db_session.add(db_message)
@@ -216,6 +241,60 @@ class MessageRepository:
 
         return [self._to_entity(m) for m in db_messages]
 
+    async def get_recent(self, session_id: UUID, limit: int) -> List[Message]:
+        """
+        Get the latest messages of a session.
+
+        Args:
+            session_id: Session UUID
+            limit: Maximum number of messages
+
+        Returns:
+            List of messages, oldest first
+        """
+        stmt = (
+            select(MessageModel)
+            .where(MessageModel.session_id == session_id)
+            .order_by(MessageModel.created_at.desc())
+            .limit(limit)
+        )
+        result = await self.db_session.execute(stmt)
+        db_messages = result.scalars().all()
+
+        return [self._to_entity(m) for m in reversed(db_messages)]
+
+    async def get_range(self, session_id: UUID, offset: int, limit: int) -> List[Message]:
+        """
+        Get a slice of the messages of a session in chronological order.
+
+        Args:
+            session_id: Session UUID
+            offset: Number of messages to skip
+            limit: Maximum number of messages
+
+        Returns:
+            List of messages, oldest first
+        """
+        stmt = (
+            select(MessageModel)
+            .where(MessageModel.session_id == session_id)
+            .order_by(MessageModel.created_at)
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await self.db_session.execute(stmt)
+        db_messages = result.scalars().all()
+
+        return [self._to_entity(m) for m in db_messages]
+
+    async def count_by_session(self, session_id: UUID) -> int:
+        """Count the messages of a session."""
+        stmt = select(func.count()).select_from(MessageModel).where(
+            MessageModel.session_id == session_id
+        )
+        result = await self.db_session.execute(stmt)
+        return result.scalar_one()
+
     def _to_entity(self, db_message: MessageModel) -> Message:
         """Convert DB model to domain entity."""
         return Message(
@@ -228,5 +307,6 @@ class MessageRepository:
             output_tokens=db_message.output_tokens,
             rag_tokens=db_message.rag_tokens,
             total_tokens=db_message.total_tokens,
+            truncated=db_message.truncated or False,
             rag_references=db_message.rag_references,
         )
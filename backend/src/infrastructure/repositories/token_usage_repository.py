@@ -0,0 +1,127 @@
+"""
+Repository for token usage rollups.
+
+The token counters of every message are added to a running total on its
+session row and on a row per day, so usage per session and per day can be
+read without scanning the messages table.
+"""
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from structlog import get_logger
+
+from src.domain.entities import Message, Session, TokenUsageDay
+from src.infrastructure.database.models import SessionModel, TokenUsageDailyModel
+
+logger = get_logger()
+
+COUNTERS = ("input_tokens", "output_tokens", "rag_tokens", "total_tokens")
+
+
+class TokenUsageRepository:
+    """Repository for token usage rollup operations."""
+
+    def __init__(self, db_session: AsyncSession) -> None:
+        self.db_session = db_session
+
+    async def record(self, message: Message) -> None:
+        """
+        Add the token counters of a message to the rollups of its session and day.
+
+        Counters are incremented in the database, so concurrent messages of
+        the same session or day do not overwrite each other. The increments
+        are not committed; creating the message in the same database session
+        commits both together.
+
+        Args:
+            message: Assistant message with token counters
+        """
+        usage = {name: getattr(message, name) or 0 for name in COUNTERS}
+
+        await self.db_session.execute(
+            update(SessionModel)
+            .where(SessionModel.id == message.session_id)
+            .values({
+                getattr(SessionModel, name): getattr(SessionModel, name) + value
+                for name, value in usage.items()
+            })
+        )
+
+        stmt = insert(TokenUsageDailyModel).values(
+            day=message.created_at.date(), messages=1, **usage
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TokenUsageDailyModel.day],
+            set_={
+                "messages": TokenUsageDailyModel.messages + 1,
+                **{
+                    name: getattr(TokenUsageDailyModel, name) + value
+                    for name, value in usage.items()
+                },
+            },
+        )
+        await self.db_session.execute(stmt)
+
+    async def get_daily(self, days: int) -> List[TokenUsageDay]:
+        """
+        Get the token usage of the latest days.
+
+        Args:
+            days: Number of days, including today (UTC)
+
+        Returns:
+            Days with usage, newest first
+        """
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        stmt = (
+            select(TokenUsageDailyModel)
+            .where(TokenUsageDailyModel.day >= since)
+            .order_by(TokenUsageDailyModel.day.desc())
+        )
+        result = await self.db_session.execute(stmt)
+        return [
+            TokenUsageDay(
+                day=row.day,
+                messages=row.messages,
+                input_tokens=row.input_tokens,
+                output_tokens=row.output_tokens,
+                rag_tokens=row.rag_tokens,
+                total_tokens=row.total_tokens,
+            )
+            for row in result.scalars().all()
+        ]
+
+    async def top_sessions(self, limit: int) -> List[Session]:
+        """
+        Get the sessions that used the most tokens.
+
+        Args:
+            limit: Maximum number of sessions
+
+        Returns:
+            Sessions with their token counters, most expensive first
+        """
+        stmt = (
+            select(SessionModel)
+            .where(SessionModel.total_tokens > 0)
+            .order_by(SessionModel.total_tokens.desc())
+            .limit(limit)
+        )
+        result = await self.db_session.execute(stmt)
+        return [
+            Session(
+                id=row.id,
+                title=row.title,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+                is_active=row.is_active,
+                input_tokens=row.input_tokens,
+                output_tokens=row.output_tokens,
+                rag_tokens=row.rag_tokens,
+                total_tokens=row.total_tokens,
+            )
+            for row in result.scalars().all()
+        ]
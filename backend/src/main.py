@@ -4,14 +4,19 @@ Zev Simple RAG AI Agent - FastAPI Backend
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from structlog import get_logger
 
 from src.api.dependencies import get_rag_service
-from src.api.v1 import chat, sessions
+from src.api.v1 import chat, retrieve, sessions, usage
 from src.core.config import settings
 from src.core.logging import configure_logging
+from src.infrastructure.ml.admission import AdmissionRejected
+from src.infrastructure.ml.ingestion_jobs import JOB_REBUILD, get_ingestion_job_manager
+from src.infrastructure.ml.kb_watcher import get_kb_watcher
+from src.infrastructure.database.migrations import add_missing_columns
 from src.infrastructure.database.models import Base
 from src.infrastructure.database.session import engine
 
@@ -31,6 +36,7 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await add_missing_columns(conn)
         logger.info("Database tables initialized")
     except Exception as e:
         logger.error("Database initialization failed", error=str(e))
@@ -41,14 +47,22 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         rag_service.initialize()
         logger.info("RAG service initialized")
 
-        # Try to ingest documents
+        # Rebuild in the background if the index config changed, else ingest
         try:
-            count = await rag_service.ingest_documents()
-            if count > 0:
-                logger.info("Initial document ingestion completed", count=count)
+            if rag_service.needs_rebuild() and settings.rebuild_on_config_change:
+                logger.info("Index configuration changed, rebuilding collection")
+                get_ingestion_job_manager().submit(kind=JOB_REBUILD)
+            else:
+                count = await rag_service.ingest_documents()
+                if count > 0:
+                    logger.info("Initial document ingestion completed", count=count)
         except Exception as e:
             logger.warning("Initial document ingestion failed", error=str(e))
 
+        # Start knowledge base watcher
+        if settings.kb_watcher_enabled:
+            get_kb_watcher().start()
+
     except Exception as e:
         logger.error("RAG service initialization failed", error=str(e))
 
@@ -56,6 +70,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     # Shutdown
     logger.info("Shutting down application")
+    if settings.kb_watcher_enabled:
+        await get_kb_watcher().stop()
+    get_rag_service().close()
 
 
 # Create FastAPI application
@@ -78,6 +95,14 @@ app.add_middleware(
 # Include routers
 app.include_router(sessions.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
+app.include_router(retrieve.router, prefix="/api/v1")
+app.include_router(usage.router, prefix="/api/v1")
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected) -> JSONResponse:
+    """Answer 503 when provider calls are queued beyond the configured limit."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 @app.get("/")
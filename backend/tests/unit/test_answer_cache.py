@@ -0,0 +1,63 @@
+"""
+Unit tests for the semantic answer cache.
+"""
+from src.core.config import Settings, settings
+from src.infrastructure.ml.answer_cache import CachedAnswer, SemanticAnswerCache
+from src.infrastructure.ml.fake_providers import HashEmbeddings
+
+
+def _cache() -> SemanticAnswerCache:
+    return SemanticAnswerCache(
+        max_entries=10,
+        max_distance=settings.answer_cache_max_distance,
+        require_same_text=settings.answer_cache_require_same_text,
+    )
+
+
+def _answer(question: str) -> CachedAnswer:
+    return CachedAnswer(
+        question=question,
+        answer=f"answer to {question}",
+        documents=[],
+        token_usage={},
+        kb_version=1,
+    )
+
+
+def test_answer_cache_is_off_by_default():
+    assert Settings.model_fields["answer_cache_enabled"].default is False
+
+
+def test_repeated_question_hits():
+    embeddings = HashEmbeddings(dimensions=256)
+    cache = _cache()
+    question = "How do I enable context caching?"
+    cache.put(embeddings.embed_query(question), _answer(question))
+
+    repeated = "  how do I enable   Context caching?"
+    hit = cache.lookup(repeated, embeddings.embed_query(repeated), kb_version=1)
+
+    assert hit is not None and hit.question == question
+    assert cache.lookup(repeated, embeddings.embed_query(repeated), kb_version=2) is None
+
+
+def test_near_duplicate_questions_miss():
+    embeddings = HashEmbeddings(dimensions=256)
+    cache = _cache()
+    question = "How do I enable context caching in the Gemini API for long documents?"
+    cache.put(embeddings.embed_query(question), _answer(question))
+
+    for other in (
+        "How do I disable context caching in the Gemini API for long documents?",
+        "How do I enable context caching in the Gemini API for short documents?",
+    ):
+        assert cache.lookup(other, embeddings.embed_query(other), kb_version=1) is None
+
+
+def test_same_vector_with_other_text_misses():
+    cache = _cache()
+    vector = [1.0, 0.0, 0.0]
+    cache.put(vector, _answer("Which models support caching?"))
+
+    assert cache.lookup("Which models do not support caching?", vector, kb_version=1) is None
+    assert cache.lookup("which models support caching?", vector, kb_version=1) is not None
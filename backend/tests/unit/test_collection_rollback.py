@@ -0,0 +1,28 @@
+"""
+Unit tests for rolling back to the previous collection.
+"""
+import asyncio
+
+import pytest
+
+from src.infrastructure.ml.collection_registry import CollectionInfo, CollectionRegistry
+from src.infrastructure.ml.rag_service import RAGService
+
+
+def _service(tmp_path, previous_config):
+    service = RAGService()
+    service.registry = CollectionRegistry(tmp_path / "registry.json", "docs")
+    service.registry.active = CollectionInfo(name="docs_g2", config=service._index_config())
+    service.registry.previous = CollectionInfo(name="docs_g1", config=previous_config)
+    return service
+
+
+def test_rollback_refuses_collection_with_other_index_config(tmp_path):
+    config = {**RAGService()._index_config(), "embedding_model": "models/old-embedding"}
+    service = _service(tmp_path, config)
+
+    with pytest.raises(ValueError, match="embedding_model"):
+        asyncio.run(service.rollback_collection())
+
+    assert service.registry.active.name == "docs_g2"
+    assert service.collections_status()["rollback_available"] is False
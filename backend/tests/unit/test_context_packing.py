@@ -0,0 +1,72 @@
+"""
+Unit tests for context packing.
+"""
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.context_packing import (
+    ContextPacker,
+    drop_redundant_sentences,
+    merge_chunks,
+)
+from src.infrastructure.ml.token_counting import estimate_tokens
+
+
+def _chunk(text: str, start: int, source: str = "a.md") -> Document:
+    return Document(page_content=text, metadata={"source": source, "start_index": start})
+
+
+def test_overlapping_chunks_of_a_source_are_merged():
+    text = "First part of the file. Second part of the file. Third part of the file."
+    docs = [
+        _chunk(text[24:49], 24),
+        _chunk(text[:30], 0),
+        _chunk(text[40:], 40),
+        _chunk("Another file.", 0, source="b.md"),
+    ]
+
+    passages = merge_chunks(docs)
+
+    assert [p.source for p in passages] == ["a.md", "b.md"]
+    assert passages[0].text == text
+    assert passages[0].chunks == 3
+    assert passages[0].rank == 0
+
+
+def test_distant_chunks_stay_apart():
+    docs = [_chunk("Near the top.", 0), _chunk("Far below.", 5000)]
+
+    assert len(merge_chunks(docs)) == 2
+
+
+def test_repeated_sentences_are_dropped():
+    sentence = "The collection is rebuilt in the background while queries continue."
+    seen = set()
+
+    first = drop_redundant_sentences(f"{sentence} Short one.", seen)
+    second = drop_redundant_sentences(f"{sentence.upper()} Short one.\n```\n{sentence}\n```", seen)
+
+    assert first == f"{sentence} Short one."
+    # Short sentences and code blocks are kept
+    assert second == f"Short one.\n```\n{sentence}\n```"
+
+
+def test_passage_without_line_breaks_is_cut_not_dropped():
+    text = " ".join(f"word{i}" for i in range(400))
+    budget = 100
+
+    packed = ContextPacker(token_budget=budget).pack([_chunk(text, 0)])
+
+    assert len(packed.passages) == 1
+    assert text.startswith(packed.passages[0].text)
+    assert 0 < packed.tokens <= budget
+
+
+def test_non_ascii_passage_is_cut_within_budget():
+    text = "\n".join("向量检索会把文档切分成块并计算嵌入。" * 3 for _ in range(40))
+    budget = 100
+
+    packed = ContextPacker(token_budget=budget).pack([_chunk(text, 0)])
+
+    assert len(packed.passages) == 1
+    assert text.startswith(packed.passages[0].text)
+    assert 0 < packed.tokens <= budget
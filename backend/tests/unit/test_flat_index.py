@@ -0,0 +1,86 @@
+"""
+Unit tests for the memory-mapped flat vector index.
+"""
+import json
+
+import numpy as np
+
+from src.infrastructure.ml.flat_index import FlatVectorIndex
+
+
+class _FakeStore:
+    """The part of the Chroma API the flat index uses."""
+
+    def __init__(self, vectors) -> None:
+        self.chunks = {
+            f"c{i}": (f"text {i}", {"source": f"{i}.md"}, vector)
+            for i, vector in enumerate(vectors)
+        }
+
+    def get(self, ids=None, limit=None, offset=0, include=()):
+        keys = list(self.chunks) if ids is None else [i for i in ids if i in self.chunks]
+        if ids is None:
+            keys = keys[offset:offset + limit]
+        page = {"ids": keys}
+        if "documents" in include:
+            page["documents"] = [self.chunks[i][0] for i in keys]
+        if "metadatas" in include:
+            page["metadatas"] = [self.chunks[i][1] for i in keys]
+        if "embeddings" in include:
+            page["embeddings"] = [self.chunks[i][2] for i in keys]
+        return page
+
+
+def _vectors(count: int, dimensions: int = 16) -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def test_sidecar_holds_ids_only_and_results_come_from_the_store(tmp_path):
+    vectors = _vectors(50)
+    store = _FakeStore(vectors)
+    index = FlatVectorIndex(tmp_path, "docs", vector_store=store)
+    index.build_from_store(store)
+
+    meta = json.loads(index.meta_path.read_text(encoding="utf-8"))
+    assert "documents" not in meta and "metadatas" not in meta
+    assert len(meta["ids"]) == 50
+
+    results = index.search(vectors[7].tolist(), 3)
+    assert results[0][0].id == "c7"
+    assert results[0][0].page_content == "text 7"
+    assert results[0][0].metadata == {"source": "7.md"}
+
+
+def test_chunks_removed_from_the_store_are_skipped(tmp_path):
+    vectors = _vectors(20)
+    store = _FakeStore(vectors)
+    index = FlatVectorIndex(tmp_path, "docs", vector_store=store)
+    index.build_from_store(store)
+    del store.chunks["c3"]
+
+    documents, matrix = index.search_with_vectors(vectors[3].tolist(), 4)
+
+    assert "c3" not in [doc.id for doc in documents]
+    assert len(documents) == matrix.shape[0] == 3
+
+
+def test_quantized_index_without_full_precision_rescores_from_the_store(tmp_path):
+    vectors = _vectors(200)
+    store = _FakeStore(vectors)
+    index = FlatVectorIndex(
+        tmp_path, "docs", quantization="int8", vector_store=store, keep_full_precision=False
+    )
+    index.build_from_store(store)
+
+    meta = json.loads(index.meta_path.read_text(encoding="utf-8"))
+    assert meta["matrix"] is None
+    assert [path.name for path in tmp_path.glob("*.npy")] == [meta["codes"]]
+
+    documents, matrix = index.search_with_vectors(vectors[42].tolist(), 3)
+    assert documents[0].id == "c42"
+    expected = vectors[42] / np.linalg.norm(vectors[42])
+    assert np.allclose(matrix[0], expected, atol=1e-6)
+
+    # An index reading the same files without quantization loads the vectors from the store
+    exact = FlatVectorIndex(tmp_path, "docs", vector_store=store)
+    assert exact.search(vectors[42].tolist(), 1)[0][0].id == "c42"
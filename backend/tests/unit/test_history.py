@@ -0,0 +1,106 @@
+"""
+Unit tests for the token-budgeted chat history and its rolling summary.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from uuid import uuid4
+
+from src.application import history
+from src.core.config import settings
+from src.domain.entities import Message, Session
+from src.infrastructure.ml.token_counting import estimate_tokens
+
+
+def _turns(count: int, words: int = 20) -> List[Message]:
+    messages = []
+    for i in range(count):
+        messages.append(Message(role="user", content=f"question {i} " + "word " * words))
+        messages.append(Message(role="assistant", content=f"answer {i} " + "word " * words))
+    return messages
+
+
+def test_window_keeps_the_latest_messages_within_budget():
+    messages = _turns(6)
+    budget = sum(estimate_tokens(m.content) for m in messages[-4:])
+
+    window = history.history_window(messages, budget)
+
+    assert [m["content"] for m in window] == [m.content for m in messages[-4:]]
+
+
+def test_latest_turn_over_budget_is_truncated_not_dropped():
+    messages = _turns(2)
+    messages[-1].content = "long answer " * 500
+
+    window = history.history_window(messages, 100)
+
+    assert [m["role"] for m in window] == ["user", "assistant"]
+    assert window[0]["content"] == messages[-2].content
+    assert messages[-1].content.startswith(window[1]["content"])
+    assert sum(estimate_tokens(m["content"]) for m in window) <= 100
+
+
+class _FakeSessionRepository:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    async def get_by_id(self, session_id) -> Optional[Session]:
+        return self.session
+
+    async def update_summary(self, session_id, summary: str, message_count: int) -> None:
+        self.session.summary = summary
+        self.session.summary_message_count = message_count
+
+
+class _FakeMessageRepository:
+    def __init__(self, messages: List[Message]) -> None:
+        self.messages = messages
+
+    async def count_by_session(self, session_id) -> int:
+        return len(self.messages)
+
+    async def get_recent(self, session_id, limit: int) -> List[Message]:
+        return self.messages[-limit:]
+
+    async def get_range(self, session_id, offset: int, limit: int) -> List[Message]:
+        return self.messages[offset:offset + limit]
+
+
+class _FakeRAGService:
+    def __init__(self) -> None:
+        self.summarized: List[dict] = []
+
+    async def summarize_history(self, summary, messages, max_tokens) -> str:
+        self.summarized.extend(messages)
+        return "summary"
+
+
+def test_summary_covers_everything_before_a_budget_cut_window(monkeypatch):
+    messages = _turns(8)
+    # The budget fits two turns, fewer than the verbatim window of history_max_turns
+    budget = sum(estimate_tokens(m.content) for m in messages[-4:])
+    monkeypatch.setattr(settings, "history_token_budget", budget)
+    assert history.verbatim_message_count() > 4
+
+    session = Session(id=uuid4())
+    session_repo = _FakeSessionRepository(session)
+    message_repo = _FakeMessageRepository(messages)
+
+    @asynccontextmanager
+    async def fake_session_maker():
+        yield None
+
+    monkeypatch.setattr(history, "async_session_maker", fake_session_maker)
+    monkeypatch.setattr(history, "SessionRepository", lambda db_session: session_repo)
+    monkeypatch.setattr(history, "MessageRepository", lambda db_session: message_repo)
+
+    rag_service = _FakeRAGService()
+    asyncio.run(history.HistorySummarizer(rag_service)._update(session.id))
+
+    window = history.history_window(messages[-history.verbatim_message_count():], budget)
+    assert len(window) == 4
+    assert session.summary_message_count == len(messages) - len(window)
+    assert [m["content"] for m in rag_service.summarized] == [
+        m.content for m in messages[:-len(window)]
+    ]
@@ -0,0 +1,154 @@
+"""
+Unit tests for the BM25 index, rank fusion, the lexical fast path and
+incremental updates of the derived indexes.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.core.config import settings
+from src.infrastructure.ml.fake_providers import HashEmbeddings
+from src.infrastructure.ml.flat_index import FlatVectorIndex
+from src.infrastructure.ml.lexical_index import BM25Index, tokenize
+from src.infrastructure.ml.rag_service import RAGService
+from src.infrastructure.ml.retrieval_policy import RetrievalPolicy, reciprocal_rank_fusion
+from src.infrastructure.ml.scope_index import RetrievalScope, ScopeIndex
+
+EMBEDDINGS = HashEmbeddings(dimensions=64)
+
+
+class _FakeStore:
+    """The part of the Chroma API the indexes use."""
+
+    def __init__(self, chunks) -> None:
+        self.chunks = {}
+        self._collection = self
+        for chunk_id, (text, source) in chunks.items():
+            self.put(chunk_id, text, source)
+
+    def put(self, chunk_id: str, text: str, source: str) -> None:
+        self.chunks[chunk_id] = (text, {"source": source}, EMBEDDINGS.embed_query(text))
+
+    def get(self, ids=None, limit=None, offset=0, include=()):
+        keys = list(self.chunks) if ids is None else [i for i in ids if i in self.chunks]
+        if ids is None:
+            keys = keys[offset:offset + limit]
+        page = {"ids": keys}
+        for name, position in (("documents", 0), ("metadatas", 1), ("embeddings", 2)):
+            if name in include:
+                page[name] = [self.chunks[i][position] for i in keys]
+        return page
+
+
+CHUNKS = {
+    "c1": ("Call as_retriever with search_kwargs to set k.", "chroma/retrievers.md"),
+    "c2": ("Chroma stores embeddings and documents in collections.", "chroma/basics.md"),
+    "c3": ("Gemini counts tokens with the count_tokens method.", "gemini/tokens.md"),
+    "c4": ("Documents are split into chunks before they are embedded.", "guides/ingest.md"),
+}
+
+
+def test_identifiers_are_indexed_whole_and_split():
+    assert tokenize("use addDocuments") == ["use", "adddocuments", "add", "documents"]
+    assert tokenize("as_retriever") == ["as_retriever", "as", "retriever"]
+
+
+def test_bm25_ranks_exact_identifier_matches_first(tmp_path):
+    store = _FakeStore(CHUNKS)
+    index = BM25Index(tmp_path, "docs")
+    index.build_from_store(store)
+
+    hits = index.search("how do I use as_retriever", 4)
+
+    assert hits[0][0] == "c1"
+    assert all(score > 0 for _, score in hits)
+    assert index.search("nonexistent words only", 4) == []
+    assert [i for i, _ in index.search("documents", 4, allowed_ids={"c4"})] == ["c4"]
+
+
+def test_bm25_prefers_rare_terms_and_shorter_chunks(tmp_path):
+    store = _FakeStore({
+        "short": ("vector index", "a.md"),
+        "long": ("vector index " + "filler words " * 20, "b.md"),
+        "common": ("vector vector vector", "c.md"),
+    })
+    index = BM25Index(tmp_path, "docs")
+    index.build_from_store(store)
+
+    scores = dict(index.search("vector index", 3))
+
+    assert scores["short"] > scores["long"]
+    # "index" is rarer than "vector", so matching it outweighs repeating "vector"
+    assert scores["long"] > scores["common"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+
+    assert max(fused, key=fused.get) == "b"
+    assert fused["a"] > fused["d"]
+    assert fused["c"] == 1 / 63
+
+
+def _fast_path_service(tmp_path, store) -> RAGService:
+    index = BM25Index(tmp_path, "docs")
+    index.build_from_store(store)
+    service = RAGService()
+    service.retrieval_policy = RetrievalPolicy(
+        max_k=4, score_threshold=0.0, mmr_lambda=1.0, context_token_budget=1000
+    )
+    service._collection = SimpleNamespace(
+        lexical_index=index, vector_store=store, parent_store=None
+    )
+    return service
+
+
+def test_lexical_fast_path_requires_identifiers_and_coverage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_fast_path_enabled", True)
+    monkeypatch.setattr(settings, "lexical_fast_path_min_coverage", 0.7)
+    service = _fast_path_service(tmp_path, _FakeStore(CHUNKS))
+
+    result = asyncio.run(service._lexical_fast_path("as_retriever search_kwargs"))
+    assert result is not None and result.documents[0].id == "c1"
+
+    # No identifier in the question: embed and search as usual
+    assert asyncio.run(service._lexical_fast_path("how are documents split")) is None
+    # The identifier matches, but most of the question is about something else
+    assert asyncio.run(service._lexical_fast_path(
+        "as_retriever latency under heavy concurrent production traffic"
+    )) is None
+
+
+def test_indexes_apply_incremental_changes(tmp_path):
+    store = _FakeStore(CHUNKS)
+    bm25 = BM25Index(tmp_path, "docs")
+    scope = ScopeIndex(tmp_path, "docs")
+    flat = FlatVectorIndex(tmp_path, "docs", vector_store=store)
+    for index in (bm25, scope, flat):
+        index.build_from_store(store)
+        index.refresh()
+
+    store.put("c5", "The zorblax_widget renders charts.", "guides/charts.md")
+    store.put("c3", "Gemini bills the tokens of cached content.", "gemini/tokens.md")
+    del store.chunks["c2"]
+    for index in (bm25, scope, flat):
+        index.update_from_store(store, ["c3", "c5"], ["c2"])
+
+    # Updated in place, without a rebuild of the index files
+    assert bm25.delta.path.exists() and scope.delta.path.exists() and flat.delta.path.exists()
+    assert bm25.search("zorblax_widget", 2)[0][0] == "c5"
+    assert bm25.search("method", 2) == []
+    assert [i for i, _ in bm25.search("collections", 4)] == []
+    assert scope.resolve(RetrievalScope(path_prefixes=["chroma"])).chunk_ids == {"c1"}
+    assert scope.resolve(RetrievalScope(tags=["guides"])).chunk_ids == {"c4", "c5"}
+    assert flat.search(store.chunks["c5"][2], 1)[0][0].id == "c5"
+    assert len(flat) == 4
+
+    # Another process loading the index sees the same state
+    reader_bm25 = BM25Index(tmp_path, "docs")
+    reader_flat = FlatVectorIndex(tmp_path, "docs", vector_store=store)
+    assert reader_bm25.search("zorblax_widget", 2)[0][0] == "c5"
+    documents, vectors = reader_flat.search_with_vectors(store.chunks["c3"][2], 4)
+    assert "c2" not in [doc.id for doc in documents]
+    assert np.allclose(vectors[0], store.chunks["c3"][2], atol=1e-5)
@@ -0,0 +1,73 @@
+"""
+Unit tests for expanding retrieved child chunks to their parent sections.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.rag_service import RAGService
+from src.infrastructure.ml.retrieval_policy import RetrievalPolicy, RetrievalResult
+from src.infrastructure.ml.token_counting import estimate_tokens
+
+
+class _FakeParentStore:
+    def __init__(self, parents) -> None:
+        self.parents = parents
+
+    def get_many(self, ids):
+        return {i: self.parents[i] for i in ids if i in self.parents}
+
+
+def _text(label: str, sentences: int) -> str:
+    return " ".join(f"{label} sentence {i} about the vector store." for i in range(sentences))
+
+
+def _expand(budget: int, children, parents) -> RetrievalResult:
+    service = RAGService()
+    service.retrieval_policy = RetrievalPolicy(
+        max_k=4, score_threshold=0.0, mmr_lambda=1.0, context_token_budget=budget
+    )
+    tokens = sum(estimate_tokens(doc.page_content) for doc in children)
+    result = RetrievalResult(
+        documents=children,
+        scores=[1.0] * len(children),
+        candidates=len(children),
+        context_tokens=tokens,
+        baseline_tokens=tokens + 500,
+        tokens_saved=500,
+    )
+    collection = SimpleNamespace(parent_store=_FakeParentStore(parents))
+    return asyncio.run(service._expand_to_parents(collection, result))
+
+
+def test_parents_are_expanded_within_the_budget():
+    children = [
+        Document(id="c1", page_content=_text("first", 2), metadata={"parent_id": "p1"}),
+        Document(id="c2", page_content=_text("first", 2), metadata={"parent_id": "p1"}),
+        Document(id="c3", page_content=_text("second", 2), metadata={"parent_id": "p2"}),
+    ]
+    parents = {
+        "p1": (_text("first", 6), {"source": "a.md"}),
+        "p2": (_text("second", 200), {"source": "b.md"}),
+    }
+    budget = estimate_tokens(parents["p1"][0]) + estimate_tokens(children[2].page_content) + 5
+
+    result = _expand(budget, children, parents)
+
+    # p1 fits and absorbs both of its children; p2 is far too large, so c3 stays
+    assert [doc.id for doc in result.documents] == ["p1", "c3"]
+    assert result.context_tokens == sum(estimate_tokens(doc.page_content) for doc in result.documents)
+    assert result.context_tokens <= budget
+    assert result.tokens_saved == result.baseline_tokens - result.context_tokens
+
+
+def test_parent_expansion_does_not_overstate_savings():
+    children = [Document(id="c1", page_content=_text("only", 2), metadata={"parent_id": "p1"})]
+    parents = {"p1": (_text("only", 20), {"source": "a.md"})}
+
+    result = _expand(10_000, children, parents)
+
+    assert [doc.id for doc in result.documents] == ["p1"]
+    assert result.tokens_saved == max(result.baseline_tokens - result.context_tokens, 0)
+    assert result.tokens_saved < 500
@@ -0,0 +1,50 @@
+"""
+Unit tests for the retrieval policy.
+"""
+import numpy as np
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.retrieval_policy import RetrievalPolicy
+from src.infrastructure.ml.token_counting import estimate_tokens
+
+
+def _policy(budget: int) -> RetrievalPolicy:
+    return RetrievalPolicy(max_k=4, score_threshold=0.0, mmr_lambda=1.0, context_token_budget=budget)
+
+
+def _long_text(lines: int) -> str:
+    return "\n".join(f"Line {i} explains another detail of the vector store." for i in range(lines))
+
+
+def test_select_truncates_single_over_budget_chunk():
+    documents = [Document(page_content=_long_text(200), metadata={"source": "a.md"})]
+    vectors = np.array([[1.0, 0.0]])
+
+    result = _policy(50).select([1.0, 0.0], documents, vectors)
+
+    assert result.k == 1
+    assert 0 < result.context_tokens <= 50
+    assert documents[0].page_content.startswith(result.documents[0].page_content)
+
+
+def test_select_skips_chunks_that_do_not_fit():
+    documents = [
+        Document(page_content=_long_text(3), metadata={"source": "best.md"}),
+        Document(page_content=_long_text(200), metadata={"source": "large.md"}),
+        Document(page_content="A short note.", metadata={"source": "small.md"}),
+    ]
+    vectors = np.array([[1.0, 0.0], [0.9, 0.1], [0.8, 0.2]])
+    budget = estimate_tokens(documents[0].page_content) + 10
+
+    result = _policy(budget).select([1.0, 0.0], documents, vectors)
+
+    assert [doc.metadata["source"] for doc in result.documents] == ["best.md", "small.md"]
+
+
+def test_select_lexical_truncates_single_over_budget_chunk():
+    documents = [Document(page_content=_long_text(200), metadata={"source": "a.md"})]
+
+    result = _policy(50).select_lexical(documents, [3.0])
+
+    assert result.k == 1
+    assert 0 < result.context_tokens <= 50
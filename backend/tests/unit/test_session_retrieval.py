@@ -0,0 +1,73 @@
+"""
+Unit tests for follow-up retrieval reuse.
+"""
+import asyncio
+
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.fake_providers import HashEmbeddings
+from src.infrastructure.ml.rag_service import RAGService
+from src.infrastructure.ml.retrieval_policy import RetrievalResult
+from src.infrastructure.ml.session_retrieval import (
+    PATH_FULL,
+    PATH_REUSED,
+    SessionRetrievalCache,
+    SessionTurn,
+    looks_like_follow_up,
+)
+
+
+def test_pronoun_follow_ups_are_recognized():
+    assert looks_like_follow_up("Can you show an example of it?")
+    assert looks_like_follow_up("Why does that work?")
+    assert looks_like_follow_up("这个怎么用？")
+
+
+def test_short_new_topic_questions_are_not_follow_ups():
+    assert not looks_like_follow_up("Explain context caching")
+    assert not looks_like_follow_up("Why does Chroma use HNSW?")
+    assert not looks_like_follow_up("How do I delete documents?")
+    assert not looks_like_follow_up("What does this_function return?")
+
+
+def _service(previous_question: str) -> RAGService:
+    service = RAGService()
+    service.embeddings = HashEmbeddings(dimensions=256)
+    service.session_retrievals = SessionRetrievalCache(max_sessions=10, ttl_seconds=60)
+    service.session_retrievals.put(
+        "s1",
+        SessionTurn(
+            question=previous_question,
+            documents=[Document(id="old", page_content="Context caching stores tokens.")],
+            scope_key=service._scope_key(None),
+            kb_version=service.kb_version,
+        ),
+    )
+
+    async def retrieve(question, question_vector=None, scope=None):
+        return RetrievalResult(documents=[Document(id="new", page_content="HNSW graph index.")])
+
+    service.retrieve = retrieve
+    return service
+
+
+def test_short_new_topic_question_gets_a_full_retrieval():
+    service = _service("How does Gemini context caching work?")
+
+    result, path = asyncio.run(
+        service._retrieve_turn("Why does Chroma use HNSW?", None, None, "s1")
+    )
+
+    assert path == PATH_FULL
+    assert [doc.id for doc in result.documents] == ["new"]
+
+
+def test_repeated_question_reuses_previous_chunks():
+    service = _service("How does Gemini context caching work?")
+
+    result, path = asyncio.run(
+        service._retrieve_turn("How does Gemini context caching work?", None, None, "s1")
+    )
+
+    assert path == PATH_REUSED
+    assert [doc.id for doc in result.documents] == ["old"]
@@ -0,0 +1,52 @@
+"""
+Unit tests for releasing the LLM admission slot when a client disconnects.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+from src.infrastructure.ml.admission import AdmissionController
+from src.infrastructure.ml.fake_providers import FakeChatModel
+from src.infrastructure.ml.rag_service import RAGService
+from src.infrastructure.ml.request_coalescing import StreamFanout
+from src.infrastructure.ml.retrieval_policy import RetrievalResult
+from src.infrastructure.ml.session_retrieval import PATH_FULL
+
+
+def _service(fanout: bool) -> RAGService:
+    service = RAGService()
+    service.llm = FakeChatModel(ttft_ms=0.0, tokens_per_second=1000.0, jitter=0.0)
+    service.llm_admission = AdmissionController("llm", max_concurrency=1, max_queue=4)
+    service.stream_flights = StreamFanout() if fanout else None
+    service._collection = SimpleNamespace()
+
+    async def retrieve_turn(question, question_vector, scope, session_id):
+        docs = [Document(id="c1", page_content="Chunks are stored in Chroma.")]
+        return RetrievalResult(documents=docs, scores=[1.0], candidates=1), PATH_FULL
+
+    service._retrieve_turn = retrieve_turn
+    return service
+
+
+async def _disconnect_after_first_chunk(service: RAGService) -> None:
+    stream = service.stream_query("Where are chunks stored?")
+    await stream.__anext__()
+    assert service.llm_admission.stats()["active"] == 1
+
+    await stream.aclose()
+
+    assert service.llm_admission.stats()["active"] == 0
+    assert service.generation_stats.stats()["cancelled"] == 1
+
+
+def test_disconnect_releases_the_admission_slot():
+    asyncio.run(_disconnect_after_first_chunk(_service(fanout=False)))
+
+
+def test_disconnect_of_the_last_subscriber_releases_the_admission_slot():
+    service = _service(fanout=True)
+
+    asyncio.run(_disconnect_after_first_chunk(service))
+
+    assert service.stream_flights.stats()["in_flight"] == 0
@@ -1,5 +1,5 @@
 import request from '@/api'
-import type { ChatRequest, ChatResponse, StreamEvent } from '@/types'
+import type { ChatRequest, ChatResponse, IngestionJob, StreamEvent } from '@/types'
 
 export const chatApi = {
   /**
@@ -63,9 +63,16 @@ export const chatApi = {
   },
 
   /**
-   * Trigger document ingestion
+   * Trigger document ingestion (runs as a background job)
    */
-  ingest(): Promise<{ message: string; documents_ingested: number }> {
+  ingest(): Promise<IngestionJob> {
     return request.post('/v1/chat/ingest')
   },
+
+  /**
+   * Get the progress of an ingestion job
+   */
+  getIngestJob(jobId: string): Promise<IngestionJob> {
+    return request.get(`/v1/chat/ingest/${jobId}`)
+  },
 }
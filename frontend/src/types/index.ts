@@ -13,7 +13,10 @@ export interface TokenUsage {
   input_tokens?: number
   output_tokens?: number
   rag_tokens?: number
+  rag_tokens_saved?: number
+  packing_tokens_saved?: number
   total_tokens?: number
+  retrieval_path?: 'full' | 'reused' | 'extended' | 'answer_cache'
 }
 
 export interface ReferenceDocument {
@@ -31,15 +34,22 @@ export interface Message {
   created_at: string
   token_usage?: TokenUsage
   references?: ReferenceDocument[]
+  truncated?: boolean
 }
 
 export interface SessionDetail extends Session {
   messages: Message[]
 }
 
+export interface RetrievalScope {
+  path_prefixes?: string[]
+  tags?: string[]
+}
+
 export interface ChatRequest {
   message: string
   session_id?: string
+  scope?: RetrievalScope
   enable_web_search?: boolean
   enable_deep_thinking?: boolean
 }
@@ -56,3 +66,24 @@ export interface StreamEvent {
   references?: ReferenceDocument[]
   error?: string
 }
+
+export interface IngestionJob {
+  job_id: string
+  status: 'queued' | 'running' | 'completed' | 'failed'
+  coalesced: boolean
+  created_at: string
+  started_at?: string
+  finished_at?: string
+  files_found: number
+  files_scanned: number
+  files_changed: number
+  files_removed: number
+  chunks_total: number
+  chunks_embedded: number
+  chunks_removed: number
+  chunks_deduplicated: number
+  bytes_deduplicated: number
+  throughput_chunks_per_second?: number
+  eta_seconds?: number
+  errors: string[]
+}